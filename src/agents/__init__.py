@@ -17,6 +17,10 @@ from .orchestrator import (
     GenerationStage,
     GenerationProgress,
     GenerationConfig,
+    STAGE_DEPENDENCIES,
+    SHOT_STAGES,
+    diff_storyboards,
+    plan_shot_reuse,
 )
 
 __all__ = [
@@ -37,4 +41,8 @@ __all__ = [
     "GenerationStage",
     "GenerationProgress",
     "GenerationConfig",
+    "STAGE_DEPENDENCIES",
+    "SHOT_STAGES",
+    "diff_storyboards",
+    "plan_shot_reuse",
 ]
@@ -3,14 +3,26 @@ Base Agent Class for MangaForge
 
 All agents inherit from this base class which provides common functionality.
 """
+import asyncio
+import functools
 from abc import ABC, abstractmethod
-from typing import Any, TypeVar
+from typing import Any, Awaitable, Callable, Optional, TypeVar
 
 from langchain_core.messages import BaseMessage
 from langgraph.graph import StateGraph
 from pydantic import BaseModel
 
+from src.observability.tracing import span
+
 StateType = TypeVar("StateType", bound=BaseModel)
+ItemType = TypeVar("ItemType")
+ResultType = TypeVar("ResultType")
+
+# Agent 内部进度回调: (progress: 0-100, message, data)
+AgentProgressCallback = Callable[[float, str, dict[str, Any]], Awaitable[None]]
+
+# 单个条目（镜头）完成回调，用于持久化检查点: (result)
+AgentUnitCallback = Callable[[dict[str, Any]], Awaitable[None]]
 
 
 class AgentState(BaseModel):
@@ -28,9 +40,92 @@ class BaseAgent(ABC):
     name: str = "base_agent"
     description: str = "Base agent class"
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """为子类的 run 记录 span（<agent>.run）"""
+        super().__init_subclass__(**kwargs)
+        run = cls.__dict__.get("run")
+        if run is None or getattr(run, "__isabstractmethod__", False):
+            return
+
+        @functools.wraps(run)
+        async def traced_run(self: "BaseAgent", input_data: dict[str, Any], *args: Any, **kwargs: Any) -> Any:
+            with span(f"{self.name}.run", agent=self.name, project_id=input_data.get("project_id") or None):
+                return await run(self, input_data, *args, **kwargs)
+
+        cls.run = traced_run
+
     def __init__(self):
+        self.progress_callback: Optional[AgentProgressCallback] = None
+        self.unit_callback: Optional[AgentUnitCallback] = None
         self.graph = self._build_graph()
 
+    async def _report_progress(
+        self,
+        progress: float,
+        message: str,
+        data: Optional[dict[str, Any]] = None,
+    ) -> None:
+        """报告 Agent 内部进度（由编排器转发到对应阶段）"""
+        if self.progress_callback:
+            await self.progress_callback(progress, message, data or {})
+
+    async def _report_unit(self, result: Any) -> None:
+        """报告单个条目已完成并保存（由编排器写入检查点）"""
+        if self.unit_callback and isinstance(result, dict):
+            await self.unit_callback(result)
+
+    async def _map_with_progress(
+        self,
+        items: list[ItemType],
+        worker: Callable[[ItemType], Awaitable[ResultType]],
+        describe: Callable[[ItemType], str],
+        span_attributes: Optional[Callable[[ItemType], dict[str, Any]]] = None,
+    ) -> list[ResultType]:
+        """
+        并发处理所有条目，结果保持输入顺序
+
+        并发度由 worker 内部获取的服务信号量限制；每完成一项报告一次结果和进度。
+
+        Args:
+            items: 待处理条目
+            worker: 处理单个条目的协程函数
+            describe: 生成进度消息中的条目描述
+            span_attributes: 条目 span 的属性，默认取 dict 条目的 shot_id
+
+        Returns:
+            与 items 顺序一致的结果列表
+        """
+        total = len(items)
+        completed = 0
+
+        async def run(item: ItemType) -> ResultType:
+            nonlocal completed
+            if span_attributes:
+                attributes = span_attributes(item)
+            else:
+                attributes = {"shot_id": item.get("shot_id") if isinstance(item, dict) else None}
+            with span(f"{self.name}.item", **attributes):
+                result = await worker(item)
+            await self._report_unit(result)
+            completed += 1
+            await self._report_progress(
+                completed / total * 100,
+                f"{describe(item)} 完成",
+                {"completed": completed, "total": total},
+            )
+            return result
+
+        return list(await asyncio.gather(*(run(item) for item in items)))
+
+    def _traced_node(self, name: str, node: Callable[[Any], Awaitable[dict[str, Any]]]) -> Callable:
+        """包装 LangGraph 节点，每次执行记录一个 span（<agent>.<节点名>）"""
+        @functools.wraps(node)
+        async def traced(state: Any) -> dict[str, Any]:
+            with span(f"{self.name}.{name}", agent=self.name, node=name):
+                return await node(state)
+
+        return traced
+
     @abstractmethod
     def _build_graph(self) -> StateGraph:
         """Build the agent's state graph.
@@ -25,6 +25,8 @@ class CharacterState(AgentState):
     characters: list[dict[str, Any]] = Field(default_factory=list)
     style: str = "anime"
     project_id: str = ""
+    # 已提前启动的角色设计（角色名 -> 返回 design_character 结果的任务）
+    designs: dict[str, Any] = Field(default_factory=dict)
 
     # 处理过程
     current_character_index: int = 0
@@ -68,51 +70,104 @@ Output only the prompt, no explanations."""
         """构建角色生成工作流图"""
         graph = StateGraph(CharacterState)
 
-        graph.add_node("generate_prompts", self._generate_prompts)
-        graph.add_node("generate_images", self._generate_images)
-        graph.add_node("save_assets", self._save_assets)
+        graph.add_node("design_characters", self._traced_node("design_characters", self._design_characters))
+        graph.add_node("save_assets", self._traced_node("save_assets", self._save_assets))
 
-        graph.set_entry_point("generate_prompts")
-        graph.add_edge("generate_prompts", "generate_images")
-        graph.add_edge("generate_images", "save_assets")
+        graph.set_entry_point("design_characters")
+        graph.add_edge("design_characters", "save_assets")
         graph.add_edge("save_assets", END)
 
         return graph.compile()
 
-    async def _generate_prompts(self, state: CharacterState) -> dict[str, Any]:
-        """为每个角色生成图像提示词"""
+    async def _design_characters(self, state: CharacterState) -> dict[str, Any]:
+        """
+        并发设计所有角色
+
+        每个角色的提示词生成完成后立即提交该角色的参考图渲染，
+        LLM 和图像后端的并发度分别由各自服务的 max_concurrency 限制。
+        """
         llm_service = self.service_factory.get_llm_service()
-        character_prompts = {}
+        image_service = self.service_factory.get_image_service()
 
-        for char in state.characters:
-            prompt_request = self.PROMPT_TEMPLATE.format(
-                style=state.style,
-                name=char.get("name", "Unknown"),
-                description=char.get("description", ""),
-                gender=char.get("gender", ""),
-                age_range=char.get("age_range", ""),
-                personality=char.get("personality", ""),
-            )
-
-            messages = [
-                LLMMessage.system("You are an expert at creating image prompts for character generation."),
-                LLMMessage.user(prompt_request),
-            ]
+        async def design(char: dict[str, Any]) -> tuple[Optional[str], list[bytes]]:
+            started = state.designs.get(char.get("name", "Unknown"))
+            if started is not None:
+                return await started
+            return await self.design_character(char, state.style, llm_service, image_service)
 
-            result = await llm_service.generate(messages, temperature=0.7)
+        designs = await self._map_with_progress(
+            state.characters,
+            design,
+            lambda char: f"角色 {char.get('name', 'Unknown')}",
+        )
 
-            if result.success:
-                # 添加风格和质量标签
-                base_prompt = result.data.content
-                style_tags = self._get_style_tags(state.style)
-                full_prompt = f"{base_prompt}, {style_tags}"
-                character_prompts[char.get("name", "Unknown")] = full_prompt
+        character_prompts = {}
+        generated_images = {}
+        for char, (prompt, images) in zip(state.characters, designs):
+            char_name = char.get("name", "Unknown")
+            if prompt:
+                character_prompts[char_name] = prompt
+            if images:
+                generated_images[char_name] = images
 
         return {
-            "current_step": "generate_prompts",
+            "current_step": "design_characters",
             "character_prompts": character_prompts,
+            "generated_images": generated_images,
         }
 
+    async def design_character(
+        self,
+        char: dict[str, Any],
+        style: str,
+        llm_service: Optional[Any] = None,
+        image_service: Optional[Any] = None,
+    ) -> tuple[Optional[str], list[bytes]]:
+        """
+        设计单个角色：生成提示词后渲染参考图
+
+        Returns:
+            (图像提示词, 参考图列表)；提示词生成失败时为 (None, [])
+        """
+        llm_service = llm_service or self.service_factory.get_llm_service()
+        image_service = image_service or self.service_factory.get_image_service()
+
+        prompt = await self._generate_prompt(llm_service, char, style)
+        if not prompt:
+            return None, []
+
+        return prompt, await self._generate_image(image_service, prompt)
+
+    async def _generate_prompt(
+        self,
+        llm_service: Any,
+        char: dict[str, Any],
+        style: str,
+    ) -> Optional[str]:
+        """为角色生成图像提示词"""
+        prompt_request = self.PROMPT_TEMPLATE.format(
+            style=style,
+            name=char.get("name", "Unknown"),
+            description=char.get("description", ""),
+            gender=char.get("gender", ""),
+            age_range=char.get("age_range", ""),
+            personality=char.get("personality", ""),
+        )
+
+        messages = [
+            LLMMessage.system("You are an expert at creating image prompts for character generation."),
+            LLMMessage.user(prompt_request),
+        ]
+
+        async with llm_service.semaphore():
+            result = await llm_service.generate(messages, temperature=0.7)
+
+        if not result.success:
+            return None
+
+        # 添加风格和质量标签
+        return f"{result.data.content}, {self._get_style_tags(style)}"
+
     def _get_style_tags(self, style: str) -> str:
         """获取风格标签"""
         style_map = {
@@ -123,31 +178,22 @@ Output only the prompt, no explanations."""
         }
         return style_map.get(style, style_map["anime"])
 
-    async def _generate_images(self, state: CharacterState) -> dict[str, Any]:
+    async def _generate_image(self, image_service: Any, prompt: str) -> list[bytes]:
         """生成角色参考图"""
-        image_service = self.service_factory.get_image_service()
-        generated_images = {}
-
-        for char_name, prompt in state.character_prompts.items():
-            request = ImageGenerationRequest(
-                prompt=prompt,
-                negative_prompt="lowres, bad anatomy, bad hands, text, error, missing fingers, extra digit, fewer digits, cropped, worst quality, low quality, normal quality, jpeg artifacts, signature, watermark, username, blurry, deformed",
-                width=1024,
-                height=1024,
-                steps=30,
-                cfg_scale=7.5,
-                batch_size=1,
-            )
+        request = ImageGenerationRequest(
+            prompt=prompt,
+            negative_prompt="lowres, bad anatomy, bad hands, text, error, missing fingers, extra digit, fewer digits, cropped, worst quality, low quality, normal quality, jpeg artifacts, signature, watermark, username, blurry, deformed",
+            width=1024,
+            height=1024,
+            steps=30,
+            cfg_scale=7.5,
+            batch_size=1,
+        )
 
+        async with image_service.semaphore():
             result = await image_service.generate(request)
 
-            if result.success:
-                generated_images[char_name] = result.data.images
-
-        return {
-            "current_step": "generate_images",
-            "generated_images": generated_images,
-        }
+        return result.data.images if result.success else []
 
     async def _save_assets(self, state: CharacterState) -> dict[str, Any]:
         """保存角色资产"""
@@ -156,20 +202,24 @@ Output only the prompt, no explanations."""
         storage = get_storage()
         character_assets = []
 
+        # 所有角色的参考图并发上传
+        uploads = [
+            {
+                "data": img_data,
+                "project_id": state.project_id,
+                "asset_type": "character",
+                "filename": f"{char.get('name', 'Unknown')}_{i}.png",
+                "content_type": "image/png",
+            }
+            for char in state.characters
+            for i, img_data in enumerate(state.generated_images.get(char.get("name", "Unknown"), []))
+        ]
+        uploaded = iter(await storage.upload_bytes_many_async(uploads))
+
         for char in state.characters:
             char_name = char.get("name", "Unknown")
             images = state.generated_images.get(char_name, [])
-
-            saved_paths = []
-            for i, img_data in enumerate(images):
-                path = storage.upload_bytes(
-                    data=img_data,
-                    project_id=state.project_id,
-                    asset_type="character",
-                    filename=f"{char_name}_{i}.png",
-                    content_type="image/png",
-                )
-                saved_paths.append(path)
+            saved_paths = [next(uploaded) for _ in images]
 
             character_assets.append({
                 "name": char_name,
@@ -199,6 +249,7 @@ Output only the prompt, no explanations."""
                 - characters: 角色信息列表
                 - style: 风格
                 - project_id: 项目 ID
+                - designs: 已提前启动的角色设计任务（可选，流式剧本生成时）
 
         Returns:
             生成的角色资产
@@ -207,6 +258,7 @@ Output only the prompt, no explanations."""
             characters=input_data.get("characters", []),
             style=input_data.get("style", "anime"),
             project_id=input_data.get("project_id", ""),
+            designs=input_data.get("designs", {}),
             messages=[],
         )
 
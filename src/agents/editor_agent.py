@@ -8,7 +8,8 @@ Editor Agent - 剪辑合成 Agent
 4. 添加背景音乐和音效
 5. 输出最终视频
 """
-import subprocess
+import asyncio
+import json
 import tempfile
 from pathlib import Path
 from typing import Any, Optional
@@ -34,11 +35,13 @@ class EditorState(AgentState):
     add_subtitles: bool = True
     bgm_path: Optional[str] = None
     bgm_volume: float = 0.3
+    single_pass: bool = True  # 单次编码：拼接 + BGM 闪避混音 + 字幕烧录
 
     # 处理过程
     temp_dir: str = ""
     clip_paths: list[str] = Field(default_factory=list)
     subtitle_file: str = ""
+    subtitles_burned: bool = False
 
     # 输出
     final_video_path: str = ""
@@ -50,6 +53,14 @@ class EditorAgent(BaseAgent):
     name = "editor_agent"
     description = "合成最终视频"
 
+    # 单次编码模式的输出尺寸
+    OUTPUT_DIMENSIONS = {
+        "9:16": (720, 1280),
+        "16:9": (1280, 720),
+        "1:1": (1080, 1080),
+    }
+    OUTPUT_FPS = 25
+
     def __init__(self):
         super().__init__()
 
@@ -57,21 +68,85 @@ class EditorAgent(BaseAgent):
         """构建剪辑工作流图"""
         graph = StateGraph(EditorState)
 
-        graph.add_node("prepare_clips", self._prepare_clips)
-        graph.add_node("generate_subtitles", self._generate_subtitles)
-        graph.add_node("concat_videos", self._concat_videos)
-        graph.add_node("add_audio_effects", self._add_audio_effects)
-        graph.add_node("finalize", self._finalize)
+        graph.add_node("prepare_clips", self._traced_node("prepare_clips", self._prepare_clips))
+        graph.add_node("generate_subtitles", self._traced_node("generate_subtitles", self._generate_subtitles))
+        graph.add_node("render_single_pass", self._traced_node("render_single_pass", self._render_single_pass))
+        graph.add_node("concat_videos", self._traced_node("concat_videos", self._concat_videos))
+        graph.add_node("add_audio_effects", self._traced_node("add_audio_effects", self._add_audio_effects))
+        graph.add_node("finalize", self._traced_node("finalize", self._finalize))
 
         graph.set_entry_point("prepare_clips")
         graph.add_edge("prepare_clips", "generate_subtitles")
-        graph.add_edge("generate_subtitles", "concat_videos")
+        graph.add_conditional_edges(
+            "generate_subtitles",
+            lambda state: "render_single_pass" if state.single_pass else "concat_videos",
+            {
+                "render_single_pass": "render_single_pass",
+                "concat_videos": "concat_videos",
+            },
+        )
+        # 片段探测失败时单次编码无法对齐音画，回退到多次编码
+        graph.add_conditional_edges(
+            "render_single_pass",
+            lambda state: "finalize" if state.single_pass else "concat_videos",
+            {
+                "finalize": "finalize",
+                "concat_videos": "concat_videos",
+            },
+        )
         graph.add_edge("concat_videos", "add_audio_effects")
         graph.add_edge("add_audio_effects", "finalize")
         graph.add_edge("finalize", END)
 
         return graph.compile()
 
+    async def _run_ffmpeg(
+        self,
+        cmd: list[str],
+        cwd: Optional[str] = None,
+    ) -> tuple[int, bytes, str]:
+        """异步执行 ffmpeg/ffprobe，返回 (退出码, stdout, stderr)，不阻塞事件循环"""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await process.communicate()
+        return process.returncode, stdout, stderr.decode(errors="replace")
+
+    async def _probe_clip(self, clip_path: str) -> Optional[dict[str, Any]]:
+        """
+        获取片段时长以及是否包含音轨
+
+        Returns:
+            探测结果，ffprobe 失败或无法得到有效时长时返回 None
+        """
+        returncode, stdout, _ = await self._run_ffmpeg([
+            "ffprobe",
+            "-v", "error",
+            "-show_entries", "stream=codec_type:format=duration",
+            "-of", "json",
+            clip_path,
+        ])
+        if returncode != 0:
+            return None
+
+        try:
+            info = json.loads(stdout or b"{}")
+            duration = float(info.get("format", {}).get("duration") or 0.0)
+        except (ValueError, TypeError):
+            return None
+        if duration <= 0:
+            return None
+
+        return {
+            "duration": duration,
+            "has_audio": any(
+                stream.get("codec_type") == "audio" for stream in info.get("streams", [])
+            ),
+        }
+
     def _get_best_video_for_shot(
         self,
         shot_id: int,
@@ -100,16 +175,22 @@ class EditorAgent(BaseAgent):
         return None
 
     async def _prepare_clips(self, state: EditorState) -> dict[str, Any]:
-        """准备视频片段"""
+        """
+        准备视频片段
+
+        片段优先从 Worker 本地资产缓存硬链接（本 Worker 刚上传的片段无需下载），
+        未命中的片段并发下载。
+        """
         from src.storage import get_storage
 
         storage = get_storage()
-        temp_dir = tempfile.mkdtemp(prefix="mangaforge_edit_")
-        clip_paths = []
+        work_dir = storage.local_cache.work_dir if storage.local_cache else None
+        temp_dir = tempfile.mkdtemp(prefix="mangaforge_edit_", dir=work_dir)
 
         # 按照分镜顺序排列
         sorted_shots = sorted(state.storyboard, key=lambda x: (x.get("scene_id", 0), x.get("shot_id", 0)))
 
+        fetches: list[tuple[str, Path]] = []
         for shot in sorted_shots:
             shot_id = shot.get("shot_id")
             video_path = self._get_best_video_for_shot(
@@ -117,10 +198,10 @@ class EditorAgent(BaseAgent):
             )
 
             if video_path:
-                # 下载视频到临时目录
                 local_path = Path(temp_dir) / f"clip_{shot_id:04d}.mp4"
-                storage.download_file(video_path, local_path)
-                clip_paths.append(str(local_path))
+                fetches.append((video_path, local_path))
+
+        clip_paths = [str(path) for path in await storage.fetch_many_async(fetches)]
 
         return {
             "current_step": "prepare_clips",
@@ -184,6 +265,129 @@ class EditorAgent(BaseAgent):
         millis = int((seconds % 1) * 1000)
         return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
 
+    def _build_single_pass_graph(
+        self,
+        state: EditorState,
+        clips: list[dict[str, Any]],
+        bgm_input: Optional[int],
+        subtitle_name: Optional[str],
+    ) -> tuple[str, str, str]:
+        """
+        构建单次编码的 filter_complex
+
+        各片段统一尺寸/帧率后与音轨一起 concat（无音轨的片段补静音），
+        BGM 以对白为侧链做闪避后混音，最后烧录字幕。
+
+        Returns:
+            (filter_complex, 视频输出标签, 音频输出标签)
+        """
+        width, height = self.OUTPUT_DIMENSIONS.get(state.aspect_ratio, (720, 1280))
+        filters = []
+        concat_inputs = []
+
+        for i, clip in enumerate(clips):
+            filters.append(
+                f"[{i}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+                f"fps={self.OUTPUT_FPS},format=yuv420p[v{i}]"
+            )
+            if clip["has_audio"]:
+                filters.append(f"[{i}:a]aresample=44100,aformat=channel_layouts=stereo[a{i}]")
+            else:
+                filters.append(
+                    f"anullsrc=r=44100:cl=stereo,atrim=duration={clip['duration']:.3f}[a{i}]"
+                )
+            concat_inputs.append(f"[v{i}][a{i}]")
+
+        filters.append(f"{''.join(concat_inputs)}concat=n={len(clips)}:v=1:a=1[vcat][acat]")
+
+        video_out = "vcat"
+        if subtitle_name:
+            filters.append(f"[vcat]subtitles={subtitle_name}[vout]")
+            video_out = "vout"
+
+        audio_out = "acat"
+        if bgm_input is not None:
+            filters.append(
+                f"[{bgm_input}:a]volume={state.bgm_volume},"
+                f"aresample=44100,aformat=channel_layouts=stereo[bgm]"
+            )
+            filters.append("[acat]asplit=2[dialog][sidechain]")
+            filters.append(
+                "[bgm][sidechain]sidechaincompress=threshold=0.05:ratio=8:attack=20:release=300[ducked]"
+            )
+            filters.append("[dialog][ducked]amix=inputs=2:duration=first:dropout_transition=0[aout]")
+            audio_out = "aout"
+
+        return ";".join(filters), video_out, audio_out
+
+    async def _render_single_pass(self, state: EditorState) -> dict[str, Any]:
+        """单次编码：拼接 + BGM 混音 + 字幕烧录"""
+        if not state.clip_paths:
+            return {
+                "current_step": "render_single_pass",
+                "error": "No clips to concatenate",
+            }
+
+        clips = await asyncio.gather(*(self._probe_clip(path) for path in state.clip_paths))
+        failed = [path for path, clip in zip(state.clip_paths, clips) if clip is None]
+        if failed:
+            # 时长未知的片段无法补齐静音，继续会使后续片段音画错位
+            print(
+                f"Warning: ffprobe failed for {len(failed)} clip(s), "
+                f"falling back to multi-pass edit: {failed}"
+            )
+            return {
+                "current_step": "render_single_pass",
+                "single_pass": False,
+            }
+
+        cmd = ["ffmpeg", "-y"]
+        for clip_path in state.clip_paths:
+            cmd += ["-i", clip_path]
+
+        bgm_input = None
+        if state.bgm_path:
+            # 循环 BGM 以覆盖整段视频，混音时以对白轨时长为准
+            bgm_input = len(state.clip_paths)
+            cmd += ["-stream_loop", "-1", "-i", state.bgm_path]
+
+        # 在临时目录中执行，字幕滤镜使用相对文件名以避免路径转义
+        subtitle_name = None
+        if state.add_subtitles and state.subtitle_file and Path(state.subtitle_file).exists():
+            subtitle_name = Path(state.subtitle_file).name
+
+        filter_complex, video_out, audio_out = self._build_single_pass_graph(
+            state, list(clips), bgm_input, subtitle_name
+        )
+
+        output_path = Path(state.temp_dir) / "final_single_pass.mp4"
+        cmd += [
+            "-filter_complex", filter_complex,
+            "-map", f"[{video_out}]",
+            "-map", f"[{audio_out}]",
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-crf", "20",
+            "-c:a", "aac",
+            "-b:a", "192k",
+            "-movflags", "+faststart",
+            str(output_path),
+        ]
+
+        returncode, _, stderr = await self._run_ffmpeg(cmd, cwd=state.temp_dir)
+        if returncode != 0:
+            return {
+                "current_step": "render_single_pass",
+                "error": f"FFmpeg single-pass render failed: {stderr}",
+            }
+
+        return {
+            "current_step": "render_single_pass",
+            "final_video_path": str(output_path),
+            "subtitles_burned": subtitle_name is not None,
+        }
+
     async def _concat_videos(self, state: EditorState) -> dict[str, Any]:
         """拼接视频片段"""
         if not state.clip_paths:
@@ -212,12 +416,11 @@ class EditorAgent(BaseAgent):
             str(output_path),
         ]
 
-        try:
-            subprocess.run(cmd, check=True, capture_output=True)
-        except subprocess.CalledProcessError as e:
+        returncode, _, stderr = await self._run_ffmpeg(cmd)
+        if returncode != 0:
             return {
                 "current_step": "concat_videos",
-                "error": f"FFmpeg concat failed: {e.stderr.decode()}",
+                "error": f"FFmpeg concat failed: {stderr}",
             }
 
         return {
@@ -248,16 +451,16 @@ class EditorAgent(BaseAgent):
             str(output_path),
         ]
 
-        try:
-            subprocess.run(cmd, check=True, capture_output=True)
-            return {
-                "current_step": "add_audio_effects",
-                "final_video_path": str(output_path),
-            }
-        except subprocess.CalledProcessError:
+        returncode, _, _ = await self._run_ffmpeg(cmd)
+        if returncode != 0:
             # 如果失败，继续使用原视频
             return {"current_step": "add_audio_effects"}
 
+        return {
+            "current_step": "add_audio_effects",
+            "final_video_path": str(output_path),
+        }
+
     async def _finalize(self, state: EditorState) -> dict[str, Any]:
         """最终化输出"""
         from src.storage import get_storage
@@ -270,8 +473,13 @@ class EditorAgent(BaseAgent):
 
         storage = get_storage()
 
-        # 如果需要添加字幕，烧录字幕
-        if state.add_subtitles and state.subtitle_file and Path(state.subtitle_file).exists():
+        # 如果需要添加字幕且尚未烧录（多次编码模式），烧录字幕
+        if (
+            state.add_subtitles
+            and not state.subtitles_burned
+            and state.subtitle_file
+            and Path(state.subtitle_file).exists()
+        ):
             subtitled_path = Path(state.temp_dir) / "final_with_subs.mp4"
 
             cmd = [
@@ -283,14 +491,13 @@ class EditorAgent(BaseAgent):
                 str(subtitled_path),
             ]
 
-            try:
-                subprocess.run(cmd, check=True, capture_output=True)
+            returncode, _, _ = await self._run_ffmpeg(cmd)
+            if returncode == 0:
                 state.final_video_path = str(subtitled_path)
-            except subprocess.CalledProcessError:
-                pass  # 字幕烧录失败，使用无字幕版本
+            # 字幕烧录失败时使用无字幕版本
 
         # 上传最终视频
-        final_path = storage.upload_file(
+        final_path = await storage.upload_file_async(
             file_path=state.final_video_path,
             project_id=state.project_id,
             asset_type="final",
@@ -329,6 +536,7 @@ class EditorAgent(BaseAgent):
                 - add_subtitles: 是否添加字幕
                 - bgm_path: 背景音乐路径
                 - bgm_volume: 背景音乐音量
+                - single_pass: 是否单次编码（默认 True）
 
         Returns:
             最终视频信息
@@ -343,6 +551,7 @@ class EditorAgent(BaseAgent):
             add_subtitles=input_data.get("add_subtitles", True),
             bgm_path=input_data.get("bgm_path"),
             bgm_volume=input_data.get("bgm_volume", 0.3),
+            single_pass=input_data.get("single_pass", True),
             messages=[],
         )
 
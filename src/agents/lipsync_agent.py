@@ -12,6 +12,7 @@ from langgraph.graph import END, StateGraph
 from pydantic import Field
 
 from src.agents.base_agent import AgentState, BaseAgent
+from src.services.base import StreamTarget
 from src.services.factory import get_service_factory
 from src.services.lipsync.base import LipsyncRequest
 
@@ -45,8 +46,8 @@ class LipsyncAgent(BaseAgent):
         """构建口型同步工作流图"""
         graph = StateGraph(LipsyncState)
 
-        graph.add_node("generate_lipsync", self._generate_lipsync)
-        graph.add_node("save_results", self._save_results)
+        graph.add_node("generate_lipsync", self._traced_node("generate_lipsync", self._generate_lipsync))
+        graph.add_node("save_results", self._traced_node("save_results", self._save_results))
 
         graph.set_entry_point("generate_lipsync")
         graph.add_edge("generate_lipsync", "save_results")
@@ -68,69 +69,97 @@ class LipsyncAgent(BaseAgent):
                 return audio
         return None
 
-    async def _generate_lipsync(self, state: LipsyncState) -> dict[str, Any]:
-        """生成口型同步视频"""
+    def _build_request(self, image_path: str, audio_path: str) -> LipsyncRequest:
+        """构建口型同步请求"""
+        return LipsyncRequest(
+            image_path=image_path,
+            audio_path=audio_path,
+            enhance_face=True,
+            still_mode=False,
+        )
+
+    async def generate_shot_lipsync(
+        self,
+        rendered: dict[str, Any],
+        audio: dict[str, Any] | None,
+        project_id: str,
+    ) -> dict[str, Any]:
+        """
+        生成并保存单个镜头的口型同步视频
+
+        Args:
+            rendered: 该镜头的渲染结果
+            audio: 该镜头的配音结果，没有对白时为 None
+            project_id: 项目 ID
+
+        Returns:
+            与 lipsync_videos 中条目格式相同的结果
+        """
+        shot_id = rendered.get("shot_id")
+
+        if not audio or not audio.get("has_dialog"):
+            return {"shot_id": shot_id, "has_lipsync": False, "reason": "no_dialog"}
+        if not audio.get("success"):
+            return {"shot_id": shot_id, "has_lipsync": False, "reason": "audio_failed"}
+        if not rendered.get("success") or not rendered.get("image_path"):
+            return {"shot_id": shot_id, "has_lipsync": False, "reason": "no_image"}
+        if not audio.get("audio_path"):
+            return {"shot_id": shot_id, "has_lipsync": False, "reason": "no_audio_path"}
+
         lipsync_service = self.service_factory.get_lipsync_service()
-        generated_lipsync = []
-
-        for audio in state.audio_results:
-            shot_id = audio.get("shot_id")
-
-            # 检查是否有对白
-            if not audio.get("has_dialog") or not audio.get("success"):
-                generated_lipsync.append({
-                    "shot_id": shot_id,
-                    "has_lipsync": False,
-                    "reason": "no_dialog" if not audio.get("has_dialog") else "audio_failed",
-                })
-                continue
-
-            # 查找对应的图像
-            image_path = self._find_image_for_shot(shot_id, state.rendered_shots)
-            if not image_path:
-                generated_lipsync.append({
-                    "shot_id": shot_id,
-                    "has_lipsync": False,
-                    "reason": "no_image",
-                })
-                continue
-
-            audio_path = audio.get("audio_path")
-            if not audio_path:
-                generated_lipsync.append({
-                    "shot_id": shot_id,
-                    "has_lipsync": False,
-                    "reason": "no_audio_path",
-                })
-                continue
-
-            # 生成口型同步视频
-            request = LipsyncRequest(
-                image_path=image_path,
-                audio_path=audio_path,
-                enhance_face=True,
-                still_mode=False,
-            )
+        request = self._build_request(rendered["image_path"], audio["audio_path"])
+        # 视频由服务直接流式写入存储，状态中只保留路径
+        request.output = StreamTarget(
+            project_id=project_id,
+            asset_type="lipsync",
+            filename=f"lipsync_{audio.get('scene_id')}_{shot_id}.mp4",
+            content_type="video/mp4",
+        )
 
+        async with lipsync_service.semaphore():
             result = await lipsync_service.generate(request)
 
-            if result.success:
-                generated_lipsync.append({
-                    "shot_id": shot_id,
-                    "scene_id": audio.get("scene_id"),
-                    "video_data": result.data.video_data,
-                    "duration": result.data.duration,
-                    "has_lipsync": True,
-                    "success": True,
-                })
-            else:
-                generated_lipsync.append({
-                    "shot_id": shot_id,
-                    "scene_id": audio.get("scene_id"),
-                    "has_lipsync": True,
-                    "error": result.error,
-                    "success": False,
-                })
+        if not result.success:
+            return {
+                "shot_id": shot_id,
+                "scene_id": audio.get("scene_id"),
+                "has_lipsync": True,
+                "error": result.error,
+                "success": False,
+            }
+
+        path = result.data.object_path
+        if not path:
+            # 服务不支持流式输出时回退为整体上传
+            path = await request.output.write_bytes(result.data.video_data)
+
+        return {
+            "shot_id": shot_id,
+            "scene_id": audio.get("scene_id"),
+            "lipsync_video_path": path,
+            "duration": result.data.duration,
+            "has_lipsync": True,
+            "success": True,
+        }
+
+    async def _generate_lipsync(self, state: LipsyncState) -> dict[str, Any]:
+        """
+        生成口型同步视频
+
+        按 lipsync 服务的 max_concurrency 并发生成，每个镜头完成后立即保存，
+        结果按配音顺序返回。
+        """
+        rendered_by_shot = {r.get("shot_id"): r for r in state.rendered_shots}
+
+        generated_lipsync = await self._map_with_progress(
+            state.audio_results,
+            lambda audio: self.generate_shot_lipsync(
+                rendered_by_shot.get(audio.get("shot_id"), {"shot_id": audio.get("shot_id")}),
+                audio,
+                state.project_id,
+            ),
+            lambda audio: f"镜头 {audio.get('shot_id')} 口型同步",
+        )
 
         return {
             "current_step": "generate_lipsync",
@@ -138,46 +167,8 @@ class LipsyncAgent(BaseAgent):
         }
 
     async def _save_results(self, state: LipsyncState) -> dict[str, Any]:
-        """保存口型同步结果"""
-        from src.storage import get_storage
-
-        storage = get_storage()
-        lipsync_results = []
-
-        for lipsync in state.generated_lipsync:
-            if not lipsync.get("has_lipsync"):
-                lipsync_results.append({
-                    "shot_id": lipsync.get("shot_id"),
-                    "has_lipsync": False,
-                    "reason": lipsync.get("reason"),
-                })
-                continue
-
-            if lipsync.get("success") and lipsync.get("video_data"):
-                path = storage.upload_bytes(
-                    data=lipsync["video_data"],
-                    project_id=state.project_id,
-                    asset_type="lipsync",
-                    filename=f"lipsync_{lipsync['scene_id']}_{lipsync['shot_id']}.mp4",
-                    content_type="video/mp4",
-                )
-
-                lipsync_results.append({
-                    "shot_id": lipsync["shot_id"],
-                    "scene_id": lipsync["scene_id"],
-                    "lipsync_video_path": path,
-                    "duration": lipsync.get("duration", 0),
-                    "has_lipsync": True,
-                    "success": True,
-                })
-            else:
-                lipsync_results.append({
-                    "shot_id": lipsync.get("shot_id"),
-                    "scene_id": lipsync.get("scene_id"),
-                    "has_lipsync": True,
-                    "error": lipsync.get("error", "Unknown error"),
-                    "success": False,
-                })
+        """汇总口型同步结果（视频已在生成时逐个保存）"""
+        lipsync_results = state.generated_lipsync
 
         return {
             "current_step": "complete",
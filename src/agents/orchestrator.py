@@ -3,7 +3,12 @@ Agent Orchestrator - 主编排器
 
 负责串联所有 Agent，执行完整的漫剧生成流程：
 剧本 → 角色 → 分镜 → 渲染 → 视频 → 配音 → 口型 → 剪辑
+
+各阶段按依赖图调度：配音只依赖分镜和角色，可与渲染/视频并发执行。
+重新生成时逐镜头对比新旧分镜，只重新执行内容有变化的镜头，其余复用已有资产。
 """
+import asyncio
+import time
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, Callable, Optional
@@ -16,6 +21,10 @@ from src.agents.video_agent import VideoAgent
 from src.agents.voice_agent import VoiceAgent
 from src.agents.lipsync_agent import LipsyncAgent
 from src.agents.editor_agent import EditorAgent
+from src.services.llm.cache import llm_cache_bypass
+from src.observability.metrics import STAGE_DURATION
+from src.observability.tracing import span
+from src.services.metering import UsageMeter, metering, metering_stage
 
 
 class GenerationStage(str, Enum):
@@ -32,6 +41,181 @@ class GenerationStage(str, Enum):
     FAILED = "failed"
 
 
+# 阶段依赖图：阶段 -> 其直接依赖的阶段
+STAGE_DEPENDENCIES: dict[GenerationStage, tuple[GenerationStage, ...]] = {
+    GenerationStage.SCRIPT: (),
+    GenerationStage.CHARACTER: (GenerationStage.SCRIPT,),
+    GenerationStage.STORYBOARD: (GenerationStage.SCRIPT, GenerationStage.CHARACTER),
+    GenerationStage.RENDER: (GenerationStage.STORYBOARD, GenerationStage.CHARACTER),
+    GenerationStage.VIDEO: (GenerationStage.RENDER, GenerationStage.STORYBOARD),
+    GenerationStage.VOICE: (GenerationStage.STORYBOARD, GenerationStage.CHARACTER),
+    GenerationStage.LIPSYNC: (GenerationStage.RENDER, GenerationStage.VOICE),
+    GenerationStage.EDIT: (
+        GenerationStage.STORYBOARD,
+        GenerationStage.VIDEO,
+        GenerationStage.VOICE,
+        GenerationStage.LIPSYNC,
+    ),
+}
+
+
+# 逐镜头执行的阶段（可按镜头复用已有资产）
+SHOT_STAGES: tuple[GenerationStage, ...] = (
+    GenerationStage.RENDER,
+    GenerationStage.VIDEO,
+    GenerationStage.VOICE,
+    GenerationStage.LIPSYNC,
+)
+
+# 由 LLM 生成的阶段（从这些阶段重新生成时不读取 LLM 响应缓存）
+LLM_STAGES: tuple[GenerationStage, ...] = (
+    GenerationStage.SCRIPT,
+    GenerationStage.CHARACTER,
+    GenerationStage.STORYBOARD,
+)
+
+# 分镜字段变化 -> 需要重新执行的镜头级阶段（下游阶段按依赖图自动传播）
+SHOT_FIELD_STAGES: dict[str, tuple[GenerationStage, ...]] = {
+    "image_prompt": (GenerationStage.RENDER,),
+    "negative_prompt": (GenerationStage.RENDER,),
+    "characters": (GenerationStage.RENDER,),
+    "camera_movement": (GenerationStage.VIDEO,),
+    "action": (GenerationStage.VIDEO,),
+    "duration": (GenerationStage.VIDEO,),
+    "dialog": (GenerationStage.VOICE,),
+}
+
+
+def _shot_downstream(stage: GenerationStage) -> set[GenerationStage]:
+    """获取镜头级阶段的所有下游阶段（含自身）"""
+    stages = {stage}
+    for other in SHOT_STAGES:
+        if stage in STAGE_DEPENDENCIES[other]:
+            stages |= _shot_downstream(other)
+    return stages
+
+
+def diff_storyboards(
+    previous: list[dict[str, Any]],
+    current: list[dict[str, Any]],
+) -> dict[Any, set[GenerationStage]]:
+    """
+    逐镜头对比新旧分镜
+
+    Returns:
+        shot_id -> 需要重新执行的镜头级阶段（已包含下游阶段）
+    """
+    previous_by_id = {shot.get("shot_id"): shot for shot in previous}
+    dirty: dict[Any, set[GenerationStage]] = {}
+
+    for shot in current:
+        shot_id = shot.get("shot_id")
+        old = previous_by_id.get(shot_id)
+        if old is None:
+            dirty[shot_id] = set(SHOT_STAGES)
+            continue
+
+        stages: set[GenerationStage] = set()
+        for field_name, affected in SHOT_FIELD_STAGES.items():
+            if old.get(field_name) != shot.get(field_name):
+                for stage in affected:
+                    stages |= _shot_downstream(stage)
+        dirty[shot_id] = stages
+
+    return dirty
+
+
+def _reused_result(
+    stage: GenerationStage,
+    shot: dict[str, Any],
+    assets: dict[str, Any],
+) -> Optional[dict[str, Any]]:
+    """用已有资产构造与 Agent 输出格式相同的结果，资产缺失时返回 None"""
+    base = {"shot_id": shot.get("shot_id"), "scene_id": shot.get("scene_id"), "reused": True}
+
+    if stage == GenerationStage.RENDER and assets.get("image_path"):
+        return {**base, "image_path": assets["image_path"], "seed": -1, "success": True}
+
+    if stage == GenerationStage.VIDEO and assets.get("video_path"):
+        return {
+            **base,
+            "video_path": assets["video_path"],
+            "duration": assets.get("duration", shot.get("duration", 5)),
+            "success": True,
+        }
+
+    dialog = shot.get("dialog") or {}
+    if stage == GenerationStage.VOICE and assets.get("audio_path") and dialog.get("text"):
+        return {
+            **base,
+            "speaker": dialog.get("speaker", ""),
+            "text": dialog.get("text", ""),
+            "audio_path": assets["audio_path"],
+            "has_dialog": True,
+            "success": True,
+        }
+
+    if stage == GenerationStage.LIPSYNC and assets.get("lipsync_video_path"):
+        return {
+            **base,
+            "lipsync_video_path": assets["lipsync_video_path"],
+            "duration": assets.get("duration", shot.get("duration", 5)),
+            "has_lipsync": True,
+            "success": True,
+        }
+
+    return None
+
+
+def plan_shot_reuse(
+    previous: list[dict[str, Any]],
+    current: list[dict[str, Any]],
+    shot_assets: dict[Any, dict[str, Any]],
+    force_stages: tuple[GenerationStage, ...] = (),
+    force_shot_ids: Optional[list[Any]] = None,
+) -> dict[GenerationStage, dict[Any, dict[str, Any]]]:
+    """
+    计算可复用的镜头结果
+
+    Args:
+        previous: 上次生成使用的分镜
+        current: 本次分镜
+        shot_assets: shot_id -> 已有资产路径（image_path/video_path/audio_path/lipsync_video_path）
+        force_stages: 强制重新执行的镜头级阶段
+        force_shot_ids: 强制范围，None 表示所有镜头
+
+    Returns:
+        阶段 -> shot_id -> 复用结果
+    """
+    dirty = diff_storyboards(previous, current)
+
+    for stage in force_stages:
+        if stage not in SHOT_STAGES:
+            continue
+        for shot_id in dirty:
+            if force_shot_ids is None or shot_id in force_shot_ids:
+                dirty[shot_id] |= _shot_downstream(stage)
+
+    reuse: dict[GenerationStage, dict[Any, dict[str, Any]]] = {stage: {} for stage in SHOT_STAGES}
+
+    for shot in current:
+        shot_id = shot.get("shot_id")
+        assets = shot_assets.get(shot_id)
+        if not assets:
+            continue
+
+        stages = dirty.get(shot_id, set())
+        for stage in SHOT_STAGES:
+            reused = None if stage in stages else _reused_result(stage, shot, assets)
+            if reused:
+                reuse[stage][shot_id] = reused
+            else:
+                # 无法复用的阶段，其下游也必须重新执行
+                stages |= _shot_downstream(stage)
+
+    return reuse
+
+
 @dataclass
 class GenerationProgress:
     """生成进度"""
@@ -50,14 +234,106 @@ class GenerationConfig:
     add_subtitles: bool = True
     bgm_path: Optional[str] = None
     bgm_volume: float = 0.3
+    # 剪辑时用一个 filter_complex 完成拼接/BGM/字幕，只编码一次
+    single_pass_edit: bool = True
+    # 不使用 LLM 响应缓存，重新调用 LLM（用户明确要求新结果时）
+    fresh_llm: bool = False
+    # 流式生成剧本：每个角色解析完成即开始角色设计，场景进度实时推送
+    stream_script: bool = False
+    # 跳过故事分析，一次 LLM 调用生成剧本
+    single_call_script: bool = False
 
     # 跳过某些阶段（用于调试或重新生成）
     skip_script: bool = False
     skip_character: bool = False
+    skip_storyboard: bool = False
     skip_video: bool = False
     skip_voice: bool = False
     skip_lipsync: bool = False
 
+    # 逐镜头流式流水线：每个镜头完成上一步后立即进入 渲染 → 图生视频 → 口型同步，
+    # 不再等待整个阶段全部完成；各步并发度由对应后端的 max_concurrency 限制
+    stream_shots: bool = False
+
+    # 强制重新执行的镜头级阶段（及其下游）；force_shot_ids 为 None 表示所有镜头
+    force_stages: list[str] = field(default_factory=list)
+    force_shot_ids: Optional[list[Any]] = None
+
+
+@dataclass
+class _GenerationRun:
+    """单次生成的运行上下文，保存各阶段输出"""
+    project_id: str
+    user_input: str
+    config: GenerationConfig
+    existing_data: dict[str, Any]
+    outputs: dict[GenerationStage, dict[str, Any]] = field(default_factory=dict)
+    tasks: dict[GenerationStage, asyncio.Task] = field(default_factory=dict)
+    # 流式流水线中由渲染阶段顺带产出的视频/口型结果
+    streamed: dict[GenerationStage, dict[str, Any]] = field(default_factory=dict)
+    # 可复用的镜头结果：阶段 -> shot_id -> 结果（分镜阶段完成后计算）
+    reuse: dict[GenerationStage, dict[Any, dict[str, Any]]] = field(default_factory=dict)
+    # 从检查点恢复的阶段输出和镜头结果（任务重试时）
+    checkpointed: dict[GenerationStage, dict[str, Any]] = field(default_factory=dict)
+    checkpointed_units: dict[GenerationStage, dict[Any, dict[str, Any]]] = field(default_factory=dict)
+    # 流式剧本生成期间提前启动的角色设计：角色名 -> (角色信息, 设计任务)
+    character_designs: dict[str, tuple[dict[str, Any], asyncio.Task]] = field(default_factory=dict)
+
+    async def wait_for(self, stage: GenerationStage) -> dict[str, Any]:
+        """等待某个阶段完成并返回其输出"""
+        return await self.tasks[stage]
+
+    def reused(self, stage: GenerationStage, shot_id: Any) -> Optional[dict[str, Any]]:
+        """获取镜头在某阶段的复用结果"""
+        return self.reuse.get(stage, {}).get(shot_id)
+
+    def forced(self, stage: GenerationStage, shot_id: Any) -> bool:
+        """镜头是否在本次强制重新执行某阶段的范围内"""
+        return stage.value in self.config.force_stages and (
+            self.config.force_shot_ids is None or shot_id in self.config.force_shot_ids
+        )
+
+    def mark_regenerate(self, shot: dict[str, Any]) -> dict[str, Any]:
+        """强制重新渲染的镜头加上 regenerate 标记（换新种子并跳过渲染缓存）"""
+        if self.forced(GenerationStage.RENDER, shot.get("shot_id")):
+            return {**shot, "regenerate": True}
+        return shot
+
+    def merge_reused(
+        self,
+        stage: GenerationStage,
+        results: list[dict[str, Any]],
+    ) -> list[dict[str, Any]]:
+        """按分镜顺序合并新生成结果和复用结果"""
+        by_shot = {r.get("shot_id"): r for r in results}
+        merged = []
+        for shot in self.storyboard:
+            shot_id = shot.get("shot_id")
+            result = by_shot.get(shot_id) or self.reused(stage, shot_id)
+            if result:
+                merged.append(result)
+        return merged
+
+    @property
+    def script(self) -> dict[str, Any]:
+        return self.outputs[GenerationStage.SCRIPT].get("script", {})
+
+    @property
+    def character_assets(self) -> list[dict[str, Any]]:
+        return self.outputs[GenerationStage.CHARACTER].get("characters", [])
+
+    @property
+    def storyboard(self) -> list[dict[str, Any]]:
+        return self.outputs[GenerationStage.STORYBOARD].get("shots", [])
+
+    @property
+    def rendered_shots(self) -> list[dict[str, Any]]:
+        return self.outputs[GenerationStage.RENDER].get("rendered_shots", [])
+
+    @property
+    def audio_results(self) -> list[dict[str, Any]]:
+        return self.outputs[GenerationStage.VOICE].get("audio_files", [])
+
 
 class MangaForgeOrchestrator:
     """漫剧生成编排器"""
@@ -66,6 +342,7 @@ class MangaForgeOrchestrator:
         self,
         service_factory: Optional[Any] = None,
         progress_callback: Optional[Callable] = None,
+        checkpoint: Optional[Any] = None,
     ):
         """
         初始化编排器
@@ -74,9 +351,12 @@ class MangaForgeOrchestrator:
             service_factory: 服务工厂实例
             progress_callback: 进度回调函数，支持同步或异步
                 签名: (stage: str, progress: float, message: str, details: dict = None)
+            checkpoint: 检查点存储（需提供 load/save_stage/save_unit），
+                用于任务重试时跳过已完成的阶段和镜头
         """
         self.service_factory = service_factory
         self.progress_callback = progress_callback
+        self.checkpoint = checkpoint
 
         # 初始化所有 Agent
         self.script_agent = ScriptAgent()
@@ -88,6 +368,90 @@ class MangaForgeOrchestrator:
         self.lipsync_agent = LipsyncAgent()
         self.editor_agent = EditorAgent()
 
+        # Agent 内部进度转发到对应阶段
+        self.script_agent.progress_callback = self._stage_progress_reporter(GenerationStage.SCRIPT)
+        self.character_agent.progress_callback = self._stage_progress_reporter(GenerationStage.CHARACTER)
+        self.render_agent.progress_callback = self._stage_progress_reporter(GenerationStage.RENDER)
+        self.video_agent.progress_callback = self._stage_progress_reporter(GenerationStage.VIDEO)
+        self.voice_agent.progress_callback = self._stage_progress_reporter(GenerationStage.VOICE)
+
+        # Agent 每完成一个镜头即写入检查点
+        self.render_agent.unit_callback = self._stage_unit_recorder(GenerationStage.RENDER)
+        self.video_agent.unit_callback = self._stage_unit_recorder(GenerationStage.VIDEO)
+        self.voice_agent.unit_callback = self._stage_unit_recorder(GenerationStage.VOICE)
+        self.lipsync_agent.unit_callback = self._stage_unit_recorder(GenerationStage.LIPSYNC)
+
+    def _stage_progress_reporter(self, stage: GenerationStage) -> Callable:
+        """创建将 Agent 内部进度转发到指定阶段的回调"""
+        async def report(progress: float, message: str, data: dict[str, Any]) -> None:
+            await self._report_progress(stage, int(progress), message, data)
+
+        return report
+
+    def _stage_unit_recorder(self, stage: GenerationStage) -> Callable:
+        """创建将 Agent 完成的镜头结果写入检查点的回调"""
+        async def record(result: dict[str, Any]) -> None:
+            await self._save_unit_checkpoint(stage, result)
+
+        return record
+
+    async def _save_unit_checkpoint(self, stage: GenerationStage, result: dict[str, Any]) -> None:
+        """保存镜头检查点（只保存新生成的成功结果；写入失败不影响生成，但该镜头重试时需重新生成）"""
+        if not self.checkpoint or not result.get("success") or result.get("reused"):
+            return
+        try:
+            await self.checkpoint.save_unit(stage.value, result)
+        except Exception as e:
+            print(
+                f"Warning: failed to save checkpoint for stage {stage.value} "
+                f"shot {result.get('shot_id')}: {e}"
+            )
+
+    async def _save_stage_checkpoint(self, stage: GenerationStage, output: dict[str, Any]) -> None:
+        """保存阶段检查点（写入失败不影响生成，但该阶段重试时需重新执行）"""
+        if not self.checkpoint:
+            return
+        try:
+            await self.checkpoint.save_stage(stage.value, output)
+        except Exception as e:
+            print(f"Warning: failed to save checkpoint for stage {stage.value}: {e}")
+
+    async def _load_checkpoint(self, run: "_GenerationRun") -> None:
+        """从检查点恢复已完成的阶段和镜头"""
+        if not self.checkpoint:
+            return
+        try:
+            stages, units = await self.checkpoint.load()
+        except Exception as e:
+            print(f"Warning: failed to load checkpoint, all stages will be re-run: {e}")
+            return
+
+        run.checkpointed = {GenerationStage(stage): output for stage, output in stages.items()}
+        run.checkpointed_units = {
+            GenerationStage(stage): {
+                shot_id: {**result, "reused": True} for shot_id, result in results.items()
+            }
+            for stage, results in units.items()
+        }
+
+    def _plan_reuse(self, run: "_GenerationRun") -> None:
+        """
+        分镜确定后计算可复用的镜头结果
+
+        先对比上次生成的分镜复用已有资产，再叠加检查点中本任务已完成的镜头。
+        """
+        if run.existing_data.get("shot_assets"):
+            run.reuse = plan_shot_reuse(
+                previous=run.existing_data.get("previous_storyboard", []),
+                current=run.storyboard,
+                shot_assets=run.existing_data["shot_assets"],
+                force_stages=tuple(GenerationStage(s) for s in run.config.force_stages),
+                force_shot_ids=run.config.force_shot_ids,
+            )
+
+        for stage, results in run.checkpointed_units.items():
+            run.reuse.setdefault(stage, {}).update(results)
+
     async def _report_progress(
         self,
         stage: GenerationStage,
@@ -97,8 +461,6 @@ class MangaForgeOrchestrator:
     ) -> None:
         """报告进度"""
         if self.progress_callback:
-            import asyncio
-
             # 支持同步和异步回调
             stage_str = stage.value if isinstance(stage, GenerationStage) else str(stage)
 
@@ -114,181 +476,481 @@ class MangaForgeOrchestrator:
                     )
                 )
 
-    async def generate(
-        self,
-        project_id: str,
-        user_input: str,
-        config: Optional[GenerationConfig] = None,
-        existing_data: Optional[dict[str, Any]] = None,
-    ) -> dict[str, Any]:
-        """
-        执行完整的漫剧生成流程
+    def _stage_runners(self) -> dict[GenerationStage, Callable]:
+        """各阶段的执行函数"""
+        return {
+            GenerationStage.SCRIPT: self._run_script_stage,
+            GenerationStage.CHARACTER: self._run_character_stage,
+            GenerationStage.STORYBOARD: self._run_storyboard_stage,
+            GenerationStage.RENDER: self._run_render_stage,
+            GenerationStage.VIDEO: self._run_video_stage,
+            GenerationStage.VOICE: self._run_voice_stage,
+            GenerationStage.LIPSYNC: self._run_lipsync_stage,
+            GenerationStage.EDIT: self._run_edit_stage,
+        }
 
-        Args:
-            project_id: 项目 ID
-            user_input: 用户输入的故事/剧本
-            config: 生成配置
-            existing_data: 已有数据（用于部分重新生成）
+    async def _run_stage_graph(self, run: "_GenerationRun") -> None:
+        """
+        按依赖图调度所有阶段
 
-        Returns:
-            生成结果，包含所有阶段的输出
+        每个阶段在 STAGE_DEPENDENCIES 中声明的依赖全部完成后立即启动，
+        互不依赖的阶段（如配音与渲染/视频）并发执行。任一阶段失败时取消其余阶段。
+        检查点中已完成的阶段直接使用保存的输出。
         """
-        config = config or GenerationConfig()
-        existing_data = existing_data or {}
+        runners = self._stage_runners()
+        tasks = run.tasks
 
-        result = {
-            "project_id": project_id,
-            "success": False,
-            "stages": {},
-            "final_video": None,
-            "error": None,
-        }
+        async def run_stage(stage: GenerationStage) -> dict[str, Any]:
+            dependencies = STAGE_DEPENDENCIES[stage]
+            if dependencies:
+                await asyncio.gather(*(tasks[dep] for dep in dependencies))
 
-        try:
-            # 1. 剧本生成
-            if config.skip_script and "script" in existing_data:
-                script_result = existing_data["script"]
-                await self._report_progress(GenerationStage.SCRIPT, 100, "使用已有剧本")
+            if stage in run.checkpointed:
+                output = run.checkpointed[stage]
+                await self._report_progress(stage, 100, "从检查点恢复")
             else:
-                await self._report_progress(GenerationStage.SCRIPT, 0, "开始解析剧本...")
+                started = time.monotonic()
+                status = "failed"
+                try:
+                    with metering_stage(stage.value), span(f"stage.{stage.value}", stage=stage.value):
+                        output = await runners[stage](run)
+                    status = "success"
+                finally:
+                    STAGE_DURATION.labels(stage.value, status).observe(time.monotonic() - started)
+                await self._save_stage_checkpoint(stage, output)
 
-                script_result = await self.script_agent.run({
-                    "user_input": user_input,
-                    "style": config.style,
-                    "target_duration": config.target_duration,
-                    "aspect_ratio": config.aspect_ratio,
-                })
+            run.outputs[stage] = output
+            if stage == GenerationStage.STORYBOARD:
+                self._plan_reuse(run)
+            return output
 
-                if script_result.get("error"):
-                    raise Exception(f"剧本生成失败: {script_result['error']}")
+        for stage in runners:
+            tasks[stage] = asyncio.create_task(run_stage(stage), name=f"stage:{stage.value}")
 
-                await self._report_progress(GenerationStage.SCRIPT, 100, "剧本生成完成")
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            self._cancel_character_designs(run)
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
 
-            result["stages"]["script"] = script_result
-            result["script"] = script_result.get("script", {})
-            script = script_result.get("script", {})
-            characters = script.get("characters", [])
+    async def _run_script_stage(self, run: "_GenerationRun") -> dict[str, Any]:
+        """1. 剧本生成"""
+        config = run.config
 
-            # 2. 角色生成
-            if config.skip_character and "character" in existing_data:
-                character_result = existing_data["character"]
-                await self._report_progress(GenerationStage.CHARACTER, 100, "使用已有角色")
-            else:
-                await self._report_progress(GenerationStage.CHARACTER, 0, "开始生成角色...")
+        if config.skip_script and "script" in run.existing_data:
+            await self._report_progress(GenerationStage.SCRIPT, 100, "使用已有剧本")
+            return run.existing_data["script"]
+
+        await self._report_progress(GenerationStage.SCRIPT, 0, "开始解析剧本...")
+
+        if config.stream_script:
+            self.script_agent.event_callback = self._script_event_handler(run)
+        try:
+            script_result = await self.script_agent.run({
+                "user_input": run.user_input,
+                "style": config.style,
+                "target_duration": config.target_duration,
+                "aspect_ratio": config.aspect_ratio,
+                "stream": config.stream_script,
+                "single_call": config.single_call_script,
+            })
+        finally:
+            self.script_agent.event_callback = None
+
+        if script_result.get("error"):
+            self._cancel_character_designs(run)
+            raise Exception(f"剧本生成失败: {script_result['error']}")
+
+        await self._report_progress(GenerationStage.SCRIPT, 100, "剧本生成完成")
+        return script_result
+
+    def _script_event_handler(self, run: "_GenerationRun") -> Callable:
+        """创建流式剧本事件回调：角色解析完成后立即在后台开始设计"""
+        config = run.config
+        start_designs = not (config.skip_character and "character" in run.existing_data)
+
+        async def handle(kind: str, item: dict[str, Any]) -> None:
+            if kind != "character" or not start_designs:
+                return
+            name = item.get("name", "Unknown")
+            if name in run.character_designs:
+                return
+            # 任务复制当前上下文，用量归入角色阶段
+            with metering_stage(GenerationStage.CHARACTER.value):
+                task = asyncio.create_task(
+                    self.character_agent.design_character(item, config.style),
+                    name=f"character:{name}",
+                )
+            run.character_designs[name] = (item, task)
+            await self._report_progress(GenerationStage.CHARACTER, 0, f"开始设计角色 {name}")
+
+        return handle
+
+    def _cancel_character_designs(self, run: "_GenerationRun") -> None:
+        for _, task in run.character_designs.values():
+            task.cancel()
+        run.character_designs.clear()
+
+    async def _run_character_stage(self, run: "_GenerationRun") -> dict[str, Any]:
+        """2. 角色生成"""
+        config = run.config
 
-                character_result = await self.character_agent.run({
-                    "characters": characters,
-                    "style": config.style,
-                    "project_id": project_id,
-                })
+        if config.skip_character and "character" in run.existing_data:
+            self._cancel_character_designs(run)
+            await self._report_progress(GenerationStage.CHARACTER, 100, "使用已有角色")
+            return run.existing_data["character"]
 
-                await self._report_progress(GenerationStage.CHARACTER, 100, "角色生成完成")
+        await self._report_progress(GenerationStage.CHARACTER, 0, "开始生成角色...")
 
-            result["stages"]["character"] = character_result
-            character_assets = character_result.get("characters", [])
+        # 只复用与最终剧本中角色信息一致的提前设计结果
+        characters = run.script.get("characters", [])
+        designs = {}
+        for char in characters:
+            name = char.get("name", "Unknown")
+            streamed, task = run.character_designs.pop(name, (None, None))
+            if task and streamed == char:
+                designs[name] = task
+            elif task:
+                task.cancel()
+        self._cancel_character_designs(run)
 
-            # 3. 分镜规划
+        character_result = await self.character_agent.run({
+            "characters": characters,
+            "style": config.style,
+            "project_id": run.project_id,
+            "designs": designs,
+        })
+
+        await self._report_progress(GenerationStage.CHARACTER, 100, "角色生成完成")
+        return character_result
+
+    async def _run_storyboard_stage(self, run: "_GenerationRun") -> dict[str, Any]:
+        """3. 分镜规划"""
+        if run.config.skip_storyboard and "storyboard" in run.existing_data:
+            storyboard_result = run.existing_data["storyboard"]
+            await self._report_progress(GenerationStage.STORYBOARD, 100, "使用已有分镜")
+        else:
             await self._report_progress(GenerationStage.STORYBOARD, 0, "开始规划分镜...")
 
             storyboard_result = await self.storyboard_agent.run({
-                "script": script,
-                "characters": character_assets,
-                "style": config.style,
-                "aspect_ratio": config.aspect_ratio,
+                "script": run.script,
+                "characters": run.character_assets,
+                "style": run.config.style,
+                "aspect_ratio": run.config.aspect_ratio,
             })
 
             await self._report_progress(GenerationStage.STORYBOARD, 100, "分镜规划完成")
-            result["stages"]["storyboard"] = storyboard_result
-            result["storyboard"] = storyboard_result.get("shots", [])
-            storyboard = storyboard_result.get("shots", [])
 
-            # 4. 图像渲染
-            await self._report_progress(GenerationStage.RENDER, 0, "开始渲染分镜图...")
+        return storyboard_result
 
-            render_result = await self.render_agent.run({
-                "storyboard": storyboard,
-                "characters": character_assets,
-                "style": config.style,
-                "aspect_ratio": config.aspect_ratio,
-                "project_id": project_id,
-            })
+    async def _run_with_reuse(
+        self,
+        run: "_GenerationRun",
+        stage: GenerationStage,
+        items: list[dict[str, Any]],
+        result_key: str,
+        execute: Callable,
+    ) -> dict[str, Any]:
+        """
+        只对无法复用的镜头执行阶段，再按分镜顺序合并复用结果
+
+        Args:
+            items: 阶段的逐镜头输入（含 shot_id）
+            result_key: 阶段输出中结果列表的键
+            execute: 接收待执行条目、返回阶段输出的协程函数
+        """
+        reusable = run.reuse.get(stage, {})
+        if not reusable:
+            return await execute(items)
 
-            await self._report_progress(GenerationStage.RENDER, 100, "分镜图渲染完成")
-            result["stages"]["render"] = render_result
-            rendered_shots = render_result.get("rendered_shots", [])
+        pending = [item for item in items if item.get("shot_id") not in reusable]
+        await self._report_progress(
+            stage, 0, f"复用 {len(items) - len(pending)} 个镜头的已有结果",
+            {"reused": len(items) - len(pending), "pending": len(pending)},
+        )
 
-            # 5. 视频生成
-            if config.skip_video:
-                video_result = {"videos": []}
-                await self._report_progress(GenerationStage.VIDEO, 100, "跳过视频生成")
-            else:
-                await self._report_progress(GenerationStage.VIDEO, 0, "开始生成视频...")
+        output = await execute(pending) if pending else {}
+        if output.get("error"):
+            return output
 
-                video_result = await self.video_agent.run({
-                    "rendered_shots": rendered_shots,
-                    "storyboard": storyboard,
-                    "aspect_ratio": config.aspect_ratio,
-                    "project_id": project_id,
-                })
+        return {
+            **output,
+            result_key: run.merge_reused(stage, output.get(result_key, [])),
+            "reused_count": len(items) - len(pending),
+        }
 
-                await self._report_progress(GenerationStage.VIDEO, 100, "视频生成完成")
+    async def _run_render_stage(self, run: "_GenerationRun") -> dict[str, Any]:
+        """4. 图像渲染"""
+        if run.config.stream_shots:
+            return await self._run_shot_pipeline(run)
 
-            result["stages"]["video"] = video_result
-            video_results = video_result.get("videos", [])
+        await self._report_progress(GenerationStage.RENDER, 0, "开始渲染分镜图...")
 
-            # 6. 配音生成
-            if config.skip_voice:
-                voice_result = {"audio_files": []}
-                await self._report_progress(GenerationStage.VOICE, 100, "跳过配音生成")
-            else:
-                await self._report_progress(GenerationStage.VOICE, 0, "开始生成配音...")
+        render_result = await self._run_with_reuse(
+            run,
+            GenerationStage.RENDER,
+            run.storyboard,
+            "rendered_shots",
+            lambda shots: self.render_agent.run({
+                "storyboard": [run.mark_regenerate(shot) for shot in shots],
+                "characters": run.character_assets,
+                "style": run.config.style,
+                "aspect_ratio": run.config.aspect_ratio,
+                "project_id": run.project_id,
+            }),
+        )
 
-                voice_result = await self.voice_agent.run({
-                    "storyboard": storyboard,
-                    "characters": character_assets,
-                    "project_id": project_id,
-                })
+        await self._report_progress(GenerationStage.RENDER, 100, "分镜图渲染完成")
+        return render_result
 
-                await self._report_progress(GenerationStage.VOICE, 100, "配音生成完成")
+    async def _run_video_stage(self, run: "_GenerationRun") -> dict[str, Any]:
+        """5. 视频生成"""
+        if run.config.skip_video:
+            await self._report_progress(GenerationStage.VIDEO, 100, "跳过视频生成")
+            return {"videos": []}
 
-            result["stages"]["voice"] = voice_result
-            audio_results = voice_result.get("audio_files", [])
+        if run.config.stream_shots and GenerationStage.VIDEO in run.streamed:
+            return run.streamed[GenerationStage.VIDEO]
 
-            # 7. 口型同步
-            if config.skip_lipsync or config.skip_voice:
-                lipsync_result = {"lipsync_videos": []}
-                await self._report_progress(GenerationStage.LIPSYNC, 100, "跳过口型同步")
-            else:
-                await self._report_progress(GenerationStage.LIPSYNC, 0, "开始口型同步...")
+        await self._report_progress(GenerationStage.VIDEO, 0, "开始生成视频...")
+
+        video_result = await self._run_with_reuse(
+            run,
+            GenerationStage.VIDEO,
+            run.rendered_shots,
+            "videos",
+            lambda rendered_shots: self.video_agent.run({
+                "rendered_shots": rendered_shots,
+                "storyboard": run.storyboard,
+                "aspect_ratio": run.config.aspect_ratio,
+                "project_id": run.project_id,
+            }),
+        )
+
+        await self._report_progress(GenerationStage.VIDEO, 100, "视频生成完成")
+        return video_result
+
+    async def _run_voice_stage(self, run: "_GenerationRun") -> dict[str, Any]:
+        """6. 配音生成（只依赖分镜和角色，与渲染/视频并发）"""
+        if run.config.skip_voice:
+            await self._report_progress(GenerationStage.VOICE, 100, "跳过配音生成")
+            return {"audio_files": []}
+
+        await self._report_progress(GenerationStage.VOICE, 0, "开始生成配音...")
+
+        voice_result = await self._run_with_reuse(
+            run,
+            GenerationStage.VOICE,
+            run.storyboard,
+            "audio_files",
+            lambda shots: self.voice_agent.run({
+                "storyboard": shots,
+                "characters": run.character_assets,
+                "project_id": run.project_id,
+            }),
+        )
 
-                lipsync_result = await self.lipsync_agent.run({
-                    "rendered_shots": rendered_shots,
-                    "audio_results": audio_results,
-                    "project_id": project_id,
-                })
+        await self._report_progress(GenerationStage.VOICE, 100, "配音生成完成")
+        return voice_result
 
-                await self._report_progress(GenerationStage.LIPSYNC, 100, "口型同步完成")
+    async def _run_lipsync_stage(self, run: "_GenerationRun") -> dict[str, Any]:
+        """7. 口型同步"""
+        if run.config.skip_lipsync or run.config.skip_voice:
+            await self._report_progress(GenerationStage.LIPSYNC, 100, "跳过口型同步")
+            return {"lipsync_videos": []}
 
-            result["stages"]["lipsync"] = lipsync_result
-            lipsync_results = lipsync_result.get("lipsync_videos", [])
+        if run.config.stream_shots and GenerationStage.LIPSYNC in run.streamed:
+            return run.streamed[GenerationStage.LIPSYNC]
 
-            # 8. 最终剪辑
-            await self._report_progress(GenerationStage.EDIT, 0, "开始合成最终视频...")
+        await self._report_progress(GenerationStage.LIPSYNC, 0, "开始口型同步...")
 
-            edit_result = await self.editor_agent.run({
-                "video_results": video_results,
-                "lipsync_results": lipsync_results,
+        lipsync_result = await self._run_with_reuse(
+            run,
+            GenerationStage.LIPSYNC,
+            run.audio_results,
+            "lipsync_videos",
+            lambda audio_results: self.lipsync_agent.run({
+                "rendered_shots": run.rendered_shots,
                 "audio_results": audio_results,
-                "storyboard": storyboard,
-                "project_id": project_id,
-                "aspect_ratio": config.aspect_ratio,
-                "add_subtitles": config.add_subtitles,
-                "bgm_path": config.bgm_path,
-                "bgm_volume": config.bgm_volume,
-            })
+                "project_id": run.project_id,
+            }),
+        )
+
+        await self._report_progress(GenerationStage.LIPSYNC, 100, "口型同步完成")
+        return lipsync_result
+
+    async def _run_shot_pipeline(self, run: "_GenerationRun") -> dict[str, Any]:
+        """
+        逐镜头流式流水线：渲染 → 图生视频 → 口型同步
+
+        每个镜头独立推进，上一步完成即进入下一步；各步的并发度由对应服务的信号量限制。
+        口型同步需要配音结果，会等待并发执行的配音阶段完成。
+        返回渲染阶段输出，视频/口型输出写入 run.streamed。
+        """
+        config = run.config
+        storyboard = run.storyboard
+        total = max(len(storyboard), 1)
+        with_video = not config.skip_video
+        with_lipsync = not (config.skip_lipsync or config.skip_voice)
+        completed = {
+            GenerationStage.RENDER: 0,
+            GenerationStage.VIDEO: 0,
+            GenerationStage.LIPSYNC: 0,
+        }
+
+        await self._report_progress(GenerationStage.RENDER, 0, "开始逐镜头流水线...")
+
+        async def advance(stage: GenerationStage, shot_id: Any, message: str) -> None:
+            completed[stage] += 1
+            await self._report_progress(
+                stage,
+                int(completed[stage] / total * 100),
+                message,
+                {"shot_id": shot_id, "completed": completed[stage], "total": len(storyboard)},
+            )
+
+        async def process_shot(shot: dict[str, Any]):
+            shot_id = shot.get("shot_id")
 
-            await self._report_progress(GenerationStage.EDIT, 100, "视频合成完成")
-            result["stages"]["edit"] = edit_result
+            with span("shot", shot_id=shot_id):
+                rendered = run.reused(GenerationStage.RENDER, shot_id) or await self.render_agent.render_shot(
+                    run.mark_regenerate(shot), run.character_assets, config.aspect_ratio, run.project_id
+                )
+                await self._save_unit_checkpoint(GenerationStage.RENDER, rendered)
+                await advance(GenerationStage.RENDER, shot_id, f"镜头 {shot_id} 渲染完成")
+
+                video = None
+                if with_video:
+                    video = run.reused(GenerationStage.VIDEO, shot_id) or await self.video_agent.generate_shot_video(
+                        rendered, storyboard, run.project_id
+                    )
+                    await self._save_unit_checkpoint(GenerationStage.VIDEO, video)
+                    await advance(GenerationStage.VIDEO, shot_id, f"镜头 {shot_id} 视频生成完成")
+
+                lipsync = None
+                if with_lipsync and run.reused(GenerationStage.LIPSYNC, shot_id):
+                    lipsync = run.reused(GenerationStage.LIPSYNC, shot_id)
+                    await advance(GenerationStage.LIPSYNC, shot_id, f"镜头 {shot_id} 口型同步完成")
+                elif with_lipsync:
+                    voice_result = await run.wait_for(GenerationStage.VOICE)
+                    audio = next(
+                        (
+                            a for a in voice_result.get("audio_files", [])
+                            if a.get("shot_id") == shot_id
+                        ),
+                        None,
+                    )
+                    lipsync = await self.lipsync_agent.generate_shot_lipsync(
+                        rendered, audio, run.project_id
+                    )
+                    await self._save_unit_checkpoint(GenerationStage.LIPSYNC, lipsync)
+                    await advance(GenerationStage.LIPSYNC, shot_id, f"镜头 {shot_id} 口型同步完成")
+
+                return rendered, video, lipsync
+
+        shot_results = await asyncio.gather(*(process_shot(shot) for shot in storyboard))
+
+        rendered_shots = [r for r, _, _ in shot_results]
+        videos = [v for _, v, _ in shot_results if v is not None]
+        lipsync_videos = [l for _, _, l in shot_results if l is not None]
+
+        if with_video:
+            run.streamed[GenerationStage.VIDEO] = {
+                "videos": videos,
+                "success_count": sum(1 for v in videos if v.get("success")),
+                "failed_count": sum(1 for v in videos if not v.get("success")),
+                "total_duration": sum(v.get("duration", 0) for v in videos if v.get("success")),
+            }
+        if with_lipsync:
+            run.streamed[GenerationStage.LIPSYNC] = {
+                "lipsync_videos": lipsync_videos,
+                "lipsync_count": sum(1 for l in lipsync_videos if l.get("has_lipsync")),
+                "success_count": sum(1 for l in lipsync_videos if l.get("success")),
+            }
+
+        await self._report_progress(GenerationStage.RENDER, 100, "分镜图渲染完成")
+        return {
+            "rendered_shots": rendered_shots,
+            "success_count": sum(1 for r in rendered_shots if r.get("success")),
+            "failed_count": sum(1 for r in rendered_shots if not r.get("success")),
+        }
+
+    async def _run_edit_stage(self, run: "_GenerationRun") -> dict[str, Any]:
+        """8. 最终剪辑"""
+        config = run.config
+        await self._report_progress(GenerationStage.EDIT, 0, "开始合成最终视频...")
+
+        edit_result = await self.editor_agent.run({
+            "video_results": run.outputs[GenerationStage.VIDEO].get("videos", []),
+            "lipsync_results": run.outputs[GenerationStage.LIPSYNC].get("lipsync_videos", []),
+            "audio_results": run.audio_results,
+            "storyboard": run.storyboard,
+            "project_id": run.project_id,
+            "aspect_ratio": config.aspect_ratio,
+            "add_subtitles": config.add_subtitles,
+            "bgm_path": config.bgm_path,
+            "bgm_volume": config.bgm_volume,
+            "single_pass": config.single_pass_edit,
+        })
+
+        await self._report_progress(GenerationStage.EDIT, 100, "视频合成完成")
+        return edit_result
+
+    async def generate(
+        self,
+        project_id: str,
+        user_input: str,
+        config: Optional[GenerationConfig] = None,
+        existing_data: Optional[dict[str, Any]] = None,
+    ) -> dict[str, Any]:
+        """
+        执行完整的漫剧生成流程
+
+        各阶段按 STAGE_DEPENDENCIES 组成的依赖图调度，输入就绪即启动。
+
+        Args:
+            project_id: 项目 ID
+            user_input: 用户输入的故事/剧本
+            config: 生成配置
+            existing_data: 已有数据（用于部分重新生成）
+
+        Returns:
+            生成结果，包含所有阶段的输出，以及 usage（LLM token、GPU 秒数、视频片段秒数）
+        """
+        run = _GenerationRun(
+            project_id=project_id,
+            user_input=user_input,
+            config=config or GenerationConfig(),
+            existing_data=existing_data or {},
+        )
+        await self._load_checkpoint(run)
+
+        result = {
+            "project_id": project_id,
+            "success": False,
+            "stages": {},
+            "final_video": None,
+            "error": None,
+        }
+        meter = UsageMeter()
+
+        try:
+            with (
+                llm_cache_bypass(run.config.fresh_llm),
+                metering(meter),
+                span("generation", project_id=project_id),
+            ):
+                await self._run_stage_graph(run)
+
+            for stage in STAGE_DEPENDENCIES:
+                result["stages"][stage.value] = run.outputs[stage]
+
+            edit_result = run.outputs[GenerationStage.EDIT]
+            result["script"] = run.script
+            result["storyboard"] = run.storyboard
             result["final_video"] = edit_result.get("video_path")
             result["video_path"] = edit_result.get("video_path")
             result["duration"] = edit_result.get("duration")
@@ -302,6 +964,7 @@ class MangaForgeOrchestrator:
             result["error"] = str(e)
             result["success"] = False
 
+        result["usage"] = meter.summary()
         return result
 
     async def generate_partial(
@@ -310,20 +973,27 @@ class MangaForgeOrchestrator:
         start_stage: GenerationStage,
         existing_data: dict[str, Any],
         config: Optional[GenerationConfig] = None,
+        shot_ids: Optional[list[Any]] = None,
     ) -> dict[str, Any]:
         """
         从特定阶段开始重新生成
 
+        开始阶段之前的阶段使用已有数据；开始阶段为镜头级阶段时，
+        强制重新执行该阶段及其下游，其余镜头结果照常复用。
+        开始阶段为 LLM 阶段时视为要求新结果，不读取 LLM 响应缓存。
+
         Args:
             project_id: 项目 ID
             start_stage: 开始阶段
             existing_data: 已有数据
             config: 生成配置
+            shot_ids: 只重新生成这些镜头（None 表示全部）
 
         Returns:
             生成结果
         """
         config = config or GenerationConfig()
+        start_stage = GenerationStage(start_stage)
 
         # 根据开始阶段设置跳过选项
         stage_order = [
@@ -343,6 +1013,15 @@ class MangaForgeOrchestrator:
             config.skip_script = True
         if start_index > 1:
             config.skip_character = True
+        if start_index > 2:
+            config.skip_storyboard = True
+
+        if start_stage in LLM_STAGES:
+            config.fresh_llm = True
+
+        if start_stage in SHOT_STAGES:
+            config.force_stages = [start_stage.value]
+            config.force_shot_ids = shot_ids
 
         # 获取用户输入（从已有数据）
         user_input = existing_data.get("user_input", "")
@@ -2,11 +2,13 @@
 Render Agent - 图像渲染 Agent
 
 负责：
-1. 调用 ComfyUI 批量生成分镜图
+1. 调用 ComfyUI 并发批量生成分镜图
 2. 注入角色 LoRA/IP-Adapter 保证一致性
 3. 后处理：超分、色彩校正
 """
-from typing import Any
+import secrets
+import zlib
+from typing import Any, Awaitable, Callable, Optional
 
 from langgraph.graph import END, StateGraph
 from pydantic import Field
@@ -29,6 +31,7 @@ class RenderState(AgentState):
     # 处理过程
     current_shot_index: int = 0
     rendered_images: list[dict[str, Any]] = Field(default_factory=list)
+    model_swaps: dict[str, int] = Field(default_factory=dict)
 
     # 输出
     render_results: list[dict[str, Any]] = Field(default_factory=list)
@@ -48,8 +51,8 @@ class RenderAgent(BaseAgent):
         """构建渲染工作流图"""
         graph = StateGraph(RenderState)
 
-        graph.add_node("render_shots", self._render_shots)
-        graph.add_node("save_results", self._save_results)
+        graph.add_node("render_shots", self._traced_node("render_shots", self._render_shots))
+        graph.add_node("save_results", self._traced_node("save_results", self._save_results))
 
         graph.set_entry_point("render_shots")
         graph.add_edge("render_shots", "save_results")
@@ -76,90 +79,325 @@ class RenderAgent(BaseAgent):
                 )
         return None, None
 
-    async def _render_shots(self, state: RenderState) -> dict[str, Any]:
-        """渲染所有镜头"""
+    def _shot_seed(self, shot: dict[str, Any]) -> int:
+        """
+        获取镜头种子
+
+        未指定种子时按场景/镜头编号派生固定种子，使重新生成时工作流保持一致，
+        从而命中渲染缓存；强制重新渲染（regenerate）的镜头改用新的随机种子。
+        """
+        seed = shot.get("seed")
+        if seed is not None and int(seed) >= 0:
+            return int(seed)
+        if shot.get("regenerate"):
+            return secrets.randbelow(2**32)
+        return zlib.crc32(f"{shot.get('scene_id')}:{shot.get('shot_id')}".encode("utf-8"))
+
+    def _build_request(
+        self,
+        shot: dict[str, Any],
+        characters: list[dict[str, Any]],
+        width: int,
+        height: int,
+    ) -> ImageGenerationRequest:
+        """构建单个镜头的图像生成请求"""
+        # 查找主角色的 LoRA
+        shot_characters = shot.get("characters", [])
+        lora_name = None
+        character_image = None
+
+        if shot_characters:
+            lora_name, character_image = self._find_character_lora(
+                shot_characters[0], characters
+            )
+
+        return ImageGenerationRequest(
+            prompt=shot.get("image_prompt", ""),
+            negative_prompt=shot.get("negative_prompt", ""),
+            width=width,
+            height=height,
+            steps=25,
+            cfg_scale=7.0,
+            seed=self._shot_seed(shot),
+            lora_name=lora_name,
+            character_image=character_image,
+            use_cache=not shot.get("regenerate"),
+        )
+
+    def _affinity_key(self, image_service: Any, request: ImageGenerationRequest) -> tuple:
+        """模型亲和键：Checkpoint（取自后端实际执行的工作流）、LoRA 和分辨率相同的镜头无需切换模型"""
+        return (
+            image_service.checkpoint_name(request),
+            request.lora_name or "",
+            request.width,
+            request.height,
+        )
+
+    def _affinity_order(
+        self,
+        image_service: Any,
+        requests: list[ImageGenerationRequest],
+    ) -> tuple[list[int], dict[str, int]]:
+        """
+        按模型亲和键重排渲染顺序
+
+        相同键的镜头排在一起（组按首次出现的顺序，组内保持分镜顺序）。
+
+        Returns:
+            (重排后的下标, 模型切换次数统计)
+        """
+        keys = [self._affinity_key(image_service, request) for request in requests]
+
+        groups: dict[tuple, list[int]] = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(key, []).append(i)
+        order = [i for group in groups.values() for i in group]
+
+        def count_swaps(sequence: list[tuple]) -> int:
+            return sum(1 for prev, cur in zip(sequence, sequence[1:]) if prev != cur)
+
+        storyboard_swaps = count_swaps(keys)
+        scheduled_swaps = count_swaps([keys[i] for i in order])
+        return order, {
+            "storyboard_order": storyboard_swaps,
+            "scheduled": scheduled_swaps,
+            "avoided": storyboard_swaps - scheduled_swaps,
+        }
+
+    async def render_shot(
+        self,
+        shot: dict[str, Any],
+        characters: list[dict[str, Any]],
+        aspect_ratio: str,
+        project_id: str,
+        progress_callback: Optional[Callable[[dict[str, Any]], Awaitable[None]]] = None,
+    ) -> dict[str, Any]:
+        """
+        渲染并保存单个镜头
+
+        Args:
+            progress_callback: 节点执行进度回调（ComfyUI 采样步数等）
+
+        Returns:
+            与 rendered_shots 中条目格式相同的结果
+        """
         image_service = self.service_factory.get_image_service()
-        width, height = self._get_dimensions(state.aspect_ratio)
-        rendered_images = []
+        width, height = self._get_dimensions(aspect_ratio)
+        request = self._build_request(shot, characters, width, height)
+        request.progress_callback = progress_callback
 
-        for shot in state.storyboard:
-            # 查找主角色的 LoRA
-            shot_characters = shot.get("characters", [])
-            lora_name = None
-            character_image = None
+        async with image_service.semaphore():
+            result = await image_service.generate(request)
 
-            if shot_characters:
-                lora_name, character_image = self._find_character_lora(
-                    shot_characters[0], state.characters
-                )
+        return await self._save_render(shot, result, project_id)
+
+    async def render_shot_group(
+        self,
+        shots: list[dict[str, Any]],
+        characters: list[dict[str, Any]],
+        aspect_ratio: str,
+        project_id: str,
+        progress_callback: Optional[Callable[[dict[str, Any]], Awaitable[None]]] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        在一个工作流中渲染一组镜头（Checkpoint/LoRA/尺寸相同）并逐个保存
+
+        Args:
+            progress_callback: 整组工作流的节点执行进度回调
+
+        Returns:
+            与 shots 顺序一致的结果，格式同 render_shot
+        """
+        image_service = self.service_factory.get_image_service()
+        width, height = self._get_dimensions(aspect_ratio)
+        requests = [self._build_request(shot, characters, width, height) for shot in shots]
+        for request in requests:
+            request.progress_callback = progress_callback
+
+        async with image_service.semaphore():
+            results = await image_service.generate_batch(requests)
+
+        rendered = []
+        for shot, result in zip(shots, results):
+            item = await self._save_render(shot, result, project_id)
+            await self._report_unit(item)
+            rendered.append(item)
+        return rendered
+
+    async def _save_render(
+        self,
+        shot: dict[str, Any],
+        result: Any,
+        project_id: str,
+    ) -> dict[str, Any]:
+        """保存单个镜头的渲染结果"""
+        from src.storage import get_storage
 
-            request = ImageGenerationRequest(
-                prompt=shot.get("image_prompt", ""),
-                negative_prompt=shot.get("negative_prompt", ""),
-                width=width,
-                height=height,
-                steps=25,
-                cfg_scale=7.0,
-                lora_name=lora_name,
-                character_image=character_image,
+        if not (result.success and (result.data.images or result.data.stored_images)):
+            return {
+                "shot_id": shot.get("shot_id"),
+                "scene_id": shot.get("scene_id"),
+                "error": result.error if not result.success else "No image generated",
+                "success": False,
+            }
+
+        filename = f"shot_{shot.get('scene_id')}_{shot.get('shot_id')}.png"
+        if result.data.images:
+            path = await get_storage().upload_bytes_async(
+                data=result.data.images[0],
+                project_id=project_id,
+                asset_type="storyboard",
+                filename=filename,
+                content_type="image/png",
+            )
+        else:
+            # 渲染缓存命中：服务端复制缓存对象（缓存条目可能被淘汰，不直接引用）
+            path = await get_storage().copy_object_async(
+                result.data.stored_images[0], project_id, "storyboard", filename
             )
 
-            result = await image_service.generate(request)
+        return {
+            "shot_id": shot.get("shot_id"),
+            "scene_id": shot.get("scene_id"),
+            "image_path": path,
+            "seed": result.data.seeds[0] if result.data.seeds else -1,
+            "success": True,
+        }
+
+    async def _render_shots(self, state: RenderState) -> dict[str, Any]:
+        """
+        渲染所有镜头
+
+        按模型亲和度（Checkpoint/LoRA/分辨率）重排提交顺序以减少模型切换，
+        按 image 服务的 max_concurrency 并发提交，每个镜头渲染后立即保存，
+        结果按分镜顺序返回。渲染中的节点进度折算为阶段进度一并上报。
+        image 服务支持合并时，Checkpoint/LoRA/尺寸相同的镜头合并到同一工作流。
+        """
+        image_service = self.service_factory.get_image_service()
+        width, height = self._get_dimensions(state.aspect_ratio)
+        requests = [
+            self._build_request(shot, state.characters, width, height)
+            for shot in state.storyboard
+        ]
+
+        # 信号量按等待顺序放行，按重排后的顺序发起即按该顺序提交
+        order, model_swaps = self._affinity_order(image_service, requests)
+        if model_swaps["avoided"] > 0:
+            await self._report_progress(
+                0,
+                f"按模型亲和度重排渲染顺序，减少 {model_swaps['avoided']} 次模型切换",
+                {"model_swaps": model_swaps},
+            )
 
-            if result.success and result.data.images:
-                rendered_images.append({
-                    "shot_id": shot.get("shot_id"),
-                    "scene_id": shot.get("scene_id"),
-                    "image_data": result.data.images[0],
-                    "seed": result.data.seeds[0] if result.data.seeds else -1,
-                    "success": True,
-                })
-            else:
-                rendered_images.append({
-                    "shot_id": shot.get("shot_id"),
-                    "scene_id": shot.get("scene_id"),
-                    "image_data": None,
-                    "error": result.error if not result.success else "No image generated",
-                    "success": False,
-                })
+        if image_service.max_batch_size > 1:
+            rendered = await self._render_shot_groups(state, image_service, requests, order)
+        else:
+            rendered = await self._render_shots_in_order(state, order)
+
+        rendered_images: list[dict[str, Any]] = [{} for _ in state.storyboard]
+        for i, result in zip(order, rendered):
+            rendered_images[i] = result
 
         return {
             "current_step": "render_shots",
             "rendered_images": rendered_images,
+            "model_swaps": model_swaps,
         }
 
-    async def _save_results(self, state: RenderState) -> dict[str, Any]:
-        """保存渲染结果"""
-        from src.storage import get_storage
+    async def _render_shots_in_order(
+        self,
+        state: RenderState,
+        order: list[int],
+    ) -> list[dict[str, Any]]:
+        """逐个镜头按 order 顺序提交，结果与 order 一一对应"""
+        node_progress = self._node_progress(len(order))
+
+        return await self._map_with_progress(
+            [state.storyboard[i] for i in order],
+            lambda shot: self.render_shot(
+                shot,
+                state.characters,
+                state.aspect_ratio,
+                state.project_id,
+                progress_callback=node_progress([shot]),
+            ),
+            lambda shot: f"镜头 {shot.get('shot_id')} 渲染",
+        )
 
-        storage = get_storage()
-        render_results = []
-
-        for img_result in state.rendered_images:
-            if img_result.get("success") and img_result.get("image_data"):
-                # 保存图像
-                path = storage.upload_bytes(
-                    data=img_result["image_data"],
-                    project_id=state.project_id,
-                    asset_type="storyboard",
-                    filename=f"shot_{img_result['scene_id']}_{img_result['shot_id']}.png",
-                    content_type="image/png",
+    async def _render_shot_groups(
+        self,
+        state: RenderState,
+        image_service: Any,
+        requests: list[ImageGenerationRequest],
+        order: list[int],
+    ) -> list[dict[str, Any]]:
+        """按合并分组渲染 order 中的镜头，结果与 order 一一对应"""
+        groups = [
+            [order[j] for j in group]
+            for group in image_service.batch_groups([requests[i] for i in order])
+        ]
+        node_progress = self._node_progress(len(order))
+
+        group_results = await self._map_with_progress(
+            groups,
+            lambda group: self.render_shot_group(
+                [state.storyboard[i] for i in group],
+                state.characters,
+                state.aspect_ratio,
+                state.project_id,
+                progress_callback=node_progress([state.storyboard[i] for i in group]),
+            ),
+            lambda group: "镜头 " + ", ".join(str(state.storyboard[i].get("shot_id")) for i in group) + " 渲染",
+            lambda group: {
+                "shot_ids": ",".join(str(state.storyboard[i].get("shot_id")) for i in group),
+            },
+        )
+
+        by_index = {
+            i: result
+            for group, results in zip(groups, group_results)
+            for i, result in zip(group, results)
+        }
+        return [by_index[i] for i in order]
+
+    def _node_progress(
+        self,
+        total: int,
+    ) -> Callable[[list[dict[str, Any]]], Callable[[dict[str, Any]], Awaitable[None]]]:
+        """
+        创建节点进度回调工厂：为一个工作流（单个镜头或合并的一组镜头）生成回调
+
+        各工作流的执行比例按其镜头数加权折算为阶段进度，每 10% 上报一次。
+        """
+        # 工作流 -> (执行比例, 镜头数)
+        fractions: dict[str, tuple[float, int]] = {}
+
+        def for_shots(shots: list[dict[str, Any]]) -> Callable[[dict[str, Any]], Awaitable[None]]:
+            shot_ids = [shot.get("shot_id") for shot in shots]
+            label = ", ".join(str(shot_id) for shot_id in shot_ids)
+
+            async def report(event: dict[str, Any]) -> None:
+                if not event.get("max"):
+                    return
+                fraction = event["value"] / event["max"]
+                # 每 10% 上报一次，避免逐步采样刷屏
+                if int(fraction * 10) == int(fractions.get(label, (0.0, 0))[0] * 10):
+                    return
+                fractions[label] = (fraction, len(shots))
+                details = {"shot_id": shot_ids[0]} if len(shots) == 1 else {"shot_ids": shot_ids}
+                await self._report_progress(
+                    sum(f * n for f, n in fractions.values()) / total * 100,
+                    f"镜头 {label} 渲染中 {event['value']}/{event['max']}",
+                    {**details, **event},
                 )
 
-                render_results.append({
-                    "shot_id": img_result["shot_id"],
-                    "scene_id": img_result["scene_id"],
-                    "image_path": path,
-                    "seed": img_result.get("seed", -1),
-                    "success": True,
-                })
-            else:
-                render_results.append({
-                    "shot_id": img_result.get("shot_id"),
-                    "scene_id": img_result.get("scene_id"),
-                    "error": img_result.get("error", "Unknown error"),
-                    "success": False,
-                })
+            return report
+
+        return for_shots
+
+    async def _save_results(self, state: RenderState) -> dict[str, Any]:
+        """汇总渲染结果（图像已在渲染时逐个保存）"""
+        render_results = state.rendered_images
 
         return {
             "current_step": "complete",
@@ -168,6 +406,7 @@ class RenderAgent(BaseAgent):
                 "rendered_shots": render_results,
                 "success_count": sum(1 for r in render_results if r.get("success")),
                 "failed_count": sum(1 for r in render_results if not r.get("success")),
+                "model_swaps": state.model_swaps,
             },
         }
 
@@ -8,7 +8,7 @@ Script Agent - 剧本解析和扩展 Agent
 4. 规划场景和镜头
 """
 import json
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import END, StateGraph
@@ -17,6 +17,10 @@ from pydantic import Field
 from src.agents.base_agent import AgentState, BaseAgent
 from src.services.factory import get_service_factory
 from src.services.llm.base import LLMMessage
+from src.services.llm.json_stream import IncrementalJSONParser
+
+# 流式剧本事件回调: (类型 "character" / "scene", 条目)
+ScriptEventCallback = Callable[[str, dict[str, Any]], Awaitable[None]]
 
 
 class ScriptState(AgentState):
@@ -27,11 +31,14 @@ class ScriptState(AgentState):
     style: str = "anime"
     target_duration: int = 60  # 目标视频时长(秒)
     aspect_ratio: str = "9:16"
+    stream: bool = False  # 流式生成剧本，角色/场景生成完即推送
+    single_call: bool = False  # 跳过故事分析，一次调用直接生成剧本
 
     # 处理过程
     story_analysis: dict[str, Any] = Field(default_factory=dict)
     characters_extracted: list[dict[str, Any]] = Field(default_factory=list)
     scenes_planned: list[dict[str, Any]] = Field(default_factory=list)
+    usage: dict[str, int] = Field(default_factory=dict)  # 累计的 LLM token 用量
 
     # 输出
     parsed_script: dict[str, Any] = Field(default_factory=dict)
@@ -135,6 +142,21 @@ class ScriptAgent(BaseAgent):
 请生成完整的 JSON 格式分镜剧本，严格按照系统提示中的格式要求。
 """
 
+    SINGLE_CALL_PROMPT = """先分析以下故事/大纲（类型、核心冲突、主要角色、关键场景、基调），再直接生成完整的分镜剧本：
+
+故事内容：
+{story}
+
+目标时长：{duration}秒
+风格：{style}
+画面比例：{aspect_ratio}
+
+只输出完整的 JSON 格式分镜剧本，严格按照系统提示中的格式要求。
+"""
+
+    # 累计的 usage 字段
+    USAGE_KEYS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
     def __init__(self, llm_service=None):
         """
         初始化剧本Agent
@@ -144,6 +166,7 @@ class ScriptAgent(BaseAgent):
         """
         self._llm_service = llm_service
         self.service_factory = get_service_factory()
+        self.event_callback: Optional[ScriptEventCallback] = None
         super().__init__()
 
     def _build_graph(self) -> StateGraph:
@@ -151,14 +174,17 @@ class ScriptAgent(BaseAgent):
         graph = StateGraph(ScriptState)
 
         # 添加节点
-        graph.add_node("analyze_story", self._analyze_story)
-        graph.add_node("extract_characters", self._extract_characters)
-        graph.add_node("plan_scenes", self._plan_scenes)
-        graph.add_node("generate_script", self._generate_script)
-        graph.add_node("validate_output", self._validate_output)
-
-        # 添加边
-        graph.set_entry_point("analyze_story")
+        graph.add_node("analyze_story", self._traced_node("analyze_story", self._analyze_story))
+        graph.add_node("extract_characters", self._traced_node("extract_characters", self._extract_characters))
+        graph.add_node("plan_scenes", self._traced_node("plan_scenes", self._plan_scenes))
+        graph.add_node("generate_script", self._traced_node("generate_script", self._generate_script))
+        graph.add_node("validate_output", self._traced_node("validate_output", self._validate_output))
+
+        # 添加边（单次调用模式直接生成剧本）
+        graph.set_conditional_entry_point(
+            lambda state: "generate_script" if state.single_call else "analyze_story",
+            {"analyze_story": "analyze_story", "generate_script": "generate_script"},
+        )
         graph.add_edge("analyze_story", "extract_characters")
         graph.add_edge("extract_characters", "plan_scenes")
         graph.add_edge("plan_scenes", "generate_script")
@@ -167,37 +193,67 @@ class ScriptAgent(BaseAgent):
 
         return graph.compile()
 
+    def _get_llm_service(self):
+        # 优先使用传入的LLM服务，否则使用默认的
+        if self._llm_service:
+            return self._llm_service
+        return self.service_factory.get_llm_service()
+
     async def _call_llm(
         self,
         messages: list[LLMMessage],
         json_mode: bool = False,
-    ) -> Optional[str]:
-        """调用 LLM 服务"""
+        cache_system: bool = False,
+    ) -> tuple[Optional[Any], dict[str, int]]:
+        """
+        调用 LLM 服务
+
+        Args:
+            cache_system: 使用提供商的提示词缓存缓存 system 消息
+
+        Returns:
+            (生成内容, 本次调用的 token 用量)
+        """
         try:
-            # 优先使用传入的LLM服务，否则使用默认的
-            if self._llm_service:
-                llm_service = self._llm_service
-            else:
-                llm_service = self.service_factory.get_llm_service()
+            llm_service = self._get_llm_service()
 
             if json_mode:
-                result = await llm_service.generate_json(messages)
+                async with llm_service.semaphore():
+                    result = await llm_service.generate_json(messages, cache_system=cache_system)
                 if result.success:
-                    return result.data
+                    return result.data, self._call_usage(result.metadata.get("raw_response"), result.metadata)
                 else:
                     print(f"LLM JSON generation failed: {result.error}")
             else:
-                result = await llm_service.generate(messages)
+                async with llm_service.semaphore():
+                    result = await llm_service.generate(messages, cache_system=cache_system)
                 if result.success:
-                    return result.data.content
+                    return result.data.content, self._call_usage(result.data, result.metadata)
                 else:
                     print(f"LLM generation failed: {result.error}")
-            return None
+            return None, {}
         except Exception as e:
             print(f"LLM call failed: {e}")
             import traceback
             traceback.print_exc()
-            return None
+            return None, {}
+
+    def _call_usage(self, response: Any, metadata: dict[str, Any]) -> dict[str, int]:
+        """单次调用的用量；命中 LLM 响应缓存时不消耗 token"""
+        if metadata.get("cache_hit"):
+            return {"llm_calls": 0, "response_cache_hits": 1}
+        usage = {"llm_calls": 1}
+        if response is not None:
+            for key in self.USAGE_KEYS:
+                usage[key] = int(response.usage.get(key, 0) or 0)
+        return usage
+
+    @staticmethod
+    def _merge_usage(total: dict[str, int], usage: dict[str, int]) -> dict[str, int]:
+        merged = dict(total)
+        for key, value in usage.items():
+            merged[key] = merged.get(key, 0) + value
+        return merged
 
     async def _analyze_story(self, state: ScriptState) -> dict[str, Any]:
         """分析用户输入的故事"""
@@ -213,11 +269,12 @@ class ScriptAgent(BaseAgent):
             LLMMessage.user(prompt),
         ]
 
-        analysis = await self._call_llm(messages, json_mode=True)
+        analysis, usage = await self._call_llm(messages, json_mode=True)
 
         return {
             "current_step": "analyze_story",
             "story_analysis": analysis or {},
+            "usage": self._merge_usage(state.usage, usage),
             "messages": state.messages + [
                 HumanMessage(content=f"分析故事: {state.user_input[:100]}...")
             ],
@@ -245,26 +302,94 @@ class ScriptAgent(BaseAgent):
 
     async def _generate_script(self, state: ScriptState) -> dict[str, Any]:
         """生成完整剧本"""
-        prompt = self.EXPAND_PROMPT.format(
-            story=state.user_input,
-            analysis=json.dumps(state.story_analysis, ensure_ascii=False, indent=2),
-            duration=state.target_duration,
-            style=state.style,
-            aspect_ratio=state.aspect_ratio,
-        )
-
+        if state.single_call:
+            prompt = self.SINGLE_CALL_PROMPT.format(
+                story=state.user_input,
+                duration=state.target_duration,
+                style=state.style,
+                aspect_ratio=state.aspect_ratio,
+            )
+        else:
+            prompt = self.EXPAND_PROMPT.format(
+                story=state.user_input,
+                analysis=json.dumps(state.story_analysis, ensure_ascii=False, indent=2),
+                duration=state.target_duration,
+                style=state.style,
+                aspect_ratio=state.aspect_ratio,
+            )
+
+        # SYSTEM_PROMPT 对所有剧集相同，放在最前并使用提示词缓存
         messages = [
             LLMMessage.system(self.SYSTEM_PROMPT),
             LLMMessage.user(prompt),
         ]
 
-        script = await self._call_llm(messages, json_mode=True)
+        script = None
+        usage: dict[str, int] = {}
+        if state.stream:
+            script, usage = await self._stream_script(messages)
+        if script is None:
+            # 流式结果不可用时回退，已消耗的流式用量一并计入
+            script, call_usage = await self._call_llm(messages, json_mode=True, cache_system=True)
+            usage = self._merge_usage(usage, call_usage)
 
         return {
             "current_step": "generate_script",
             "parsed_script": script or {},
+            "usage": self._merge_usage(state.usage, usage),
         }
 
+    async def _stream_script(
+        self, messages: list[LLMMessage]
+    ) -> tuple[Optional[dict[str, Any]], dict[str, int]]:
+        """
+        流式生成剧本
+
+        边接收边解析，每个角色和场景闭合后立即通过 event_callback 推送并报告进度。
+
+        Returns:
+            (完整剧本, 本次调用的 token 用量)；流式调用或最终解析失败时剧本为 None
+            （由调用方回退到非流式调用）
+        """
+        parser = IncrementalJSONParser(("characters", "scenes"))
+        counts = {"character": 0, "scene": 0}
+        usage: dict[str, int] = {}
+
+        def on_usage(response: Any) -> None:
+            usage.update(self._call_usage(response, {}))
+
+        llm_service = self._get_llm_service()
+        try:
+            # 流式调用同样受 llm_max_concurrency 限制，整个流期间占用一个并发名额
+            async with llm_service.semaphore():
+                async for chunk in llm_service.generate_stream(
+                    messages, temperature=0.3, cache_system=True, on_usage=on_usage
+                ):
+                    for key, item in parser.feed(chunk):
+                        if not isinstance(item, dict):
+                            continue
+                        kind = "character" if key == "characters" else "scene"
+                        counts[kind] += 1
+
+                        if self.event_callback:
+                            await self.event_callback(kind, item)
+
+                        if kind == "character":
+                            message = f"角色 {item.get('name', '')} 已生成"
+                        else:
+                            message = f"场景 {item.get('scene_id', counts['scene'])} 已生成"
+                        await self._report_progress(
+                            min(90, 10 + 5 * (counts["character"] + counts["scene"])),
+                            message,
+                            {"event": kind, kind: item, **counts},
+                        )
+        except Exception as e:
+            print(f"LLM stream failed: {e}")
+            return None, usage
+
+        script = parser.result()
+        return (script if isinstance(script, dict) else None), usage
+
     async def _validate_output(self, state: ScriptState) -> dict[str, Any]:
         """验证输出格式"""
         script = state.parsed_script
@@ -303,9 +428,20 @@ class ScriptAgent(BaseAgent):
                     len(s.get("shots", [])) for s in script.get("scenes", [])
                 ),
                 "total_duration": total_duration,
+                "usage": self._usage_report(state.usage),
             },
         }
 
+    @staticmethod
+    def _usage_report(usage: dict[str, int]) -> dict[str, Any]:
+        """用量汇总，附提示词缓存命中比例"""
+        report: dict[str, Any] = dict(usage)
+        input_tokens = usage.get("input_tokens", 0)
+        report["cached_input_ratio"] = (
+            round(usage.get("cache_read_input_tokens", 0) / input_tokens, 4) if input_tokens else 0.0
+        )
+        return report
+
     async def run(self, input_data: dict[str, Any]) -> dict[str, Any]:
         """执行剧本生成
 
@@ -315,6 +451,8 @@ class ScriptAgent(BaseAgent):
                 - style: 风格 (anime/manga/realistic)
                 - target_duration: 目标时长(秒)
                 - aspect_ratio: 画面比例 (9:16/16:9)
+                - stream: 是否流式生成剧本（默认 False）
+                - single_call: 是否跳过故事分析，一次调用生成剧本（默认 False）
 
         Returns:
             生成的剧本数据
@@ -324,6 +462,8 @@ class ScriptAgent(BaseAgent):
             style=input_data.get("style", "anime"),
             target_duration=input_data.get("target_duration", 60),
             aspect_ratio=input_data.get("aspect_ratio", "9:16"),
+            stream=input_data.get("stream", False),
+            single_call=input_data.get("single_call", False),
             messages=[
                 SystemMessage(content=self.SYSTEM_PROMPT),
             ],
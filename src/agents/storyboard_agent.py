@@ -6,6 +6,8 @@ Storyboard Agent - 分镜规划 Agent
 2. 规划镜头构图和角色位置
 3. 生成图像生成用的 Prompt
 """
+import asyncio
+import json
 from typing import Any
 
 from langgraph.graph import END, StateGraph
@@ -24,6 +26,7 @@ class StoryboardState(AgentState):
     characters: list[dict[str, Any]] = Field(default_factory=list)
     style: str = "anime"
     aspect_ratio: str = "9:16"
+    batch_prompts: bool = True  # 每个场景一次 LLM 调用生成所有镜头的 Prompt
 
     # 处理过程
     current_scene_index: int = 0
@@ -64,6 +67,31 @@ For a {aspect_ratio} vertical/horizontal frame.
 
 Output only the prompt, no explanations."""
 
+    SCENE_PROMPTS_TEMPLATE = """You are a professional storyboard artist. Generate a detailed image prompt for each shot of the following scene.
+
+Scene: {scene_location} ({scene_time})
+Atmosphere: {atmosphere}
+Style: {style}
+
+Character descriptions:
+{character_descriptions}
+
+Shots:
+{shots}
+
+For each shot, write a detailed image prompt in English that includes:
+1. Scene/background description
+2. Character appearance and positions
+3. Actions and expressions
+4. Lighting and mood
+5. Composition details
+
+Each prompt must stand alone (repeat the scene and character details it needs).
+For a {aspect_ratio} vertical/horizontal frame.
+
+Output JSON only, in this format:
+{{"prompts": [{{"shot_id": <shot_id>, "image_prompt": "<prompt>"}}]}}"""
+
     def __init__(self, llm_service=None):
         """
         初始化分镜Agent
@@ -79,8 +107,8 @@ Output only the prompt, no explanations."""
         """构建分镜规划工作流图"""
         graph = StateGraph(StoryboardState)
 
-        graph.add_node("process_shots", self._process_shots)
-        graph.add_node("finalize", self._finalize)
+        graph.add_node("process_shots", self._traced_node("process_shots", self._process_shots))
+        graph.add_node("finalize", self._traced_node("finalize", self._finalize))
 
         graph.set_entry_point("process_shots")
         graph.add_edge("process_shots", "finalize")
@@ -96,85 +124,171 @@ Output only the prompt, no explanations."""
         return f"{char_name}: unknown character"
 
     async def _process_shots(self, state: StoryboardState) -> dict[str, Any]:
-        """处理所有镜头"""
+        """处理所有镜头（各场景并发，LLM 调用数受 LLM 服务的 max_concurrency 限制）"""
         # 优先使用传入的LLM服务，否则使用默认的
         if self._llm_service:
             llm_service = self._llm_service
         else:
             llm_service = self.service_factory.get_llm_service()
-        processed_shots = []
 
         scenes = state.script.get("scenes", [])
+        scene_results = await asyncio.gather(
+            *(self._process_scene(llm_service, scene, state) for scene in scenes)
+        )
+
+        return {
+            "current_step": "process_shots",
+            "processed_shots": [shot for shots in scene_results for shot in shots],
+        }
 
-        for scene in scenes:
-            scene_location = scene.get("location", "")
-            scene_time = scene.get("time", "")
-            atmosphere = scene.get("atmosphere", "")
-
-            for shot in scene.get("shots", []):
-                # 获取镜头中角色的描述
-                shot_characters = shot.get("characters", [])
-                char_descriptions = "\n".join([
-                    self._get_character_description(c, state.characters)
-                    for c in shot_characters
-                ])
-
-                # 如果剧本中已有 image_prompt，直接使用
-                if shot.get("image_prompt"):
-                    enhanced_prompt = self._enhance_prompt(
-                        shot["image_prompt"],
-                        state.style,
-                        state.aspect_ratio,
-                    )
-                else:
-                    # 生成新的 prompt
-                    prompt_request = self.SHOT_PROMPT_TEMPLATE.format(
-                        scene_location=scene_location,
-                        scene_time=scene_time,
-                        atmosphere=atmosphere,
-                        style=state.style,
-                        camera_type=shot.get("camera_type", "medium_shot"),
-                        characters=", ".join(shot_characters),
-                        action=shot.get("action", ""),
-                        character_descriptions=char_descriptions,
-                        aspect_ratio=state.aspect_ratio,
-                    )
-
-                    messages = [
-                        LLMMessage.system("You are an expert storyboard artist."),
-                        LLMMessage.user(prompt_request),
-                    ]
-
-                    result = await llm_service.generate(messages, temperature=0.7)
-
-                    if result.success:
-                        enhanced_prompt = self._enhance_prompt(
-                            result.data.content,
-                            state.style,
-                            state.aspect_ratio,
-                        )
-                    else:
-                        enhanced_prompt = shot.get("action", "")
-
-                processed_shot = {
-                    "scene_id": scene.get("scene_id"),
+    async def _process_scene(
+        self,
+        llm_service: Any,
+        scene: dict[str, Any],
+        state: StoryboardState,
+    ) -> list[dict[str, Any]]:
+        """
+        处理单个场景的所有镜头
+
+        剧本中没有 image_prompt 的镜头：批量模式下一次调用生成整个场景的 Prompt，
+        解析失败或缺失的镜头再逐个生成（并发）。
+        """
+        shots = scene.get("shots", [])
+        pending = [shot for shot in shots if not shot.get("image_prompt")]
+
+        generated: dict[str, str] = {}
+        if pending and state.batch_prompts and len(pending) > 1:
+            generated = await self._generate_scene_prompts(llm_service, scene, pending, state)
+
+        missing = [shot for shot in pending if str(shot.get("shot_id")) not in generated]
+        prompts = await asyncio.gather(
+            *(self._generate_shot_prompt(llm_service, scene, shot, state) for shot in missing)
+        )
+        for shot, prompt in zip(missing, prompts):
+            generated[str(shot.get("shot_id"))] = prompt
+
+        processed_shots = []
+        for shot in shots:
+            # 如果剧本中已有 image_prompt，直接使用
+            raw_prompt = shot.get("image_prompt") or generated.get(str(shot.get("shot_id")))
+            if raw_prompt:
+                enhanced_prompt = self._enhance_prompt(raw_prompt, state.style, state.aspect_ratio)
+            else:
+                enhanced_prompt = shot.get("action", "")
+
+            processed_shots.append({
+                "scene_id": scene.get("scene_id"),
+                "shot_id": shot.get("shot_id"),
+                "duration": shot.get("duration", 5),
+                "camera_type": shot.get("camera_type", "medium_shot"),
+                "camera_movement": shot.get("camera_movement", "static"),
+                "characters": shot.get("characters", []),
+                "action": shot.get("action", ""),
+                "dialog": shot.get("dialog", {}),
+                "image_prompt": enhanced_prompt,
+                "negative_prompt": self._get_negative_prompt(),
+            })
+
+        return processed_shots
+
+    async def _generate_scene_prompts(
+        self,
+        llm_service: Any,
+        scene: dict[str, Any],
+        shots: list[dict[str, Any]],
+        state: StoryboardState,
+    ) -> dict[str, str]:
+        """
+        一次 generate_json 调用生成场景内所有镜头的 Prompt
+
+        Returns:
+            str(shot_id) -> Prompt；调用或解析失败时返回空字典
+        """
+        scene_characters = list(dict.fromkeys(
+            name for shot in shots for name in shot.get("characters", [])
+        ))
+        shot_lines = json.dumps(
+            [
+                {
                     "shot_id": shot.get("shot_id"),
-                    "duration": shot.get("duration", 5),
-                    "camera_type": shot.get("camera_type", "medium_shot"),
-                    "camera_movement": shot.get("camera_movement", "static"),
-                    "characters": shot_characters,
+                    "camera": shot.get("camera_type", "medium_shot"),
+                    "characters": shot.get("characters", []),
                     "action": shot.get("action", ""),
-                    "dialog": shot.get("dialog", {}),
-                    "image_prompt": enhanced_prompt,
-                    "negative_prompt": self._get_negative_prompt(),
                 }
-                processed_shots.append(processed_shot)
+                for shot in shots
+            ],
+            ensure_ascii=False,
+            indent=2,
+        )
+
+        prompt_request = self.SCENE_PROMPTS_TEMPLATE.format(
+            scene_location=scene.get("location", ""),
+            scene_time=scene.get("time", ""),
+            atmosphere=scene.get("atmosphere", ""),
+            style=state.style,
+            character_descriptions="\n".join(
+                self._get_character_description(c, state.characters) for c in scene_characters
+            ),
+            shots=shot_lines,
+            aspect_ratio=state.aspect_ratio,
+        )
+
+        messages = [
+            LLMMessage.system("You are an expert storyboard artist."),
+            LLMMessage.user(prompt_request),
+        ]
+
+        async with llm_service.semaphore():
+            result = await llm_service.generate_json(messages, temperature=0.7, max_tokens=8192)
+        if not result.success:
+            return {}
+
+        items = result.data.get("prompts", []) if isinstance(result.data, dict) else result.data
+        if not isinstance(items, list):
+            return {}
 
         return {
-            "current_step": "process_shots",
-            "processed_shots": processed_shots,
+            str(item["shot_id"]): item["image_prompt"]
+            for item in items
+            if isinstance(item, dict) and item.get("shot_id") is not None and item.get("image_prompt")
         }
 
+    async def _generate_shot_prompt(
+        self,
+        llm_service: Any,
+        scene: dict[str, Any],
+        shot: dict[str, Any],
+        state: StoryboardState,
+    ) -> str | None:
+        """为单个镜头生成 Prompt，失败返回 None"""
+        # 获取镜头中角色的描述
+        shot_characters = shot.get("characters", [])
+        char_descriptions = "\n".join([
+            self._get_character_description(c, state.characters)
+            for c in shot_characters
+        ])
+
+        prompt_request = self.SHOT_PROMPT_TEMPLATE.format(
+            scene_location=scene.get("location", ""),
+            scene_time=scene.get("time", ""),
+            atmosphere=scene.get("atmosphere", ""),
+            style=state.style,
+            camera_type=shot.get("camera_type", "medium_shot"),
+            characters=", ".join(shot_characters),
+            action=shot.get("action", ""),
+            character_descriptions=char_descriptions,
+            aspect_ratio=state.aspect_ratio,
+        )
+
+        messages = [
+            LLMMessage.system("You are an expert storyboard artist."),
+            LLMMessage.user(prompt_request),
+        ]
+
+        async with llm_service.semaphore():
+            result = await llm_service.generate(messages, temperature=0.7)
+        return result.data.content if result.success else None
+
     def _enhance_prompt(self, prompt: str, style: str, aspect_ratio: str) -> str:
         """增强提示词"""
         style_tags = {
@@ -225,6 +339,7 @@ Output only the prompt, no explanations."""
                 - characters: 角色信息
                 - style: 风格
                 - aspect_ratio: 画面比例
+                - batch_prompts: 是否按场景批量生成 Prompt（默认 True）
 
         Returns:
             分镜数据
@@ -234,6 +349,7 @@ Output only the prompt, no explanations."""
             characters=input_data.get("characters", []),
             style=input_data.get("style", "anime"),
             aspect_ratio=input_data.get("aspect_ratio", "9:16"),
+            batch_prompts=input_data.get("batch_prompts", True),
             messages=[],
         )
 
@@ -12,6 +12,7 @@ from langgraph.graph import END, StateGraph
 from pydantic import Field
 
 from src.agents.base_agent import AgentState, BaseAgent
+from src.services.base import StreamTarget
 from src.services.factory import get_service_factory
 from src.services.video.base import CameraMovement, VideoGenerationRequest
 
@@ -57,8 +58,8 @@ class VideoAgent(BaseAgent):
         """构建视频生成工作流图"""
         graph = StateGraph(VideoState)
 
-        graph.add_node("generate_videos", self._generate_videos)
-        graph.add_node("save_results", self._save_results)
+        graph.add_node("generate_videos", self._traced_node("generate_videos", self._generate_videos))
+        graph.add_node("save_results", self._traced_node("save_results", self._save_results))
 
         graph.set_entry_point("generate_videos")
         graph.add_edge("generate_videos", "save_results")
@@ -73,56 +74,93 @@ class VideoAgent(BaseAgent):
                 return shot
         return {}
 
-    async def _generate_videos(self, state: VideoState) -> dict[str, Any]:
-        """生成所有视频"""
+    def _build_request(self, image_path: str, shot_info: dict[str, Any]) -> VideoGenerationRequest:
+        """构建单个镜头的图生视频请求"""
+        # 获取镜头运动
+        camera_movement_str = shot_info.get("camera_movement", "static")
+        camera_movement = self.CAMERA_MOVEMENT_MAP.get(
+            camera_movement_str, CameraMovement.STATIC
+        )
+
+        # 生成运动提示词
+        motion_prompt = shot_info.get("action", "")
+
+        return VideoGenerationRequest(
+            image_path=image_path,
+            prompt=motion_prompt,
+            duration=min(shot_info.get("duration", 5), 5),  # 最长 5 秒
+            camera_movement=camera_movement,
+        )
+
+    async def generate_shot_video(
+        self,
+        rendered: dict[str, Any],
+        storyboard: list[dict[str, Any]],
+        project_id: str,
+    ) -> dict[str, Any]:
+        """
+        生成并保存单个镜头的视频
+
+        Returns:
+            与 videos 中条目格式相同的结果
+        """
+        if not rendered.get("success") or not rendered.get("image_path"):
+            return {
+                "shot_id": rendered.get("shot_id"),
+                "scene_id": rendered.get("scene_id"),
+                "success": False,
+                "error": "No image available",
+            }
+
         video_service = self.service_factory.get_video_service()
-        generated_videos = []
-
-        for rendered in state.rendered_shots:
-            if not rendered.get("success") or not rendered.get("image_path"):
-                generated_videos.append({
-                    "shot_id": rendered.get("shot_id"),
-                    "success": False,
-                    "error": "No image available",
-                })
-                continue
-
-            # 获取镜头信息
-            shot_info = self._get_shot_info(rendered["shot_id"], state.storyboard)
-
-            # 获取镜头运动
-            camera_movement_str = shot_info.get("camera_movement", "static")
-            camera_movement = self.CAMERA_MOVEMENT_MAP.get(
-                camera_movement_str, CameraMovement.STATIC
-            )
-
-            # 生成运动提示词
-            motion_prompt = shot_info.get("action", "")
-
-            request = VideoGenerationRequest(
-                image_path=rendered["image_path"],
-                prompt=motion_prompt,
-                duration=min(shot_info.get("duration", 5), 5),  # 最长 5 秒
-                camera_movement=camera_movement,
-            )
+        shot_info = self._get_shot_info(rendered["shot_id"], storyboard)
+        request = self._build_request(rendered["image_path"], shot_info)
+        # 视频由服务直接流式写入存储，状态中只保留路径
+        request.output = StreamTarget(
+            project_id=project_id,
+            asset_type="video",
+            filename=f"shot_{rendered['scene_id']}_{rendered['shot_id']}.mp4",
+            content_type="video/mp4",
+        )
 
+        async with video_service.semaphore():
             result = await video_service.generate(request)
 
-            if result.success:
-                generated_videos.append({
-                    "shot_id": rendered["shot_id"],
-                    "scene_id": rendered["scene_id"],
-                    "video_data": result.data.video_data,
-                    "duration": result.data.duration,
-                    "success": True,
-                })
-            else:
-                generated_videos.append({
-                    "shot_id": rendered["shot_id"],
-                    "scene_id": rendered.get("scene_id"),
-                    "error": result.error,
-                    "success": False,
-                })
+        if not result.success:
+            return {
+                "shot_id": rendered["shot_id"],
+                "scene_id": rendered.get("scene_id"),
+                "error": result.error,
+                "success": False,
+            }
+
+        path = result.data.object_path
+        if not path:
+            # 服务不支持流式输出时回退为整体上传
+            path = await request.output.write_bytes(result.data.video_data)
+
+        return {
+            "shot_id": rendered["shot_id"],
+            "scene_id": rendered["scene_id"],
+            "video_path": path,
+            "duration": result.data.duration,
+            "success": True,
+        }
+
+    async def _generate_videos(self, state: VideoState) -> dict[str, Any]:
+        """
+        生成所有视频
+
+        所有镜头按 video 服务的 max_concurrency 一次性提交，由服务端共享轮询器
+        统一等待完成；每个视频完成后立即保存，结果按镜头顺序返回。
+        """
+        generated_videos = await self._map_with_progress(
+            state.rendered_shots,
+            lambda rendered: self.generate_shot_video(
+                rendered, state.storyboard, state.project_id
+            ),
+            lambda rendered: f"镜头 {rendered.get('shot_id')} 视频生成",
+        )
 
         return {
             "current_step": "generate_videos",
@@ -130,36 +168,8 @@ class VideoAgent(BaseAgent):
         }
 
     async def _save_results(self, state: VideoState) -> dict[str, Any]:
-        """保存视频结果"""
-        from src.storage import get_storage
-
-        storage = get_storage()
-        video_results = []
-
-        for video in state.generated_videos:
-            if video.get("success") and video.get("video_data"):
-                path = storage.upload_bytes(
-                    data=video["video_data"],
-                    project_id=state.project_id,
-                    asset_type="video",
-                    filename=f"shot_{video['scene_id']}_{video['shot_id']}.mp4",
-                    content_type="video/mp4",
-                )
-
-                video_results.append({
-                    "shot_id": video["shot_id"],
-                    "scene_id": video["scene_id"],
-                    "video_path": path,
-                    "duration": video.get("duration", 0),
-                    "success": True,
-                })
-            else:
-                video_results.append({
-                    "shot_id": video.get("shot_id"),
-                    "scene_id": video.get("scene_id"),
-                    "error": video.get("error", "Unknown error"),
-                    "success": False,
-                })
+        """汇总视频结果（视频已在生成时逐个保存）"""
+        video_results = state.generated_videos
 
         return {
             "current_step": "complete",
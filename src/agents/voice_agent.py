@@ -6,6 +6,7 @@ Voice Agent - 配音 Agent
 2. 支持声音克隆
 3. 不同角色使用不同音色
 """
+import asyncio
 from typing import Any
 
 from langgraph.graph import END, StateGraph
@@ -13,7 +14,8 @@ from pydantic import Field
 
 from src.agents.base_agent import AgentState, BaseAgent
 from src.services.factory import get_service_factory
-from src.services.voice.base import VoiceGenerationRequest
+from src.services.base import ServiceResult
+from src.services.voice.base import BaseVoiceService, VoiceGenerationRequest
 
 
 class VoiceState(AgentState):
@@ -47,6 +49,9 @@ class VoiceAgent(BaseAgent):
         "child": "zh-CN-XiaoshuangNeural",
     }
 
+    # 重试退避基数（秒），第 n 次重试等待 base * 2^(n-1)
+    RETRY_BACKOFF = 1.0
+
     def __init__(self):
         self.service_factory = get_service_factory()
         super().__init__()
@@ -55,9 +60,9 @@ class VoiceAgent(BaseAgent):
         """构建配音工作流图"""
         graph = StateGraph(VoiceState)
 
-        graph.add_node("assign_voices", self._assign_voices)
-        graph.add_node("generate_audio", self._generate_audio)
-        graph.add_node("save_results", self._save_results)
+        graph.add_node("assign_voices", self._traced_node("assign_voices", self._assign_voices))
+        graph.add_node("generate_audio", self._traced_node("generate_audio", self._generate_audio))
+        graph.add_node("save_results", self._traced_node("save_results", self._save_results))
 
         graph.set_entry_point("assign_voices")
         graph.add_edge("assign_voices", "generate_audio")
@@ -110,115 +115,130 @@ class VoiceAgent(BaseAgent):
             "character_voices": character_voices,
         }
 
-    async def _generate_audio(self, state: VoiceState) -> dict[str, Any]:
-        """生成配音"""
-        voice_service = self.service_factory.get_voice_service()
-        generated_audio = []
-
-        for shot in state.storyboard:
-            dialog = shot.get("dialog", {})
-            if not dialog or not dialog.get("text"):
-                generated_audio.append({
-                    "shot_id": shot.get("shot_id"),
-                    "has_dialog": False,
-                })
-                continue
+    def _build_request(
+        self,
+        dialog: dict[str, Any],
+        character_voices: dict[str, str],
+    ) -> VoiceGenerationRequest:
+        """构建单行对白的语音请求"""
+        text = dialog.get("text", "")
+        emotion = dialog.get("emotion", "neutral")
+
+        # 获取声音 ID
+        voice_id = character_voices.get(dialog.get("speaker", ""))
+
+        # 检查是否是声音克隆
+        if voice_id and voice_id.startswith("clone:"):
+            reference_audio = voice_id.replace("clone:", "")
+            return VoiceGenerationRequest(
+                text=text,
+                reference_audio=reference_audio,
+                emotion=emotion,
+            )
+        return VoiceGenerationRequest(
+            text=text,
+            voice_id=voice_id,
+            emotion=emotion,
+        )
 
-            speaker = dialog.get("speaker", "")
-            text = dialog.get("text", "")
-            emotion = dialog.get("emotion", "neutral")
-
-            # 获取声音 ID
-            voice_id = state.character_voices.get(speaker)
-
-            # 检查是否是声音克隆
-            if voice_id and voice_id.startswith("clone:"):
-                reference_audio = voice_id.replace("clone:", "")
-                request = VoiceGenerationRequest(
-                    text=text,
-                    reference_audio=reference_audio,
-                    emotion=emotion,
-                )
-            else:
-                request = VoiceGenerationRequest(
-                    text=text,
-                    voice_id=voice_id,
-                    emotion=emotion,
-                )
+    async def _synthesize_with_retry(
+        self,
+        voice_service: BaseVoiceService,
+        request: VoiceGenerationRequest,
+    ) -> ServiceResult:
+        """合成单行对白，失败时按指数退避重试"""
+        max_retries = int(voice_service.config.settings.get("max_retries", 0))
 
-            result = await voice_service.generate(request)
+        for attempt in range(max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self.RETRY_BACKOFF * 2 ** (attempt - 1))
 
+            async with voice_service.semaphore():
+                result = await voice_service.generate(request)
             if result.success:
-                generated_audio.append({
-                    "shot_id": shot.get("shot_id"),
-                    "scene_id": shot.get("scene_id"),
-                    "speaker": speaker,
-                    "text": text,
-                    "audio_data": result.data.audio_data,
-                    "duration": result.data.duration,
-                    "has_dialog": True,
-                    "success": True,
-                })
-            else:
-                generated_audio.append({
-                    "shot_id": shot.get("shot_id"),
-                    "scene_id": shot.get("scene_id"),
-                    "speaker": speaker,
-                    "text": text,
-                    "has_dialog": True,
-                    "error": result.error,
-                    "success": False,
-                })
+                return result
+
+        return result
+
+    async def synthesize_shot(
+        self,
+        shot: dict[str, Any],
+        character_voices: dict[str, str],
+        project_id: str,
+    ) -> dict[str, Any]:
+        """
+        合成并保存单个镜头的对白
+
+        Returns:
+            与 audio_files 中条目格式相同的结果
+        """
+        from src.storage import get_storage
+
+        dialog = shot.get("dialog", {})
+        if not dialog or not dialog.get("text"):
+            return {
+                "shot_id": shot.get("shot_id"),
+                "has_dialog": False,
+            }
+
+        speaker = dialog.get("speaker", "")
+        text = dialog.get("text", "")
+
+        voice_service = self.service_factory.get_voice_service()
+        request = self._build_request(dialog, character_voices)
+        result = await self._synthesize_with_retry(voice_service, request)
+
+        if not result.success:
+            return {
+                "shot_id": shot.get("shot_id"),
+                "scene_id": shot.get("scene_id"),
+                "speaker": speaker,
+                "text": text,
+                "has_dialog": True,
+                "error": result.error,
+                "success": False,
+            }
+
+        path = await get_storage().upload_bytes_async(
+            data=result.data.audio_data,
+            project_id=project_id,
+            asset_type="audio",
+            filename=f"dialog_{shot.get('scene_id')}_{shot.get('shot_id')}.mp3",
+            content_type="audio/mpeg",
+        )
 
         return {
-            "current_step": "generate_audio",
-            "generated_audio": generated_audio,
+            "shot_id": shot.get("shot_id"),
+            "scene_id": shot.get("scene_id"),
+            "speaker": speaker,
+            "text": text,
+            "audio_path": path,
+            "duration": result.data.duration,
+            "has_dialog": True,
+            "success": True,
         }
 
-    async def _save_results(self, state: VoiceState) -> dict[str, Any]:
-        """保存配音结果"""
-        from src.storage import get_storage
+    async def _generate_audio(self, state: VoiceState) -> dict[str, Any]:
+        """
+        生成配音
 
-        storage = get_storage()
-        audio_results = []
+        各行对白相互独立，按 voice 服务的 max_concurrency 并发合成，
+        单行失败会重试，合成后立即保存，结果按分镜顺序返回。
+        """
+        generated_audio = await self._map_with_progress(
+            state.storyboard,
+            lambda shot: self.synthesize_shot(shot, state.character_voices, state.project_id),
+            lambda shot: f"镜头 {shot.get('shot_id')} 配音",
+        )
 
-        for audio in state.generated_audio:
-            if not audio.get("has_dialog"):
-                audio_results.append({
-                    "shot_id": audio.get("shot_id"),
-                    "has_dialog": False,
-                })
-                continue
+        return {
+            "current_step": "generate_audio",
+            "generated_audio": generated_audio,
+        }
 
-            if audio.get("success") and audio.get("audio_data"):
-                path = storage.upload_bytes(
-                    data=audio["audio_data"],
-                    project_id=state.project_id,
-                    asset_type="audio",
-                    filename=f"dialog_{audio['scene_id']}_{audio['shot_id']}.mp3",
-                    content_type="audio/mpeg",
-                )
-
-                audio_results.append({
-                    "shot_id": audio["shot_id"],
-                    "scene_id": audio["scene_id"],
-                    "speaker": audio["speaker"],
-                    "text": audio["text"],
-                    "audio_path": path,
-                    "duration": audio.get("duration", 0),
-                    "has_dialog": True,
-                    "success": True,
-                })
-            else:
-                audio_results.append({
-                    "shot_id": audio.get("shot_id"),
-                    "scene_id": audio.get("scene_id"),
-                    "speaker": audio.get("speaker"),
-                    "text": audio.get("text"),
-                    "has_dialog": True,
-                    "error": audio.get("error", "Unknown error"),
-                    "success": False,
-                })
+    async def _save_results(self, state: VoiceState) -> dict[str, Any]:
+        """汇总配音结果（音频已在合成时逐个保存）"""
+        audio_results = state.generated_audio
 
         return {
             "current_step": "complete",
@@ -1,14 +1,22 @@
 """
 MangaForge API - Main Application Entry Point
 """
+import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.config.settings import get_settings
 from src.db.database import init_db, close_db
 from src.db.redis import init_redis, close_redis
+from src.observability.metrics import (
+    HTTP_REQUEST_DURATION,
+    metrics_payload,
+    update_render_cache_metrics,
+)
+from src.observability.tracing import flush_tracer
+from src.services.factory import get_service_factory
 
 settings = get_settings()
 
@@ -33,8 +41,10 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     print("Shutting down...")
+    await get_service_factory().aclose()
     await close_db()
     await close_redis()
+    flush_tracer()
     print("Cleanup complete")
 
 
@@ -57,6 +67,35 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """按路由模板记录请求耗时（避免路径参数导致标签基数膨胀）"""
+    if not settings.metrics_enabled:
+        return await call_next(request)
+
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.labels(
+            request.method,
+            getattr(route, "path", "unmatched"),
+            str(status),
+        ).observe(time.perf_counter() - started)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint."""
+    await update_render_cache_metrics()
+    content, content_type = metrics_payload()
+    return Response(content=content, media_type=content_type)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
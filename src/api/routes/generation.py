@@ -65,14 +65,21 @@ async def start_generation(
     task = Task(
         project_id=episode.project_id,
         episode_id=episode.id,
-        task_type="full_generation",
+        task_type="regeneration" if data.regenerate_from or data.storyboard else "full_generation",
         status="pending",
         payload={
             "style": data.style,
             "add_subtitles": data.add_subtitles,
             "bgm_path": data.bgm_path,
             "bgm_volume": data.bgm_volume,
+            "stream_shots": data.stream_shots,
+            "single_pass_edit": data.single_pass_edit,
+            "fresh_llm": data.fresh_llm,
+            "stream_script": data.stream_script,
+            "single_call_script": data.single_call_script,
             "regenerate_from": data.regenerate_from,
+            "shot_ids": data.shot_ids,
+            "storyboard": data.storyboard,
         },
     )
 
@@ -85,8 +92,11 @@ async def start_generation(
     await db.commit()
 
     # 触发 Celery 任务
-    from src.workers.tasks.generation import generate_manga_video
-    celery_task = generate_manga_video.delay(str(task.id))
+    from src.workers.tasks.generation import generate_manga_video, regenerate_stage
+    if data.regenerate_from:
+        celery_task = regenerate_stage.delay(str(task.id), data.regenerate_from, data.shot_ids)
+    else:
+        celery_task = generate_manga_video.delay(str(task.id))
 
     # 更新 celery_task_id
     task.celery_task_id = celery_task.id
@@ -131,6 +141,7 @@ async def get_generation_status(
         current_stage=task.result.get("current_stage") if task.result else None,
         message=task.result.get("message", "") if task.result else "",
         result=task.result,
+        usage=task.result.get("usage") if task.result else None,
         error=task.error,
         started_at=task.started_at.isoformat() if task.started_at else None,
         completed_at=task.completed_at.isoformat() if task.completed_at else None,
@@ -16,6 +16,26 @@ class GenerationRequest(BaseModel):
     add_subtitles: bool = True
     bgm_path: Optional[str] = None
     bgm_volume: float = Field(default=0.3, ge=0, le=1)
+    stream_shots: bool = Field(
+        default=False,
+        description="逐镜头流式执行 渲染 → 图生视频 → 口型同步",
+    )
+    single_pass_edit: bool = Field(
+        default=True,
+        description="剪辑时单次编码完成拼接、BGM 混音和字幕烧录",
+    )
+    fresh_llm: bool = Field(
+        default=False,
+        description="不使用 LLM 响应缓存，重新生成剧本/角色/分镜文本",
+    )
+    stream_script: bool = Field(
+        default=False,
+        description="流式生成剧本，角色生成后立即开始设计角色",
+    )
+    single_call_script: bool = Field(
+        default=False,
+        description="跳过故事分析，一次 LLM 调用生成剧本",
+    )
 
     # 重新生成选项
     regenerate_from: Optional[str] = Field(
@@ -23,6 +43,14 @@ class GenerationRequest(BaseModel):
         pattern="^(script|character|storyboard|render|video|voice|lipsync|edit)$",
         description="从指定阶段重新生成",
     )
+    shot_ids: Optional[list[int]] = Field(
+        None,
+        description="只重新生成这些镜头（配合 regenerate_from 使用）",
+    )
+    storyboard: Optional[list[dict[str, Any]]] = Field(
+        None,
+        description="编辑后的分镜；提供时沿用已有剧本/角色，只重新生成有变化的镜头",
+    )
 
 
 class GenerationProgress(BaseModel):
@@ -50,6 +78,8 @@ class GenerationStatusResponse(BaseModel):
     current_stage: Optional[str]
     message: str
     result: Optional[dict[str, Any]] = None
+    # 用量汇总：LLM token/延迟、GPU 秒数、视频片段秒数（按阶段和模型）
+    usage: Optional[dict[str, Any]] = None
     error: Optional[str] = None
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
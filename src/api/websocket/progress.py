@@ -10,6 +10,7 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
 from starlette.websockets import WebSocketState
 
 from src.db.redis import get_redis_client
+from src.observability.metrics import PUBSUB_DELIVERED, WEBSOCKET_CONNECTIONS, record_publish
 
 router = APIRouter()
 
@@ -31,6 +32,7 @@ class ConnectionManager:
     ):
         """接受 WebSocket 连接"""
         await websocket.accept()
+        WEBSOCKET_CONNECTIONS.labels("task" if task_id else "user").inc()
 
         if task_id:
             if task_id not in self.active_connections:
@@ -49,6 +51,7 @@ class ConnectionManager:
         user_id: str | None = None,
     ):
         """断开 WebSocket 连接"""
+        WEBSOCKET_CONNECTIONS.labels("task" if task_id else "user").dec()
         if task_id and task_id in self.active_connections:
             if websocket in self.active_connections[task_id]:
                 self.active_connections[task_id].remove(websocket)
@@ -156,6 +159,7 @@ async def websocket_task_progress(
             if message and message["type"] == "message":
                 data = json.loads(message["data"])
                 await manager.send_personal_message(data, websocket)
+                PUBSUB_DELIVERED.labels("task").inc()
 
                 # 如果任务完成，关闭连接
                 if data.get("type") in ("complete", "error", "cancelled"):
@@ -225,6 +229,7 @@ async def websocket_user_notifications(
             if message and message["type"] == "message":
                 data = json.loads(message["data"])
                 await manager.send_personal_message(data, websocket)
+                PUBSUB_DELIVERED.labels("user").inc()
 
             # 心跳处理
             try:
@@ -276,7 +281,8 @@ async def publish_task_progress(
         "timestamp": datetime.utcnow().isoformat(),
     }
 
-    await redis.publish(f"task:{task_id}:progress", json.dumps(payload))
+    channel = f"task:{task_id}:progress"
+    record_publish(channel, await redis.publish(channel, json.dumps(payload)))
 
 
 async def publish_user_notification(
@@ -300,4 +306,5 @@ async def publish_user_notification(
         "timestamp": datetime.utcnow().isoformat(),
     }
 
-    await redis.publish(f"user:{user_id}:notifications", json.dumps(payload))
+    channel = f"user:{user_id}:notifications"
+    record_publish(channel, await redis.publish(channel, json.dumps(payload)))
@@ -1,6 +1,7 @@
 """
 Redis Client Configuration
 """
+import asyncio
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 from typing import Optional
@@ -14,26 +15,36 @@ settings = get_settings()
 
 # Global Redis client instance
 _redis_client: Optional[Redis] = None
+# Event loop the client's connection pool is bound to
+_redis_loop: Optional[asyncio.AbstractEventLoop] = None
 
 
 async def init_redis() -> Redis:
-    """Initialize Redis connection."""
-    global _redis_client
-    if _redis_client is None:
+    """Initialize Redis connection.
+
+    The connection pool is bound to the running event loop, so a new client
+    is created when called from a different loop (Celery tasks run each job
+    in a fresh loop).
+    """
+    global _redis_client, _redis_loop
+    loop = asyncio.get_running_loop()
+    if _redis_client is None or _redis_loop is not loop:
         _redis_client = redis.from_url(
             settings.redis_url,
             encoding="utf-8",
             decode_responses=True,
         )
+        _redis_loop = loop
     return _redis_client
 
 
 async def close_redis() -> None:
     """Close Redis connection."""
-    global _redis_client
+    global _redis_client, _redis_loop
     if _redis_client is not None:
         await _redis_client.close()
         _redis_client = None
+        _redis_loop = None
 
 
 async def get_redis() -> AsyncGenerator[Redis, None]:
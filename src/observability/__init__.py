@@ -0,0 +1,32 @@
+"""
+MangaForge Observability Module
+"""
+from .metrics import (
+    metrics_payload,
+    record_publish,
+    start_worker_exporter,
+)
+from .tracing import (
+    JSONFileExporter,
+    OTLPExporter,
+    Span,
+    Tracer,
+    current_span,
+    flush_tracer,
+    get_tracer,
+    span,
+)
+
+__all__ = [
+    "JSONFileExporter",
+    "OTLPExporter",
+    "Span",
+    "Tracer",
+    "current_span",
+    "flush_tracer",
+    "get_tracer",
+    "metrics_payload",
+    "record_publish",
+    "span",
+    "start_worker_exporter",
+]
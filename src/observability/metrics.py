@@ -0,0 +1,233 @@
+"""
+Prometheus Metrics - 扩缩容指标
+
+API 进程通过 /metrics 暴露，Celery Worker 通过 start_worker_exporter 启动的 HTTP 端口暴露。
+多进程部署（gunicorn 多 worker / Celery prefork）时设置 PROMETHEUS_MULTIPROC_DIR，
+各进程写入共享目录，由暴露端点汇总。
+"""
+import glob
+import os
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# ===========================================
+# API
+# ===========================================
+
+HTTP_REQUEST_DURATION = Histogram(
+    "mangaforge_http_request_duration_seconds",
+    "HTTP 请求耗时（按路由模板）",
+    ["method", "route", "status"],
+)
+
+WEBSOCKET_CONNECTIONS = Gauge(
+    "mangaforge_websocket_connections",
+    "当前 WebSocket 连接数",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+
+# ===========================================
+# Redis pub/sub
+# ===========================================
+
+PUBSUB_PUBLISHED = Counter(
+    "mangaforge_pubsub_published_total",
+    "发布到 Redis 频道的消息数",
+    ["channel"],
+)
+
+PUBSUB_FANOUT = Histogram(
+    "mangaforge_pubsub_fanout_receivers",
+    "每条发布消息的订阅者数",
+    ["channel"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100),
+)
+
+PUBSUB_DELIVERED = Counter(
+    "mangaforge_pubsub_delivered_total",
+    "通过 WebSocket 转发给客户端的消息数",
+    ["channel"],
+)
+
+# ===========================================
+# 生成任务
+# ===========================================
+
+STAGE_DURATION = Histogram(
+    "mangaforge_stage_duration_seconds",
+    "生成阶段耗时",
+    ["stage", "status"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600),
+)
+
+PROVIDER_REQUESTS = Counter(
+    "mangaforge_provider_requests_total",
+    "后端服务调用次数（outcome: success / error / timeout）",
+    ["service_type", "provider", "outcome"],
+)
+
+IN_FLIGHT_REQUESTS = Gauge(
+    "mangaforge_in_flight_requests",
+    "各后端正在进行的请求数（镜头级调用即在途镜头数）",
+    ["service_type", "provider"],
+    multiprocess_mode="livesum",
+)
+
+# ===========================================
+# 渲染缓存（统计存放在 Redis，抓取 API /metrics 时读取）
+# ===========================================
+
+RENDER_CACHE_LOOKUPS = Gauge(
+    "mangaforge_render_cache_lookups",
+    "渲染缓存累计查询次数（result: hit / miss）",
+    ["result"],
+    multiprocess_mode="mostrecent",
+)
+
+RENDER_CACHE_ENTRIES = Gauge(
+    "mangaforge_render_cache_entries",
+    "渲染缓存条目数",
+    multiprocess_mode="mostrecent",
+)
+
+RENDER_CACHE_BYTES = Gauge(
+    "mangaforge_render_cache_bytes",
+    "渲染缓存占用字节数",
+    multiprocess_mode="mostrecent",
+)
+
+# 导出队列深度的 Celery 队列
+MONITORED_QUEUES = ("generation", "callbacks")
+
+
+def channel_type(channel: str) -> str:
+    """频道名 -> 指标标签（task:<id>:progress -> task）"""
+    return channel.split(":", 1)[0]
+
+
+def record_publish(channel: str, receivers: int) -> None:
+    """记录一次 Redis 发布及其订阅者数"""
+    label = channel_type(channel)
+    PUBSUB_PUBLISHED.labels(label).inc()
+    PUBSUB_FANOUT.labels(label).observe(receivers or 0)
+
+
+async def update_render_cache_metrics() -> None:
+    """从 Redis 读取渲染缓存统计并更新指标（未启用缓存或读取失败时跳过）"""
+    from src.config.settings import get_settings
+    from src.services.image.render_cache import RenderCache
+
+    settings = get_settings()
+    if not settings.render_cache_enabled:
+        return
+
+    try:
+        stats = await RenderCache(max_bytes=settings.render_cache_max_mb * 1024 * 1024).stats()
+    except Exception:
+        return
+
+    RENDER_CACHE_LOOKUPS.labels("hit").set(stats["hits"])
+    RENDER_CACHE_LOOKUPS.labels("miss").set(stats["misses"])
+    RENDER_CACHE_ENTRIES.set(stats["entries"])
+    RENDER_CACHE_BYTES.set(stats["total_bytes"])
+
+
+def _registry() -> CollectorRegistry:
+    """多进程模式下汇总共享目录中的指标，否则使用默认注册表"""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_payload() -> tuple[bytes, str]:
+    """生成 /metrics 响应内容"""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+class _QueueDepthCollector:
+    """抓取时通过 broker 查询 Celery 队列深度"""
+
+    def __init__(self, queues: tuple[str, ...]):
+        self.queues = queues
+
+    def collect(self):
+        from src.workers.celery_app import celery_app
+
+        gauge = GaugeMetricFamily(
+            "mangaforge_queue_depth",
+            "Celery 队列中等待的任务数",
+            labels=["queue"],
+        )
+        try:
+            with celery_app.connection_or_acquire() as conn:
+                channel = conn.default_channel
+                for queue in self.queues:
+                    try:
+                        _, depth, _ = channel.queue_declare(queue=queue, passive=True)
+                    except Exception:
+                        continue
+                    gauge.add_metric([queue], depth)
+        except Exception:
+            # broker 不可用时本次抓取不输出队列深度
+            pass
+        yield gauge
+
+
+_worker_exporter_started = False
+
+
+def multiprocess_enabled() -> bool:
+    """是否启用多进程指标（设置了 PROMETHEUS_MULTIPROC_DIR）"""
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def _reset_multiprocess_dir() -> None:
+    """创建并清空多进程指标目录（上次运行残留的进程文件会被重复汇总）"""
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
+
+def start_worker_exporter(port: int, addr: str = "0.0.0.0") -> None:
+    """
+    启动 Worker 指标 HTTP 端点（在 Worker 主进程、fork 子进程之前调用一次）
+
+    除进程内指标外，额外导出 generation / callbacks 队列深度。
+    prefork 池下子进程的指标只有设置 PROMETHEUS_MULTIPROC_DIR 才能汇总到该端点。
+    """
+    global _worker_exporter_started
+    if _worker_exporter_started:
+        return
+
+    if multiprocess_enabled():
+        _reset_multiprocess_dir()
+
+    registry = _registry()
+    registry.register(_QueueDepthCollector(MONITORED_QUEUES))
+    start_http_server(port, addr=addr, registry=registry)
+    _worker_exporter_started = True
+
+
+def mark_process_dead(pid: Optional[int] = None) -> None:
+    """多进程模式下清理已退出子进程的 livesum 指标"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
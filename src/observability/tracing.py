@@ -0,0 +1,269 @@
+"""
+Tracing - 阶段/镜头耗时追踪
+
+OpenTelemetry 风格的 span：Agent run、LangGraph 节点、服务 generate 调用和存储传输
+各自记录一个 span，当前 span 通过 contextvar 在异步任务间传递，形成调用树。
+shot_id（合并渲染为 shot_ids）/ provider 等属性由子 span 继承，便于按镜头或后端筛选。
+
+结束的 span 交给后台线程批量导出到本地 JSON Lines 文件或 OTLP/HTTP 收集器，
+导出不阻塞事件循环；未启用时 span() 不做任何记录。
+"""
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+# 子 span 自动继承的属性
+INHERITED_ATTRIBUTES = ("shot_id", "shot_ids", "stage", "project_id", "provider")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+@dataclass
+class Span:
+    """一次计时的操作"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        """耗时（秒）"""
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration": round(self.duration, 6),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _BatchExporter(ABC):
+    """后台线程批量导出 span"""
+
+    def __init__(self, batch_size: int = 256, flush_interval: float = 2.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=10000)
+        # 导出线程与 flush() 互斥，避免同一批 span 被并发写出
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._worker, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # 导出跟不上时丢弃，不影响生成
+            pass
+
+    def flush(self) -> None:
+        """立即导出队列中所有 span（进程退出前调用，导出线程为守护线程不会自行收尾）"""
+        with self._lock:
+            self._drain(0)
+
+    def _worker(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            with self._lock:
+                self._drain(self.batch_size)
+
+    def _drain(self, batch_size: int) -> None:
+        """取出队列中的 span 分批导出；batch_size 为 0 时一次导出全部"""
+        while True:
+            batch: list[Span] = []
+            while not batch_size or len(batch) < batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            try:
+                self._export_batch(batch)
+            except Exception:
+                pass
+
+    @abstractmethod
+    def _export_batch(self, spans: list[Span]) -> None:
+        """导出一批 span"""
+
+
+class JSONFileExporter(_BatchExporter):
+    """追加写入本地 JSON Lines 文件（每行一个 span）"""
+
+    def __init__(self, path: Union[str, Path], **kwargs: Any):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(**kwargs)
+
+    def _export_batch(self, spans: list[Span]) -> None:
+        with self.path.open("a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+class OTLPExporter(_BatchExporter):
+    """以 OTLP/HTTP JSON 格式发送到收集器的 /v1/traces"""
+
+    def __init__(self, endpoint: str, service_name: str, **kwargs: Any):
+        self.url = f"{endpoint.rstrip('/')}/v1/traces"
+        self.service_name = service_name
+        super().__init__(**kwargs)
+
+    def _export_batch(self, spans: list[Span]) -> None:
+        import httpx
+
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "mangaforge"},
+                    "spans": [self._otlp_span(span) for span in spans],
+                }],
+            }],
+        }
+        httpx.post(self.url, json=payload, timeout=10)
+
+    def _otlp_span(self, span: Span) -> dict[str, Any]:
+        otlp = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [self._attribute(key, value) for key, value in span.attributes.items()],
+            # STATUS_CODE_OK / STATUS_CODE_ERROR
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp["parentSpanId"] = span.parent_id
+        return otlp
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> dict[str, Any]:
+        if isinstance(value, bool):
+            wrapped = {"boolValue": value}
+        elif isinstance(value, int):
+            wrapped = {"intValue": str(value)}
+        elif isinstance(value, float):
+            wrapped = {"doubleValue": value}
+        else:
+            wrapped = {"stringValue": str(value)}
+        return {"key": key, "value": wrapped}
+
+
+class Tracer:
+    """创建 span 并交给导出器"""
+
+    def __init__(self, exporter: Optional[_BatchExporter] = None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        在上下文内记录一个 span（未启用时产出 None）
+
+        Args:
+            name: 操作名，如 "render_agent.run"、"kling.generate"
+            **attributes: span 属性；值为 None 的属性忽略
+        """
+        if not self.exporter:
+            yield None
+            return
+
+        parent = _current_span.get()
+        inherited = {
+            key: parent.attributes[key]
+            for key in INHERITED_ATTRIBUTES
+            if parent and key in parent.attributes
+        }
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes={**inherited, **{k: v for k, v in attributes.items() if v is not None}},
+        )
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self.exporter.export(span)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """获取全局 Tracer（按配置创建导出器）"""
+    global _tracer
+    if _tracer is None:
+        from src.config.settings import get_settings
+
+        settings = get_settings()
+        exporter: Optional[_BatchExporter] = None
+        if settings.tracing_enabled:
+            if settings.tracing_exporter == "otlp":
+                exporter = OTLPExporter(settings.otlp_endpoint, settings.tracing_service_name)
+            else:
+                # 每个进程单独一个文件，避免多个 Worker 进程交错写入
+                path = Path(settings.tracing_json_path)
+                exporter = JSONFileExporter(path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}"))
+        _tracer = Tracer(exporter)
+    return _tracer
+
+
+def flush_tracer() -> None:
+    """导出全局 Tracer 中尚未发送的 span（进程关闭时调用）"""
+    if _tracer is not None and _tracer.exporter is not None:
+        _tracer.exporter.flush()
+
+
+def span(name: str, **attributes: Any):
+    """在全局 Tracer 上记录 span 的便捷函数"""
+    return get_tracer().span(name, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    """获取当前 span"""
+    return _current_span.get()
+
@@ -1,13 +1,19 @@
 """
 MangaForge Services Module - Pluggable AI Service Backends
 """
-from .base import BaseService, ServiceConfig, ServiceResult
+from .base import BaseService, ServiceConfig, ServiceResult, StreamTarget
 from .factory import ServiceFactory, get_service_factory
+from .metering import UsageMeter, current_meter, metering, metering_stage
 
 __all__ = [
     "BaseService",
     "ServiceConfig",
     "ServiceResult",
+    "StreamTarget",
     "ServiceFactory",
     "get_service_factory",
+    "UsageMeter",
+    "current_meter",
+    "metering",
+    "metering_stage",
 ]
@@ -1,10 +1,26 @@
 """
 Base Service Interface
 """
+import asyncio
+import contextvars
+import functools
+import importlib.util
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Optional
+
+from src.observability.metrics import IN_FLIGHT_REQUESTS, PROVIDER_REQUESTS
+from src.observability.tracing import span
+
+if TYPE_CHECKING:
+    import httpx
+
+# 流式下载的数据块大小
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# 安装了 h2 时共享 HTTP 客户端启用 HTTP/2
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
 
 
 class ServiceType(str, Enum):
@@ -49,14 +65,176 @@ class ServiceResult:
         return cls(success=False, error=error, metadata=metadata or {})
 
 
+@dataclass
+class StreamTarget:
+    """
+    流式输出目标
+
+    请求中携带该目标时，服务将结果文件按块直接写入对象存储，
+    结果中只返回存储路径，不在内存中保留完整文件。
+    """
+    project_id: str
+    asset_type: str
+    filename: str
+    content_type: Optional[str] = None
+
+    async def write(self, chunks: AsyncIterator[bytes]) -> str:
+        """写入数据块流，返回存储路径"""
+        from src.storage import get_storage
+
+        return await get_storage().upload_stream_async(
+            chunks,
+            project_id=self.project_id,
+            asset_type=self.asset_type,
+            filename=self.filename,
+            content_type=self.content_type,
+        )
+
+    async def write_bytes(self, data: bytes) -> str:
+        """写入已在内存中的数据（如 base64 返回的结果），返回存储路径"""
+        from src.storage import get_storage
+
+        return await get_storage().upload_bytes_async(
+            data=data,
+            project_id=self.project_id,
+            asset_type=self.asset_type,
+            filename=self.filename,
+            content_type=self.content_type,
+        )
+
+
+# 当前正在计数的服务实例（generate_batch 回退为逐个 generate 时不重复计数）
+_metered_service: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "metered_service", default=None
+)
+
+
+def _outcome(result: Any) -> str:
+    """ServiceResult -> success / timeout / error"""
+    if result.success:
+        return "success"
+    return "timeout" if "timeout" in str(result.error or "").lower() else "error"
+
+
+def _traced_method(method_name: str, method: Any) -> Any:
+    """
+    包装服务方法
+
+    每次调用记录一个 span（属性含 provider、服务类型和模型），
+    并更新该后端的在途请求数和调用结果计数（批量调用按请求数计）。
+    """
+    @functools.wraps(method)
+    async def traced(self: "BaseService", *args: Any, **kwargs: Any) -> Any:
+        labels = (self.service_type.value, self.provider)
+        metered = _metered_service.get() != id(self)
+        requests = args[0] if method_name == "generate_batch" and args else None
+        count = len(requests) if isinstance(requests, list) else 1
+
+        token = _metered_service.set(id(self)) if metered else None
+        if metered:
+            IN_FLIGHT_REQUESTS.labels(*labels).inc(count)
+        try:
+            with span(
+                f"{self.provider}.{method_name}",
+                provider=self.provider,
+                service_type=self.service_type.value,
+                model=self.config.model,
+            ):
+                result = await method(self, *args, **kwargs)
+        except Exception as e:
+            if metered:
+                # asyncio / httpx 的超时异常类名均含 Timeout
+                outcome = "timeout" if "timeout" in type(e).__name__.lower() else "error"
+                PROVIDER_REQUESTS.labels(*labels, outcome).inc(count)
+            raise
+        finally:
+            if metered:
+                IN_FLIGHT_REQUESTS.labels(*labels).dec(count)
+                _metered_service.reset(token)
+
+        if metered:
+            for item in result if isinstance(result, list) else [result]:
+                PROVIDER_REQUESTS.labels(*labels, _outcome(item)).inc()
+        return result
+
+    return traced
+
+
 class BaseService(ABC):
     """服务基类"""
 
     service_type: ServiceType
     provider: str
 
+    # 记录 span 的调用入口（<provider>.<方法名>）
+    TRACED_METHODS = ("generate", "generate_batch")
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        for method_name in cls.TRACED_METHODS:
+            method = cls.__dict__.get(method_name)
+            if method is None or getattr(method, "__isabstractmethod__", False):
+                continue
+            setattr(cls, method_name, _traced_method(method_name, method))
+
     def __init__(self, config: ServiceConfig):
         self.config = config
+        # 同一后端同时进行的请求数上限
+        self.max_concurrency = max(1, int(config.settings.get("max_concurrency", 1)))
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http_client: Optional["httpx.AsyncClient"] = None
+        self._http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def semaphore(self) -> asyncio.Semaphore:
+        """
+        获取该后端的并发信号量
+
+        服务实例会被工厂缓存并跨事件循环复用（Celery 每个任务新建事件循环），
+        因此按当前运行的事件循环惰性创建。
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def http_client(self) -> "httpx.AsyncClient":
+        """
+        获取该服务的共享 HTTP 客户端
+
+        长连接复用（连接池 + keep-alive，可用时启用 HTTP/2），
+        与信号量相同，按当前运行的事件循环惰性创建。
+        """
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if (
+            self._http_client is None
+            or self._http_client_loop is not loop
+            or self._http_client.is_closed
+        ):
+            settings = self.config.settings
+            self._http_client = httpx.AsyncClient(
+                timeout=settings.get("timeout", 60),
+                http2=HTTP2_AVAILABLE and settings.get("http2", True),
+                limits=httpx.Limits(
+                    max_connections=settings.get("http_max_connections", 100),
+                    max_keepalive_connections=settings.get("http_max_keepalive", 20),
+                    keepalive_expiry=settings.get("http_keepalive_expiry", 30.0),
+                ),
+            )
+            self._http_client_loop = loop
+        return self._http_client
+
+    async def aclose(self) -> None:
+        """关闭共享 HTTP 客户端（在创建它的事件循环结束前调用）"""
+        client, self._http_client = self._http_client, None
+        loop, self._http_client_loop = self._http_client_loop, None
+        if client is None or client.is_closed:
+            return
+        if loop is asyncio.get_running_loop():
+            await client.aclose()
 
     @abstractmethod
     async def health_check(self) -> bool:
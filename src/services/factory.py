@@ -11,10 +11,12 @@ from src.services.llm.base import BaseLLMService
 from src.services.llm.anthropic_service import AnthropicService
 from src.services.llm.openai_service import OpenAIService
 from src.services.llm.gemini_service import GeminiService
+from src.services.llm.cache import CachedLLMService
 
 # Image Services
 from src.services.image.base import BaseImageService
 from src.services.image.comfyui_service import ComfyUIService
+from src.services.image.comfyui_pool_service import ComfyUIPoolService
 
 # Video Services
 from src.services.video.base import BaseVideoService
@@ -39,6 +41,7 @@ SERVICE_REGISTRY: dict[ServiceType, dict[str, Type[BaseService]]] = {
     },
     ServiceType.IMAGE: {
         "comfyui": ComfyUIService,
+        "comfyui-pool": ComfyUIPoolService,
     },
     ServiceType.VIDEO: {
         "kling": KlingService,
@@ -123,6 +126,11 @@ class ServiceFactory:
         config = ServiceConfig(provider=provider)
 
         if service_type == ServiceType.LLM:
+            config.settings = {
+                "max_concurrency": self.settings.llm_max_concurrency,
+                "prompt_cache": self.settings.llm_prompt_cache,
+                "prompt_cache_ttl": self.settings.llm_prompt_cache_ttl,
+            }
             if provider == "anthropic":
                 config.api_key = self.settings.anthropic_api_key
                 config.model = self.settings.anthropic_model
@@ -136,22 +144,65 @@ class ServiceFactory:
         elif service_type == ServiceType.IMAGE:
             if provider == "comfyui":
                 config.endpoint = self.settings.comfyui_url
-                config.settings = {"timeout": self.settings.comfyui_timeout}
+                config.settings = {
+                    "timeout": self.settings.comfyui_timeout,
+                    "max_concurrency": self.settings.comfyui_max_concurrency,
+                    "use_websocket": self.settings.comfyui_use_websocket,
+                    "batch_size": self.settings.comfyui_batch_size,
+                    "cache_enabled": self.settings.render_cache_enabled,
+                    "cache_max_bytes": self.settings.render_cache_max_mb * 1024 * 1024,
+                }
+            elif provider == "comfyui-pool":
+                endpoints = self.settings.comfyui_urls_list or [self.settings.comfyui_url]
+                config.settings = {
+                    "endpoints": endpoints,
+                    "timeout": self.settings.comfyui_timeout,
+                    # 池的总并发为各主机并发之和
+                    "max_concurrency": self.settings.comfyui_max_concurrency * len(endpoints),
+                    "host_max_concurrency": self.settings.comfyui_max_concurrency,
+                    "use_websocket": self.settings.comfyui_use_websocket,
+                    "batch_size": self.settings.comfyui_batch_size,
+                    "cache_enabled": self.settings.render_cache_enabled,
+                    "cache_max_bytes": self.settings.render_cache_max_mb * 1024 * 1024,
+                    "eject_seconds": self.settings.comfyui_pool_eject_seconds,
+                    "swap_penalty": self.settings.comfyui_pool_swap_penalty,
+                }
 
         elif service_type == ServiceType.VIDEO:
             if provider == "kling":
                 # 需要用户配置 API Key
-                pass
+                config.settings = {
+                    "max_concurrency": self.settings.kling_max_concurrency,
+                    "submit_interval": self.settings.kling_submit_interval,
+                    "poll_interval": self.settings.kling_poll_interval,
+                }
 
         elif service_type == ServiceType.VOICE:
             if provider == "fish-speech":
                 config.endpoint = "http://localhost:8080"
+                config.settings = {
+                    "max_concurrency": self.settings.fish_speech_max_concurrency,
+                    "max_retries": self.settings.voice_max_retries,
+                }
             elif provider == "edge-tts":
-                pass  # 无需配置
+                config.settings = {
+                    "max_concurrency": self.settings.edge_tts_max_concurrency,
+                    "max_retries": self.settings.voice_max_retries,
+                }
 
         elif service_type == ServiceType.LIPSYNC:
             if provider == "sadtalker":
                 config.endpoint = "http://localhost:7860"
+                config.settings = {"max_concurrency": self.settings.sadtalker_max_concurrency}
+
+        # 共享 HTTP 客户端的连接池设置
+        for key, value in {
+            "http2": self.settings.http2_enabled,
+            "http_max_connections": self.settings.http_max_connections,
+            "http_max_keepalive": self.settings.http_max_keepalive,
+            "http_keepalive_expiry": self.settings.http_keepalive_expiry,
+        }.items():
+            config.settings.setdefault(key, value)
 
         return config
 
@@ -160,16 +211,27 @@ class ServiceFactory:
         provider: Optional[str] = None,
         config: Optional[ServiceConfig] = None,
     ) -> BaseLLMService:
-        """获取 LLM 服务"""
+        """获取 LLM 服务（启用 LLM 缓存时返回缓存包装器）"""
         provider = provider or self.settings.llm_provider
-        return self.create_service(ServiceType.LLM, provider, config)
+        return self.with_llm_cache(self.create_service(ServiceType.LLM, provider, config))
+
+    def with_llm_cache(self, service: BaseLLMService) -> BaseLLMService:
+        """按配置为 LLM 服务加上响应缓存"""
+        if not self.settings.llm_cache_enabled:
+            return service
+        return CachedLLMService(
+            service,
+            ttl=self.settings.llm_cache_ttl,
+            max_entries=self.settings.llm_cache_max_entries,
+        )
 
     def get_image_service(
         self,
-        provider: str = "comfyui",
+        provider: Optional[str] = None,
         config: Optional[ServiceConfig] = None,
     ) -> BaseImageService:
         """获取图像生成服务"""
+        provider = provider or self.settings.image_provider
         return self.create_service(ServiceType.IMAGE, provider, config)
 
     def get_video_service(
@@ -206,6 +268,14 @@ class ServiceFactory:
         """清除服务缓存"""
         self._service_cache.clear()
 
+    async def aclose(self) -> None:
+        """关闭所有缓存服务的 HTTP 连接（服务实例保留，下次使用时重建连接）"""
+        for key, service in self._service_cache.items():
+            try:
+                await service.aclose()
+            except Exception as e:
+                print(f"Warning: failed to close service {key}: {e}")
+
 
 # 全局工厂实例
 _factory: Optional[ServiceFactory] = None
@@ -242,11 +312,11 @@ async def create_llm_service_from_user_config(
 
     if service_config and service_config.api_key:
         factory = get_service_factory()
-        return factory.create_service(
+        return factory.with_llm_cache(factory.create_service(
             ServiceType.LLM,
             service_config.provider,
             service_config,
-        )
+        ))
 
     return None
 
@@ -298,6 +368,10 @@ class LLMServiceWithFallback:
         self.services = services
         self.current_index = 0
 
+    def semaphore(self):
+        """并发限制沿用主提供商的信号量"""
+        return self.services[0].semaphore()
+
     async def generate(self, *args, **kwargs):
         """尝试生成，失败时自动回退"""
         last_error = None
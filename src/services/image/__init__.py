@@ -3,10 +3,14 @@ Image Generation Service Module
 """
 from .base import BaseImageService, ImageGenerationRequest, ImageGenerationResult
 from .comfyui_service import ComfyUIService
+from .comfyui_pool_service import ComfyUIPoolService
+from .render_cache import RenderCache
 
 __all__ = [
     "BaseImageService",
     "ImageGenerationRequest",
     "ImageGenerationResult",
     "ComfyUIService",
+    "ComfyUIPoolService",
+    "RenderCache",
 ]
@@ -1,9 +1,10 @@
 """
 Base Image Generation Service Interface
 """
+import asyncio
 from abc import abstractmethod
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
 
 from src.services.base import BaseService, ServiceConfig, ServiceResult, ServiceType
 
@@ -32,6 +33,12 @@ class ImageGenerationRequest:
     batch_size: int = 1
     settings: dict[str, Any] = field(default_factory=dict)
 
+    # False 时跳过渲染缓存读取（强制重新生成），结果仍写入缓存
+    use_cache: bool = True
+
+    # 节点执行进度回调: ({"node", "value", "max"})，后端支持时调用
+    progress_callback: Optional[Callable[[dict[str, Any]], Awaitable[None]]] = None
+
 
 @dataclass
 class ImageGenerationResult:
@@ -40,6 +47,8 @@ class ImageGenerationResult:
     seeds: list[int]  # 使用的种子
     prompt: str
     metadata: dict[str, Any] = field(default_factory=dict)
+    # 已在对象存储中的图像（渲染缓存命中时为缓存对象名，此时 images 为空，需要字节时再下载）
+    stored_images: list[str] = field(default_factory=list)
 
     @property
     def first_image(self) -> Optional[bytes]:
@@ -52,6 +61,11 @@ class BaseImageService(BaseService):
 
     service_type = ServiceType.IMAGE
 
+    def __init__(self, config: ServiceConfig):
+        super().__init__(config)
+        # 单个工作流最多合并的请求数（1 表示不合并）
+        self.max_batch_size = max(1, int(config.settings.get("batch_size", 1)))
+
     @abstractmethod
     async def generate(
         self,
@@ -68,6 +82,61 @@ class BaseImageService(BaseService):
         """
         pass
 
+    def checkpoint_name(self, request: ImageGenerationRequest) -> str:
+        """
+        请求实际使用的基础模型（Checkpoint），用于按模型亲和度调度
+
+        Returns:
+            模型名称，后端没有可切换的基础模型时返回空字符串
+        """
+        return ""
+
+    def batch_key(self, request: ImageGenerationRequest) -> Optional[tuple]:
+        """
+        请求的合并分组键，键相同的请求可通过 generate_batch 一次生成
+
+        Returns:
+            分组键，None 表示该请求不能合并
+        """
+        return None
+
+    def batch_groups(self, requests: list[ImageGenerationRequest]) -> list[list[int]]:
+        """
+        将请求按 batch_key 分组，每组不超过 max_batch_size
+
+        Returns:
+            请求下标分组，组内及组间保持输入顺序
+        """
+        groups: list[list[int]] = []
+        open_groups: dict[tuple, list[int]] = {}
+
+        for i, request in enumerate(requests):
+            key = self.batch_key(request) if self.max_batch_size > 1 else None
+            if key is None:
+                groups.append([i])
+                continue
+
+            group = open_groups.get(key)
+            if group is None or len(group) >= self.max_batch_size:
+                group = []
+                open_groups[key] = group
+                groups.append(group)
+            group.append(i)
+
+        return groups
+
+    async def generate_batch(
+        self,
+        requests: list[ImageGenerationRequest],
+    ) -> list[ServiceResult]:
+        """
+        批量生成图像（默认逐个生成，后端可重写为单次提交）
+
+        Returns:
+            与 requests 顺序一致的 ServiceResult with ImageGenerationResult
+        """
+        return list(await asyncio.gather(*(self.generate(request) for request in requests)))
+
     @abstractmethod
     async def get_workflows(self) -> list[str]:
         """获取可用工作流列表"""
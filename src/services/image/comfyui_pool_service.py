@@ -0,0 +1,239 @@
+"""
+ComfyUI Pool Image Generation Service
+
+将 prompt 分发到多台 ComfyUI 主机：按队列深度选择负载最低的主机，
+优先选择刚加载过相同 Checkpoint/LoRA 的主机；连续失败的主机暂时摘除，
+所有主机都不可用时仍逐个尝试。
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from src.services.base import ServiceConfig, ServiceResult
+from .base import BaseImageService, ImageGenerationRequest
+from .comfyui_service import ComfyUIService
+
+
+@dataclass
+class _ComfyUIHost:
+    """池中单台 ComfyUI 主机的状态"""
+    service: ComfyUIService
+    queue_depth: int = 0  # /queue 中运行 + 排队的 prompt 数
+    in_flight: int = 0  # 本进程已提交、尚未完成的请求数
+    failures: int = 0  # 连续失败次数
+    ejected_until: float = 0.0
+    warm_key: Optional[tuple] = None  # 最近提交的 Checkpoint/LoRA
+    loras: set[str] = field(default_factory=set)  # 主机上可用的 LoRA（健康检查时刷新）
+
+    @property
+    def endpoint(self) -> str:
+        return self.service.base_url
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class ComfyUIPoolService(BaseImageService):
+    """多台 ComfyUI 主机的负载均衡图像生成服务"""
+
+    provider = "comfyui-pool"
+
+    def __init__(self, config: ServiceConfig):
+        super().__init__(config)
+        settings = dict(config.settings)
+        endpoints = settings.pop("endpoints", None) or [config.endpoint or "http://localhost:8188"]
+
+        # 每台主机一个 ComfyUI 服务实例，沿用单机的并发、缓存和事件订阅设置
+        host_settings = {**settings, "max_concurrency": settings.get("host_max_concurrency", 1)}
+        self.hosts = [
+            _ComfyUIHost(service=ComfyUIService(ServiceConfig(
+                provider="comfyui",
+                endpoint=endpoint,
+                settings=dict(host_settings),
+            )))
+            for endpoint in endpoints
+        ]
+
+        self.refresh_interval = settings.get("refresh_interval", 2.0)
+        self.max_failures = settings.get("max_failures", 3)
+        self.eject_seconds = settings.get("eject_seconds", 30.0)
+        # 冷主机需要换模型，相当于多排队的 prompt 数
+        self.swap_penalty = settings.get("swap_penalty", 2.0)
+
+        self._refreshed_at = 0.0
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._refresh_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def health_check(self) -> bool:
+        """任意一台主机可用即视为可用"""
+        results = await asyncio.gather(*(host.service.health_check() for host in self.hosts))
+        return any(results)
+
+    async def get_models(self) -> list[str]:
+        """获取所有主机可用模型的并集"""
+        return self._union(await asyncio.gather(*(host.service.get_models() for host in self.hosts)))
+
+    async def get_workflows(self) -> list[str]:
+        """获取可用工作流列表"""
+        return await self.hosts[0].service.get_workflows()
+
+    async def get_loras(self) -> list[str]:
+        """获取所有主机可用 LoRA 的并集"""
+        return self._union(await asyncio.gather(*(host.service.get_loras() for host in self.hosts)))
+
+    def batch_key(self, request: ImageGenerationRequest) -> Optional[tuple]:
+        """分组键与单机一致"""
+        return self.hosts[0].service.batch_key(request)
+
+    async def generate(
+        self,
+        request: ImageGenerationRequest,
+    ) -> ServiceResult:
+        """在选中的主机上生成图像，主机不可用时换下一台"""
+        return await self._dispatch(
+            self._model_key(request),
+            lambda service: self._generate_on(service, request),
+        )
+
+    async def generate_batch(
+        self,
+        requests: list[ImageGenerationRequest],
+    ) -> list[ServiceResult]:
+        """整组请求在同一台主机上以一个工作流生成"""
+        if not requests:
+            return []
+
+        async def run(service: ComfyUIService) -> list[ServiceResult]:
+            async with service.semaphore():
+                return await service.generate_batch(requests)
+
+        return await self._dispatch(self._model_key(requests[0]), run)
+
+    async def aclose(self) -> None:
+        """关闭所有主机的连接"""
+        for host in self.hosts:
+            await host.service.aclose()
+        await super().aclose()
+
+    # ===========================================
+    # 调度
+    # ===========================================
+
+    async def _generate_on(
+        self,
+        service: ComfyUIService,
+        request: ImageGenerationRequest,
+    ) -> ServiceResult:
+        async with service.semaphore():
+            return await service.generate(request)
+
+    async def _dispatch(self, model_key: tuple, run: Any) -> Any:
+        """
+        按候选顺序在主机上执行，结果失败且主机健康检查不通过时换下一台
+
+        Args:
+            model_key: 请求所需的 Checkpoint/LoRA
+            run: 接收 ComfyUIService 的协程函数，返回 ServiceResult 或其列表
+        """
+        await self._refresh()
+
+        result = None
+        for host in self._candidates(model_key):
+            host.in_flight += 1
+            try:
+                result = await run(host.service)
+            finally:
+                host.in_flight -= 1
+
+            if self._succeeded(result):
+                host.failures = 0
+                host.warm_key = model_key
+                return result
+
+            # 失败可能来自 prompt 本身，主机仍然健康时不再换主机重试
+            if await host.service.health_check():
+                host.failures = 0
+                return result
+            self._record_failure(host)
+
+        return result if result is not None else ServiceResult.fail("No ComfyUI host available")
+
+    def _candidates(self, model_key: tuple) -> list[_ComfyUIHost]:
+        """
+        候选主机排序：可用主机按 (排队数 + 换模型代价) 升序；
+        被摘除的主机排在最后，作为全部不可用时的兜底
+        """
+        now = time.monotonic()
+        lora = model_key[1]
+
+        def score(host: _ComfyUIHost) -> tuple:
+            load = host.queue_depth + host.in_flight
+            if host.warm_key != model_key:
+                load += self.swap_penalty
+            missing_lora = bool(lora and host.loras and lora not in host.loras)
+            return (not host.available(now), missing_lora, load)
+
+        return sorted(self.hosts, key=score)
+
+    async def _refresh(self) -> None:
+        """刷新各主机的队列深度（间隔 refresh_interval，并发请求 /queue）"""
+        loop = asyncio.get_running_loop()
+        if self._refresh_lock is None or self._refresh_loop is not loop:
+            self._refresh_lock = asyncio.Lock()
+            self._refresh_loop = loop
+
+        async with self._refresh_lock:
+            if time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            await asyncio.gather(*(self._refresh_host(host) for host in self.hosts))
+            self._refreshed_at = time.monotonic()
+
+    async def _refresh_host(self, host: _ComfyUIHost) -> None:
+        now = time.monotonic()
+        if not host.available(now):
+            return
+
+        try:
+            client = host.service.http_client()
+            response = await client.get(f"{host.endpoint}/queue", timeout=5)
+            response.raise_for_status()
+            data = response.json()
+            host.queue_depth = len(data.get("queue_running", [])) + len(data.get("queue_pending", []))
+
+            # 被摘除后恢复的主机重新获取 LoRA 列表
+            if not host.loras:
+                host.loras = set(await host.service.get_loras())
+            host.failures = 0
+        except Exception:
+            self._record_failure(host)
+
+    def _record_failure(self, host: _ComfyUIHost) -> None:
+        """记录失败，连续失败达到上限时摘除一段时间"""
+        host.failures += 1
+        if host.failures >= self.max_failures:
+            host.ejected_until = time.monotonic() + self.eject_seconds
+            host.failures = 0
+            host.warm_key = None
+            host.loras = set()
+
+    def checkpoint_name(self, request: ImageGenerationRequest) -> str:
+        """各主机使用相同的工作流构建逻辑"""
+        return self.hosts[0].service.checkpoint_name(request)
+
+    def _model_key(self, request: ImageGenerationRequest) -> tuple:
+        return (self.checkpoint_name(request), request.lora_name)
+
+    @staticmethod
+    def _succeeded(result: Any) -> bool:
+        if isinstance(result, list):
+            return any(item.success for item in result)
+        return bool(result and result.success)
+
+    @staticmethod
+    def _union(lists: list[list[str]]) -> list[str]:
+        seen: dict[str, None] = {}
+        for items in lists:
+            for item in items:
+                seen.setdefault(item, None)
+        return list(seen)
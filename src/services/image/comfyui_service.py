@@ -3,13 +3,186 @@ ComfyUI Image Generation Service Implementation
 """
 import asyncio
 import json
+import time
 import uuid
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
 
 import httpx
 
 from src.services.base import ServiceConfig, ServiceResult
+from src.observability.tracing import span
+from src.services.metering import current_meter
 from .base import BaseImageService, ImageGenerationRequest, ImageGenerationResult
+from .render_cache import RenderCache
+
+
+# 节点进度回调: (prompt_id, {"node", "value", "max"})
+PromptProgressCallback = Callable[[str, dict[str, Any]], Awaitable[None]]
+
+
+class _ComfyUIEventStream:
+    """
+    ComfyUI 执行事件订阅
+
+    每个服务实例（每个事件循环）维持一条 /ws?clientId= 连接，所有在途 prompt 共用。
+    prompt 执行完成时 resolve 对应 future，progress 事件转发给各 prompt 的回调。
+    连接中断时 future resolve 为 None，调用方回退为轮询 /history。
+    """
+
+    # 无在途 prompt 后保持连接的时间（秒），连续渲染时避免反复重连
+    IDLE_LINGER = 10.0
+    # 最近完成的 prompt 结果最多保留的条数（用于提交后、登记前就已完成的 prompt）
+    MAX_FINISHED = 256
+
+    def __init__(self, service: "ComfyUIService"):
+        self.service = service
+        self.client_id = uuid.uuid4().hex
+        self._users = 0
+        self._runner: Optional[asyncio.Task] = None
+        self._connected: Optional[asyncio.Future] = None
+        self._futures: dict[str, asyncio.Future] = {}
+        self._callbacks: dict[str, PromptProgressCallback] = {}
+        self._outputs: dict[str, list[dict[str, Any]]] = {}
+        self._finished: dict[str, dict[str, Any]] = {}
+
+    async def acquire(self) -> bool:
+        """
+        登记一个使用者并确保连接已建立（提交 prompt 前调用，避免漏掉事件）
+
+        Returns:
+            连接是否可用，False 时调用方应回退为轮询（无需 release）
+        """
+        if self._runner is None or self._runner.done():
+            self._connected = asyncio.get_running_loop().create_future()
+            self._runner = asyncio.create_task(self._run(), name="comfyui-events")
+
+        self._users += 1
+        if await asyncio.shield(self._connected):
+            return True
+        self._users -= 1
+        return False
+
+    def release(self) -> None:
+        """注销使用者"""
+        self._users -= 1
+
+    def watch(
+        self,
+        prompt_id: str,
+        progress_callback: Optional[PromptProgressCallback] = None,
+    ) -> asyncio.Future:
+        """
+        登记 prompt，返回完成时 resolve 的 future
+
+        结果为 {"images": [...图像信息], "error": 错误信息或 None}，连接中断时为 None。
+        """
+        future = asyncio.get_running_loop().create_future()
+        if prompt_id in self._finished:
+            future.set_result(self._finished[prompt_id])
+            return future
+
+        self._futures[prompt_id] = future
+        if progress_callback:
+            self._callbacks[prompt_id] = progress_callback
+        return future
+
+    def forget(self, prompt_id: str) -> None:
+        """放弃等待 prompt（超时时调用），使连接可以空闲退出"""
+        self._futures.pop(prompt_id, None)
+        self._callbacks.pop(prompt_id, None)
+        self._outputs.pop(prompt_id, None)
+
+    def close(self) -> None:
+        """关闭连接"""
+        if self._runner and not self._runner.done():
+            self._runner.cancel()
+
+    async def _run(self) -> None:
+        """接收事件直到没有使用者并空闲超过 IDLE_LINGER"""
+        try:
+            import websockets
+
+            async with websockets.connect(self.service.ws_url(self.client_id), max_size=None) as ws:
+                self._connected.set_result(True)
+                idle_since: Optional[float] = None
+
+                while True:
+                    if self._users > 0 or self._futures:
+                        idle_since = None
+                    elif idle_since is None:
+                        idle_since = time.monotonic()
+                    elif time.monotonic() - idle_since > self.IDLE_LINGER:
+                        break
+
+                    try:
+                        message = await asyncio.wait_for(ws.recv(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        continue
+
+                    # 二进制消息为采样预览图，忽略
+                    if isinstance(message, str):
+                        await self._dispatch(json.loads(message))
+
+        except Exception:
+            pass
+        finally:
+            if self._connected and not self._connected.done():
+                self._connected.set_result(False)
+            # 连接中断：在途 prompt 交由调用方轮询
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_result(None)
+            self._futures.clear()
+            self._callbacks.clear()
+            self._outputs.clear()
+
+    async def _dispatch(self, message: dict[str, Any]) -> None:
+        """处理单条执行事件"""
+        event = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return
+
+        if event == "progress":
+            callback = self._callbacks.get(prompt_id)
+            if callback:
+                try:
+                    await callback(prompt_id, {
+                        "node": data.get("node"),
+                        "value": data.get("value", 0),
+                        "max": data.get("max", 0),
+                    })
+                except Exception:
+                    pass
+
+        elif event == "executed":
+            # 记录输出节点，批量工作流按节点区分各镜头的图像
+            node = data.get("node")
+            images = (data.get("output") or {}).get("images", [])
+            self._outputs.setdefault(prompt_id, []).extend({**img, "node": node} for img in images)
+
+        elif event == "execution_success" or (event == "executing" and data.get("node") is None):
+            self._finish(prompt_id, None)
+
+        elif event in ("execution_error", "execution_interrupted"):
+            error = data.get("exception_message") or event
+            self._finish(prompt_id, str(error))
+
+    def _finish(self, prompt_id: str, error: Optional[str]) -> None:
+        """prompt 执行结束（结束事件可能先后到达多条，只处理第一条）"""
+        if prompt_id in self._finished:
+            return
+
+        outcome = {"images": self._outputs.pop(prompt_id, []), "error": error}
+        self._callbacks.pop(prompt_id, None)
+        self._finished[prompt_id] = outcome
+        while len(self._finished) > self.MAX_FINISHED:
+            self._finished.pop(next(iter(self._finished)))
+
+        future = self._futures.pop(prompt_id, None)
+        if future is not None and not future.done():
+            future.set_result(outcome)
 
 
 class ComfyUIService(BaseImageService):
@@ -22,32 +195,65 @@ class ComfyUIService(BaseImageService):
         self.base_url = config.endpoint or "http://localhost:8188"
         self.timeout = config.settings.get("timeout", 300)
 
+        # 通过 websocket 执行事件等待完成（不可用时回退为轮询 /history）
+        self.use_websocket = config.settings.get("use_websocket", True)
+        self._events: Optional[_ComfyUIEventStream] = None
+        self._events_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # 渲染缓存（仅对固定种子的请求生效）
+        self.render_cache: Optional[RenderCache] = None
+        if config.settings.get("cache_enabled", False):
+            self.render_cache = RenderCache(
+                max_bytes=config.settings.get("cache_max_bytes", 10 * 1024**3),
+            )
+
+    def ws_url(self, client_id: str) -> str:
+        """执行事件 websocket 地址"""
+        base = self.base_url.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        return f"{base}/ws?clientId={client_id}"
+
+    def _event_stream(self) -> _ComfyUIEventStream:
+        """获取当前事件循环的事件订阅（服务实例跨事件循环复用）"""
+        loop = asyncio.get_running_loop()
+        if self._events is None or self._events_loop is not loop:
+            self._events = _ComfyUIEventStream(self)
+            self._events_loop = loop
+        return self._events
+
+    async def aclose(self) -> None:
+        """关闭执行事件连接和共享 HTTP 客户端"""
+        if self._events is not None and self._events_loop is asyncio.get_running_loop():
+            self._events.close()
+        self._events = None
+        self._events_loop = None
+        await super().aclose()
+
     async def health_check(self) -> bool:
         """检查 ComfyUI 服务是否可用"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/system_stats",
-                    timeout=10,
-                )
-                return response.status_code == 200
+            client = self.http_client()
+            response = await client.get(
+                f"{self.base_url}/system_stats",
+                timeout=10,
+            )
+            return response.status_code == 200
         except Exception:
             return False
 
     async def get_models(self) -> list[str]:
         """获取可用模型列表"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/object_info/CheckpointLoaderSimple",
-                    timeout=30,
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("CheckpointLoaderSimple", {}).get(
-                        "input", {}
-                    ).get("required", {}).get("ckpt_name", [[]])[0]
-                return []
+            client = self.http_client()
+            response = await client.get(
+                f"{self.base_url}/object_info/CheckpointLoaderSimple",
+                timeout=30,
+            )
+            if response.status_code == 200:
+                data = response.json()
+                return data.get("CheckpointLoaderSimple", {}).get(
+                    "input", {}
+                ).get("required", {}).get("ckpt_name", [[]])[0]
+            return []
         except Exception:
             return []
 
@@ -64,17 +270,17 @@ class ComfyUIService(BaseImageService):
     async def get_loras(self) -> list[str]:
         """获取可用 LoRA 列表"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/object_info/LoraLoader",
-                    timeout=30,
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("LoraLoader", {}).get(
-                        "input", {}
-                    ).get("required", {}).get("lora_name", [[]])[0]
-                return []
+            client = self.http_client()
+            response = await client.get(
+                f"{self.base_url}/object_info/LoraLoader",
+                timeout=30,
+            )
+            if response.status_code == 200:
+                data = response.json()
+                return data.get("LoraLoader", {}).get(
+                    "input", {}
+                ).get("required", {}).get("lora_name", [[]])[0]
+            return []
         except Exception:
             return []
 
@@ -160,83 +366,375 @@ class ComfyUIService(BaseImageService):
 
         return workflow
 
+    def _build_batch_workflow(
+        self,
+        requests: list[ImageGenerationRequest],
+    ) -> tuple[dict[str, Any], list[str]]:
+        """
+        构建批量工作流：共享 Checkpoint / LoRA 加载，每个请求一条独立的
+        CLIPTextEncode -> KSampler -> VAEDecode -> SaveImage 分支
+
+        Returns:
+            (工作流, 与 requests 顺序一致的各分支 SaveImage 节点 ID)
+        """
+        # 共享的模型加载节点（"4" Checkpoint、"10" LoRA）沿用单张工作流的定义
+        base = self._build_workflow(requests[0])
+        workflow = {node_id: base[node_id] for node_id in ("4", "10") if node_id in base}
+
+        save_nodes = []
+        for i, request in enumerate(requests):
+            single = self._build_workflow(request)
+            prefix = f"b{i}_"
+            for node_id in ("3", "5", "6", "7", "8", "9"):
+                node = single[node_id]
+                for name, value in node["inputs"].items():
+                    # 分支内引用改为带前缀的节点，共享节点引用保持不变
+                    if isinstance(value, list) and value[0] in ("3", "5", "6", "7", "8"):
+                        node["inputs"][name] = [prefix + value[0], value[1]]
+                workflow[prefix + node_id] = node
+
+            workflow[prefix + "9"]["inputs"]["filename_prefix"] = f"mangaforge_{prefix}"
+            save_nodes.append(prefix + "9")
+
+        return workflow, save_nodes
+
+    def checkpoint_name(self, request: ImageGenerationRequest) -> str:
+        """工作流中 CheckpointLoader 节点加载的模型"""
+        return self._build_workflow(request)["4"]["inputs"]["ckpt_name"]
+
+    def batch_key(self, request: ImageGenerationRequest) -> Optional[tuple]:
+        """Checkpoint、LoRA 和尺寸相同的单张请求可合并到同一工作流"""
+        if request.batch_size != 1:
+            return None
+        return (
+            self.checkpoint_name(request),
+            request.lora_name,
+            request.lora_weight if request.lora_name else None,
+            request.width,
+            request.height,
+        )
+
     async def generate(
         self,
         request: ImageGenerationRequest,
     ) -> ServiceResult:
-        """生成图像"""
+        """
+        生成图像
+
+        固定种子的单张请求先查渲染缓存，命中时返回缓存对象名（stored_images），不占用 GPU。
+        """
         try:
             workflow = self._build_workflow(request)
-            prompt_id = str(uuid.uuid4())
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # 提交工作流
+            cache_key = None
+            if self.render_cache and request.seed >= 0 and request.batch_size == 1:
+                cache_key = RenderCache.make_key(workflow)
+                cached = await self.render_cache.get(cache_key) if request.use_cache else None
+                if cached is not None:
+                    return ServiceResult.ok(ImageGenerationResult(
+                        images=[],
+                        stored_images=[cached],
+                        seeds=[request.seed],
+                        prompt=request.prompt,
+                        metadata={"cache_hit": True, "cache_key": cache_key},
+                    ))
+
+            queue_prompt_id, outputs = await self._run_prompt(workflow, request.progress_callback)
+            images = [image for node_images in outputs.values() for image in node_images]
+
+            if not images:
+                return ServiceResult.fail("No images generated")
+
+            if cache_key:
+                await self.render_cache.put(cache_key, images[0])
+
+            result = ImageGenerationResult(
+                images=images,
+                seeds=[request.seed if request.seed >= 0 else -1],
+                prompt=request.prompt,
+                metadata={"prompt_id": queue_prompt_id, "cache_hit": False},
+            )
+
+            return ServiceResult.ok(result)
+
+        except httpx.TimeoutException:
+            return ServiceResult.fail("Request timeout")
+        except Exception as e:
+            return ServiceResult.fail(f"Generation failed: {e}")
+
+    async def generate_batch(
+        self,
+        requests: list[ImageGenerationRequest],
+    ) -> list[ServiceResult]:
+        """
+        在一个工作流中生成多张图像（模型加载和 VAE 在组内共享）
+
+        请求须具有相同的 batch_key，否则逐个生成。命中渲染缓存的请求不进入工作流。
+        """
+        keys = {self.batch_key(request) for request in requests}
+        if len(requests) <= 1 or None in keys or len(keys) > 1:
+            return await super().generate_batch(requests)
+
+        results: list[Optional[ServiceResult]] = [None] * len(requests)
+        cache_keys: list[Optional[str]] = [None] * len(requests)
+
+        try:
+            if self.render_cache:
+                for i, request in enumerate(requests):
+                    if request.seed < 0:
+                        continue
+                    cache_keys[i] = RenderCache.make_key(self._build_workflow(request))
+                    if not request.use_cache:
+                        continue
+                    cached = await self.render_cache.get(cache_keys[i])
+                    if cached is not None:
+                        results[i] = ServiceResult.ok(ImageGenerationResult(
+                            images=[],
+                            stored_images=[cached],
+                            seeds=[request.seed],
+                            prompt=request.prompt,
+                            metadata={"cache_hit": True, "cache_key": cache_keys[i]},
+                        ))
+
+            pending = [i for i, result in enumerate(results) if result is None]
+            if pending:
+                workflow, save_nodes = self._build_batch_workflow([requests[i] for i in pending])
+                queue_prompt_id, outputs = await self._run_prompt(
+                    workflow, self._batch_progress([requests[i] for i in pending])
+                )
+
+                for i, save_node in zip(pending, save_nodes):
+                    images = outputs.get(save_node, [])
+                    if not images:
+                        results[i] = ServiceResult.fail("No images generated")
+                        continue
+
+                    if cache_keys[i]:
+                        await self.render_cache.put(cache_keys[i], images[0])
+
+                    request = requests[i]
+                    results[i] = ServiceResult.ok(ImageGenerationResult(
+                        images=images,
+                        seeds=[request.seed if request.seed >= 0 else -1],
+                        prompt=request.prompt,
+                        metadata={
+                            "prompt_id": queue_prompt_id,
+                            "cache_hit": False,
+                            "batch_size": len(pending),
+                        },
+                    ))
+
+        except httpx.TimeoutException:
+            results = [result or ServiceResult.fail("Request timeout") for result in results]
+        except Exception as e:
+            results = [result or ServiceResult.fail(f"Generation failed: {e}") for result in results]
+
+        return results
+
+    async def _run_prompt(
+        self,
+        workflow: dict[str, Any],
+        progress_callback: Optional[Callable[[dict[str, Any]], Awaitable[None]]] = None,
+    ) -> tuple[str, dict[str, list[bytes]]]:
+        """
+        提交工作流并等待完成
+
+        Returns:
+            (prompt_id, 输出节点 ID -> 图像字节数据列表)
+        """
+        client = self.http_client()
+        events = self._event_stream() if self.use_websocket else None
+        if events and not await events.acquire():
+            events = None
+
+        started = time.monotonic()
+        try:
+            with span("comfyui.prompt", endpoint=self.base_url, websocket=events is not None) as prompt_span:
+                # 提交工作流（使用事件订阅的 clientId，执行事件才会推送到该连接）
                 response = await client.post(
                     f"{self.base_url}/prompt",
                     json={
                         "prompt": workflow,
-                        "client_id": prompt_id,
+                        "client_id": events.client_id if events else str(uuid.uuid4()),
                     },
+                    timeout=self.timeout,
                 )
 
                 if response.status_code != 200:
-                    return ServiceResult.fail(f"Failed to submit prompt: {response.text}")
+                    raise RuntimeError(f"Failed to submit prompt: {response.text}")
 
-                result_data = response.json()
-                queue_prompt_id = result_data.get("prompt_id")
+                queue_prompt_id = response.json().get("prompt_id")
 
-                # 轮询等待结果
-                images = await self._wait_for_result(client, queue_prompt_id)
+                if events:
+                    outputs = await self._wait_for_events(
+                        client, events, queue_prompt_id, progress_callback
+                    )
+                else:
+                    # 轮询等待结果
+                    outputs = await self._wait_for_result(client, queue_prompt_id)
 
-                if not images:
-                    return ServiceResult.fail("No images generated")
+                if outputs:
+                    await self._record_usage(client, queue_prompt_id, outputs, started, prompt_span)
+            return queue_prompt_id, outputs
 
-                result = ImageGenerationResult(
-                    images=images,
-                    seeds=[request.seed if request.seed >= 0 else -1],
-                    prompt=request.prompt,
-                    metadata={"prompt_id": queue_prompt_id},
-                )
+        finally:
+            if events:
+                events.release()
 
-                return ServiceResult.ok(result)
+    async def _record_usage(
+        self,
+        client: httpx.AsyncClient,
+        prompt_id: str,
+        outputs: dict[str, list[bytes]],
+        started: float,
+        prompt_span: Optional[Any] = None,
+    ) -> None:
+        """将 prompt 的 GPU 执行秒数记入当前任务的计量器，并在 span 上区分排队和执行耗时"""
+        meter = current_meter()
+        if not meter and not prompt_span:
+            return
 
-        except httpx.TimeoutException:
-            return ServiceResult.fail("Request timeout")
-        except Exception as e:
-            return ServiceResult.fail(f"Generation failed: {e}")
+        latency = time.monotonic() - started
+        gpu_seconds = await self._execution_seconds(client, prompt_id)
+
+        if prompt_span:
+            prompt_span.set_attribute("prompt_id", prompt_id)
+            if gpu_seconds is not None:
+                prompt_span.set_attribute("execution_seconds", round(gpu_seconds, 3))
+                # 非执行部分：主要是排队，另含提交和下载
+                prompt_span.set_attribute("queue_seconds", round(max(0.0, latency - gpu_seconds), 3))
+        if not meter:
+            return
+
+        meter.record_gpu(
+            self.provider,
+            gpu_seconds if gpu_seconds is not None else latency,
+            latency,
+            sum(len(images) for images in outputs.values()),
+        )
+
+    async def _execution_seconds(
+        self,
+        client: httpx.AsyncClient,
+        prompt_id: str,
+    ) -> Optional[float]:
+        """
+        从历史记录的执行状态消息计算执行耗时（不含排队时间）
+
+        Returns:
+            execution_start 到 execution_success 的秒数，无法获取时返回 None
+        """
+        try:
+            response = await client.get(f"{self.base_url}/history/{prompt_id}", timeout=10)
+            messages = response.json().get(prompt_id, {}).get("status", {}).get("messages", [])
+            timestamps = {event: data.get("timestamp") for event, data in messages}
+            start, end = timestamps.get("execution_start"), timestamps.get("execution_success")
+            if start is None or end is None:
+                return None
+            # ComfyUI 的时间戳单位为毫秒
+            return max(0.0, (end - start) / 1000)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _batch_progress(
+        requests: list[ImageGenerationRequest],
+    ) -> Optional[Callable[[dict[str, Any]], Awaitable[None]]]:
+        """合并工作流的进度转发给各请求的回调（同一回调只调用一次）"""
+        callbacks = list({id(r.progress_callback): r.progress_callback
+                          for r in requests if r.progress_callback}.values())
+        if not callbacks:
+            return None
+
+        async def report(progress: dict[str, Any]) -> None:
+            for callback in callbacks:
+                await callback(progress)
+
+        return report
+
+    async def _wait_for_events(
+        self,
+        client: httpx.AsyncClient,
+        events: _ComfyUIEventStream,
+        prompt_id: str,
+        progress_callback: Optional[Callable[[dict[str, Any]], Awaitable[None]]] = None,
+    ) -> dict[str, list[bytes]]:
+        """通过执行事件等待结果，连接中断时回退为轮询"""
+
+        async def on_progress(_: str, progress: dict[str, Any]) -> None:
+            await progress_callback(progress)
+
+        future = events.watch(prompt_id, on_progress if progress_callback else None)
+        try:
+            outcome = await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            events.forget(prompt_id)
+            # 结束事件可能丢失，放弃前最后查一次历史记录
+            return await self._history_images(client, prompt_id)
+
+        if outcome is None:
+            return await self._wait_for_result(client, prompt_id)
+        if outcome["error"]:
+            raise RuntimeError(outcome["error"])
+
+        if outcome["images"]:
+            return await self._download_images(client, outcome["images"])
+        # 输出节点命中 ComfyUI 自身的执行缓存时没有 executed 事件，从历史记录读取
+        return await self._history_images(client, prompt_id)
 
     async def _wait_for_result(
         self,
         client: httpx.AsyncClient,
         prompt_id: str,
         max_wait: int = 300,
-    ) -> list[bytes]:
-        """等待生成结果"""
+    ) -> dict[str, list[bytes]]:
+        """轮询历史记录等待生成结果"""
         for _ in range(max_wait):
-            # 检查历史记录
-            response = await client.get(f"{self.base_url}/history/{prompt_id}")
-            if response.status_code == 200:
-                history = response.json()
-                if prompt_id in history:
-                    outputs = history[prompt_id].get("outputs", {})
-                    images = []
-                    for node_output in outputs.values():
-                        if "images" in node_output:
-                            for img_info in node_output["images"]:
-                                # 下载图像
-                                img_response = await client.get(
-                                    f"{self.base_url}/view",
-                                    params={
-                                        "filename": img_info["filename"],
-                                        "subfolder": img_info.get("subfolder", ""),
-                                        "type": img_info.get("type", "output"),
-                                    },
-                                )
-                                if img_response.status_code == 200:
-                                    images.append(img_response.content)
-                    if images:
-                        return images
+            outputs = await self._history_images(client, prompt_id)
+            if outputs:
+                return outputs
 
             await asyncio.sleep(1)
 
-        return []
+        return {}
+
+    async def _history_images(
+        self,
+        client: httpx.AsyncClient,
+        prompt_id: str,
+    ) -> dict[str, list[bytes]]:
+        """读取历史记录中的输出图像，尚未完成时返回空字典"""
+        response = await client.get(f"{self.base_url}/history/{prompt_id}")
+        if response.status_code != 200:
+            return {}
+
+        history = response.json()
+        if prompt_id not in history:
+            return {}
+
+        outputs = history[prompt_id].get("outputs", {})
+        return await self._download_images(client, [
+            {**img_info, "node": node_id}
+            for node_id, node_output in outputs.items()
+            for img_info in node_output.get("images", [])
+        ])
+
+    async def _download_images(
+        self,
+        client: httpx.AsyncClient,
+        image_infos: list[dict[str, Any]],
+    ) -> dict[str, list[bytes]]:
+        """下载输出图像，按输出节点分组"""
+        outputs: dict[str, list[bytes]] = {}
+        for img_info in image_infos:
+            img_response = await client.get(
+                f"{self.base_url}/view",
+                params={
+                    "filename": img_info["filename"],
+                    "subfolder": img_info.get("subfolder", ""),
+                    "type": img_info.get("type", "output"),
+                },
+            )
+            if img_response.status_code == 200:
+                outputs.setdefault(str(img_info.get("node")), []).append(img_response.content)
+        return outputs
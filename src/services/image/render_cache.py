@@ -0,0 +1,133 @@
+"""
+Content-addressed Render Cache
+
+以完整 ComfyUI 工作流（固定种子）的规范化哈希为键，缓存渲染结果。
+图像存放在 MinIO 的 cache/render/ 下，索引、LRU 顺序和命中统计存放在 Redis。
+命中时只返回缓存对象名，由调用方在服务端复制到项目路径，图像字节不经过 Worker。
+"""
+import hashlib
+import json
+import time
+from typing import Any, Optional
+
+
+class RenderCache:
+    """渲染结果缓存（按总大小做 LRU 淘汰）"""
+
+    OBJECT_PREFIX = "cache/render"
+    KEY_PREFIX = "mangaforge:render_cache"
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+        self._lru_key = f"{self.KEY_PREFIX}:lru"  # zset: key -> 最近访问时间
+        self._sizes_key = f"{self.KEY_PREFIX}:sizes"  # hash: key -> 字节数
+        self._total_key = f"{self.KEY_PREFIX}:total_bytes"
+        self._hits_key = f"{self.KEY_PREFIX}:hits"
+        self._misses_key = f"{self.KEY_PREFIX}:misses"
+
+    @staticmethod
+    def make_key(workflow: dict[str, Any]) -> str:
+        """计算工作流的规范化哈希"""
+        canonical = json.dumps(workflow, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _object_name(self, key: str) -> str:
+        return f"{self.OBJECT_PREFIX}/{key}.png"
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        查询缓存
+
+        Returns:
+            缓存图像的对象名，未命中或查询失败返回 None
+        """
+        from src.db.redis import init_redis
+        from src.storage import get_storage
+
+        try:
+            client = await init_redis()
+
+            if await client.zscore(self._lru_key, key) is None:
+                await client.incr(self._misses_key)
+                return None
+
+            object_name = self._object_name(key)
+            if not await get_storage().exists_async(object_name):
+                # 索引存在但对象已丢失，清理后按未命中处理
+                await self._remove(client, key)
+                await client.incr(self._misses_key)
+                return None
+
+            await client.zadd(self._lru_key, {key: time.time()})
+            await client.incr(self._hits_key)
+            return object_name
+
+        except Exception:
+            return None
+
+    async def put(self, key: str, data: bytes) -> None:
+        """写入缓存，超出容量时淘汰最久未访问的条目"""
+        from src.db.redis import init_redis
+        from src.storage import get_storage
+
+        try:
+            await get_storage().put_bytes_async(self._object_name(key), data, "image/png")
+
+            client = await init_redis()
+            previous = await client.hget(self._sizes_key, key)
+
+            pipe = client.pipeline()
+            pipe.zadd(self._lru_key, {key: time.time()})
+            pipe.hset(self._sizes_key, key, len(data))
+            pipe.incrby(self._total_key, len(data) - int(previous or 0))
+            await pipe.execute()
+
+            await self._evict(client)
+
+        except Exception:
+            # 缓存写入失败不影响生成结果
+            pass
+
+    async def _evict(self, client) -> None:
+        """淘汰最久未访问的条目直到总大小不超过上限"""
+        from src.storage import get_storage
+
+        total = int(await client.get(self._total_key) or 0)
+        while total > self.max_bytes:
+            popped = await client.zpopmin(self._lru_key, 1)
+            if not popped:
+                break
+
+            key = popped[0][0]
+            total -= await self._remove(client, key)
+            await get_storage().delete_async(self._object_name(key))
+
+    async def _remove(self, client, key: str) -> int:
+        """删除索引条目，返回释放的字节数"""
+        size = int(await client.hget(self._sizes_key, key) or 0)
+
+        pipe = client.pipeline()
+        pipe.zrem(self._lru_key, key)
+        pipe.hdel(self._sizes_key, key)
+        pipe.decrby(self._total_key, size)
+        await pipe.execute()
+
+        return size
+
+    async def stats(self) -> dict[str, Any]:
+        """获取缓存统计（命中/未命中次数、条目数、占用大小）"""
+        from src.db.redis import init_redis
+
+        client = await init_redis()
+        hits = int(await client.get(self._hits_key) or 0)
+        misses = int(await client.get(self._misses_key) or 0)
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": await client.zcard(self._lru_key),
+            "total_bytes": int(await client.get(self._total_key) or 0),
+            "max_bytes": self.max_bytes,
+        }
@@ -5,7 +5,7 @@ from abc import abstractmethod
 from dataclasses import dataclass, field
 from typing import Any, Optional
 
-from src.services.base import BaseService, ServiceConfig, ServiceResult, ServiceType
+from src.services.base import BaseService, ServiceConfig, ServiceResult, ServiceType, StreamTarget
 
 
 @dataclass
@@ -30,14 +30,18 @@ class LipsyncRequest:
     # 其他设置
     settings: dict[str, Any] = field(default_factory=dict)
 
+    # 设置后结果直接流式写入对象存储
+    output: Optional[StreamTarget] = None
+
 
 @dataclass
 class LipsyncResult:
     """口型同步结果"""
-    video_data: bytes  # 视频字节数据
+    video_data: bytes  # 视频字节数据（流式写入存储时为空）
     duration: float
     fps: int
     metadata: dict[str, Any] = field(default_factory=dict)
+    object_path: Optional[str] = None  # 流式写入存储后的路径
 
 
 class BaseLipsyncService(BaseService):
@@ -8,7 +8,7 @@ from typing import Any
 
 import httpx
 
-from src.services.base import ServiceConfig, ServiceResult
+from src.services.base import STREAM_CHUNK_SIZE, ServiceConfig, ServiceResult, StreamTarget
 from .base import BaseLipsyncService, LipsyncRequest, LipsyncResult
 
 
@@ -26,13 +26,13 @@ class SadTalkerService(BaseLipsyncService):
     async def health_check(self) -> bool:
         """检查服务是否可用"""
         try:
-            async with httpx.AsyncClient() as client:
-                # Gradio 应用健康检查
-                response = await client.get(
-                    f"{self.base_url}/info",
-                    timeout=10,
-                )
-                return response.status_code == 200
+            client = self.http_client()
+            # Gradio 应用健康检查
+            response = await client.get(
+                f"{self.base_url}/info",
+                timeout=10,
+            )
+            return response.status_code == 200
         except Exception:
             return False
 
@@ -78,42 +78,49 @@ class SadTalkerService(BaseLipsyncService):
                 ]
             }
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # 调用 Gradio API
-                response = await client.post(
-                    f"{self.base_url}/api/predict",
-                    json=payload,
-                )
+            client = self.http_client()
+            # 调用 Gradio API
+            response = await client.post(
+                f"{self.base_url}/api/predict",
+                json=payload,
+                timeout=self.timeout,
+            )
 
-                if response.status_code != 200:
-                    # 尝试队列模式
-                    result = await self._call_gradio_queue(client, payload)
-                    if not result:
-                        return ServiceResult.fail(f"API error: {response.text}")
-                    video_url = result
-                else:
-                    data = response.json()
-                    # 获取输出视频
-                    outputs = data.get("data", [])
-                    if not outputs:
-                        return ServiceResult.fail("No output from SadTalker")
-
-                    video_url = outputs[0]  # 第一个输出是视频
-
-                # 下载视频
+            if response.status_code != 200:
+                # 尝试队列模式
+                result = await self._call_gradio_queue(client, payload)
+                if not result:
+                    return ServiceResult.fail(f"API error: {response.text}")
+                video_url = result
+            else:
+                data = response.json()
+                # 获取输出视频
+                outputs = data.get("data", [])
+                if not outputs:
+                    return ServiceResult.fail("No output from SadTalker")
+
+                video_url = outputs[0]  # 第一个输出是视频
+
+            # 下载视频（指定输出目标时直接流式写入存储）
+            video_data = b""
+            object_path = None
+            if request.output:
+                object_path = await self._stream_result(client, video_url, request.output)
+            else:
                 video_data = await self._download_result(client, video_url)
 
-                if not video_data:
-                    return ServiceResult.fail("Failed to download result video")
+            if not video_data and not object_path:
+                return ServiceResult.fail("Failed to download result video")
 
-                result = LipsyncResult(
-                    video_data=video_data,
-                    duration=0,  # 需要从视频中提取
-                    fps=request.fps,
-                    metadata={"source": "sadtalker"},
-                )
+            result = LipsyncResult(
+                video_data=video_data,
+                duration=0,  # 需要从视频中提取
+                fps=request.fps,
+                metadata={"source": "sadtalker"},
+                object_path=object_path,
+            )
 
-                return ServiceResult.ok(result)
+            return ServiceResult.ok(result)
 
         except httpx.TimeoutException:
             return ServiceResult.fail("Request timeout")
@@ -131,6 +138,7 @@ class SadTalkerService(BaseLipsyncService):
             join_response = await client.post(
                 f"{self.base_url}/queue/join",
                 json=payload,
+                timeout=self.timeout,
             )
 
             if join_response.status_code != 200:
@@ -183,10 +191,10 @@ class SadTalkerService(BaseLipsyncService):
 
             # 从 URL 下载
             if file_path.startswith("http"):
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(file_path, timeout=30)
-                    if response.status_code == 200:
-                        return response.content
+                client = self.http_client()
+                response = await client.get(file_path, timeout=30)
+                if response.status_code == 200:
+                    return response.content
 
             return None
         except Exception:
@@ -206,18 +214,40 @@ class SadTalkerService(BaseLipsyncService):
                     return base64.b64decode(parts[1])
                 return None
 
-            # 如果是相对路径，构建完整 URL
-            if url_or_data.startswith("/"):
-                url = f"{self.base_url}{url_or_data}"
-            elif not url_or_data.startswith("http"):
-                url = f"{self.base_url}/file={url_or_data}"
-            else:
-                url = url_or_data
-
-            response = await client.get(url, timeout=60)
+            response = await client.get(self._result_url(url_or_data), timeout=60)
             if response.status_code == 200:
                 return response.content
 
             return None
         except Exception:
             return None
+
+    async def _stream_result(
+        self,
+        client: httpx.AsyncClient,
+        url_or_data: str,
+        target: StreamTarget,
+    ) -> str | None:
+        """流式下载结果并写入存储，返回存储路径"""
+        try:
+            # base64 数据已在内存中，直接写入
+            if url_or_data.startswith("data:"):
+                parts = url_or_data.split(",")
+                if len(parts) > 1:
+                    return await target.write_bytes(base64.b64decode(parts[1]))
+                return None
+
+            async with client.stream("GET", self._result_url(url_or_data), timeout=60) as response:
+                if response.status_code != 200:
+                    return None
+                return await target.write(response.aiter_bytes(STREAM_CHUNK_SIZE))
+        except Exception:
+            return None
+
+    def _result_url(self, url_or_data: str) -> str:
+        """结果路径 -> 完整 URL（相对路径和 Gradio 文件路径拼接服务地址）"""
+        if url_or_data.startswith("/"):
+            return f"{self.base_url}{url_or_data}"
+        if not url_or_data.startswith("http"):
+            return f"{self.base_url}/file={url_or_data}"
+        return url_or_data
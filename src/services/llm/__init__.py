@@ -4,6 +4,8 @@ LLM Service Module
 from .base import BaseLLMService, LLMMessage, LLMResponse
 from .anthropic_service import AnthropicService
 from .openai_service import OpenAIService
+from .cache import CachedLLMService, llm_cache_bypass
+from .json_stream import IncrementalJSONParser
 
 __all__ = [
     "BaseLLMService",
@@ -11,4 +13,7 @@ __all__ = [
     "LLMResponse",
     "AnthropicService",
     "OpenAIService",
+    "CachedLLMService",
+    "llm_cache_bypass",
+    "IncrementalJSONParser",
 ]
@@ -1,6 +1,7 @@
 """
 Anthropic Claude Service Implementation
 """
+import time
 from typing import AsyncIterator
 
 import anthropic
@@ -56,6 +57,7 @@ class AnthropicService(BaseLLMService):
         **kwargs,
     ) -> ServiceResult:
         """生成文本"""
+        started = time.monotonic()
         try:
             # 分离 system 消息
             system_message = None
@@ -76,7 +78,7 @@ class AnthropicService(BaseLLMService):
             }
 
             if system_message:
-                request_params["system"] = system_message
+                request_params["system"] = self._system_param(system_message, kwargs.get("cache_system", False))
 
             # 调用 API
             response = await self.client.messages.create(**request_params)
@@ -85,14 +87,12 @@ class AnthropicService(BaseLLMService):
             llm_response = LLMResponse(
                 content=response.content[0].text,
                 model=response.model,
-                usage={
-                    "input_tokens": response.usage.input_tokens,
-                    "output_tokens": response.usage.output_tokens,
-                },
+                usage=self._usage(response.usage),
                 finish_reason=response.stop_reason,
                 raw_response=response,
             )
 
+            self._record_usage(llm_response, started)
             return ServiceResult.ok(llm_response)
 
         except anthropic.APIConnectionError as e:
@@ -111,7 +111,8 @@ class AnthropicService(BaseLLMService):
         max_tokens: int = 4096,
         **kwargs,
     ) -> AsyncIterator[str]:
-        """流式生成文本"""
+        """流式生成文本（结束时按最终消息的 usage 计量）"""
+        started = time.monotonic()
         # 分离 system 消息
         system_message = None
         chat_messages = []
@@ -131,9 +132,47 @@ class AnthropicService(BaseLLMService):
         }
 
         if system_message:
-            request_params["system"] = system_message
+            request_params["system"] = self._system_param(system_message, kwargs.get("cache_system", False))
 
         # 流式调用
         async with self.client.messages.stream(**request_params) as stream:
             async for text in stream.text_stream:
                 yield text
+
+            final = await stream.get_final_message()
+            self._record_usage(
+                LLMResponse(
+                    content="",
+                    model=final.model,
+                    usage=self._usage(final.usage),
+                    finish_reason=final.stop_reason,
+                ),
+                started,
+                kwargs.get("on_usage"),
+            )
+
+    def _system_param(self, system_message: str, cache_system: bool):
+        """system 参数，启用提示词缓存时标记 cache_control"""
+        if not (cache_system and self.prompt_cache):
+            return system_message
+        return [{
+            "type": "text",
+            "text": system_message,
+            "cache_control": {"type": "ephemeral"},
+        }]
+
+    @staticmethod
+    def _usage(usage) -> dict[str, int]:
+        """
+        统一 usage 格式
+
+        Anthropic 的 input_tokens 不含缓存读写部分，这里合并为全部输入 token。
+        """
+        cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_creation = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        return {
+            "input_tokens": usage.input_tokens + cache_read + cache_creation,
+            "output_tokens": usage.output_tokens,
+            "cache_read_input_tokens": cache_read,
+            "cache_creation_input_tokens": cache_creation,
+        }
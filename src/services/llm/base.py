@@ -1,12 +1,14 @@
 """
 Base LLM Service Interface
 """
+import time
 from abc import abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from src.services.base import BaseService, ServiceConfig, ServiceResult, ServiceType
+from src.services.metering import current_meter
 
 
 class MessageRole(str, Enum):
@@ -59,12 +61,41 @@ class LLMResponse:
     def total_tokens(self) -> int:
         return self.input_tokens + self.output_tokens
 
+    @property
+    def cache_read_input_tokens(self) -> int:
+        """输入中命中提供商提示词缓存的 token 数（已计入 input_tokens）"""
+        return self.usage.get("cache_read_input_tokens", 0)
+
 
 class BaseLLMService(BaseService):
     """LLM 服务基类"""
 
     service_type = ServiceType.LLM
 
+    def __init__(self, config: ServiceConfig):
+        super().__init__(config)
+        # 调用方传入 cache_system=True 时，是否使用提供商的提示词缓存缓存 system 消息
+        self.prompt_cache = config.settings.get("prompt_cache", True)
+        self.prompt_cache_ttl = int(config.settings.get("prompt_cache_ttl", 3600))
+
+    def _record_usage(
+        self,
+        response: "LLMResponse",
+        started: float,
+        on_usage: Optional[Callable[["LLMResponse"], None]] = None,
+    ) -> None:
+        """
+        将一次调用的 token 用量和延迟记入当前任务的计量器
+
+        Args:
+            on_usage: 流式调用结束时回调（流式接口只产出文本，调用方借此取得用量）
+        """
+        meter = current_meter()
+        if meter:
+            meter.record_llm(self.provider, response.model, response.usage, time.monotonic() - started)
+        if on_usage:
+            on_usage(response)
+
     @abstractmethod
     async def generate(
         self,
@@ -83,9 +114,11 @@ class BaseLLMService(BaseService):
             max_tokens: 最大 token 数
             json_mode: 是否返回 JSON 格式
             **kwargs: 其他参数
+                - cache_system: 使用提供商的提示词缓存缓存 system 消息（静态长提示词）
 
         Returns:
             ServiceResult with LLMResponse
+            （usage 中 input_tokens 为全部输入 token，cache_read_input_tokens 为其中命中缓存的部分）
         """
         pass
 
@@ -104,7 +137,7 @@ class BaseLLMService(BaseService):
             messages: 消息列表
             temperature: 温度参数
             max_tokens: 最大 token 数
-            **kwargs: 其他参数
+            **kwargs: 其他参数；on_usage 在流结束时以 LLMResponse（content 为空）回调用量
 
         Yields:
             文本片段
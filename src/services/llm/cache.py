@@ -0,0 +1,227 @@
+"""
+LLM Response Cache
+
+以 (模型, 消息, 温度, max_tokens, json_mode) 的规范化哈希为键缓存 LLM 响应，
+重新运行时相同的请求（如相同的角色描述和风格）不再重复调用。
+响应存放在 Redis（RedisCache），带 TTL，并按写入顺序限制条目数。
+"""
+import contextvars
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from src.services.base import ServiceResult
+from .base import LLMMessage, LLMResponse
+
+# 为 True 时当前上下文（及其创建的任务）内的请求跳过缓存读取，结果仍会写入
+_bypass: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def llm_cache_bypass(enabled: bool = True) -> Iterator[None]:
+    """在该上下文内强制重新调用 LLM（用户要求重新生成时使用）"""
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+class CachedLLMService:
+    """
+    LLM 服务缓存包装器
+
+    包装 BaseLLMService 或 LLMServiceWithFallback，缓存 generate / generate_json
+    的成功响应；其余属性透传给被包装的服务。
+    调用时传入 use_cache=False 可跳过单次请求的缓存。
+    """
+
+    KEY_PREFIX = "mangaforge:llm_cache"
+
+    def __init__(self, service: Any, ttl: int, max_entries: int):
+        self.service = service
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._index_key = f"{self.KEY_PREFIX}:index"  # zset: key -> 写入时间
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.service, name)
+
+    def _model(self) -> Optional[str]:
+        """被包装服务的模型名（回退包装器取第一个服务）"""
+        service = self.service
+        if hasattr(service, "services"):
+            service = service.services[0]
+        config = getattr(service, "config", None)
+        return f"{config.provider}:{config.model}" if config else None
+
+    def make_key(
+        self,
+        messages: list[LLMMessage],
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool,
+        **kwargs: Any,
+    ) -> str:
+        """计算请求的规范化哈希"""
+        canonical = json.dumps(
+            {
+                "model": self._model(),
+                "messages": [message.to_dict() for message in messages],
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "json_mode": json_mode,
+                "kwargs": kwargs,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    async def generate(
+        self,
+        messages: list[LLMMessage],
+        temperature: float = 0.7,
+        max_tokens: int = 4096,
+        json_mode: bool = False,
+        use_cache: bool = True,
+        **kwargs: Any,
+    ) -> ServiceResult:
+        """生成文本，命中缓存时直接返回缓存的响应"""
+        key, result = await self._lookup_or_generate(
+            messages, temperature, max_tokens, json_mode, use_cache, kwargs
+        )
+        if use_cache and not result.metadata.get("cache_hit") and self._cacheable(result):
+            await self._put(key, result.data)
+        return result
+
+    async def generate_json(
+        self,
+        messages: list[LLMMessage],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        use_cache: bool = True,
+        **kwargs: Any,
+    ) -> ServiceResult:
+        """生成 JSON 格式输出，解析成功后才写入缓存"""
+        key, result = await self._lookup_or_generate(
+            messages, temperature, max_tokens, True, use_cache, kwargs
+        )
+        if not result.success:
+            return result
+
+        response: LLMResponse = result.data
+        try:
+            parsed = json.loads(response.content)
+        except json.JSONDecodeError as e:
+            if result.metadata.get("cache_hit"):
+                # 缓存中的不可解析响应：删除，下次重新调用
+                await self._delete(key)
+            return ServiceResult.fail(f"JSON parse error: {e}")
+
+        if use_cache and not result.metadata.get("cache_hit") and self._cacheable(result):
+            await self._put(key, response)
+        return ServiceResult.ok(parsed, {"raw_response": response, **result.metadata})
+
+    async def _lookup_or_generate(
+        self,
+        messages: list[LLMMessage],
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool,
+        use_cache: bool,
+        kwargs: dict[str, Any],
+    ) -> tuple[str, ServiceResult]:
+        """查缓存，未命中时调用被包装的服务（不写入缓存，由调用方校验后写入）"""
+        key = self.make_key(messages, temperature, max_tokens, json_mode, **kwargs)
+
+        if use_cache and not _bypass.get():
+            cached = await self._get(key)
+            if cached is not None:
+                return key, ServiceResult.ok(cached, {"cache_hit": True})
+
+        result = await self.service.generate(
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            json_mode=json_mode,
+            **kwargs,
+        )
+        return key, result
+
+    @staticmethod
+    def _cacheable(result: ServiceResult) -> bool:
+        """只缓存完整的成功响应；因 max_tokens 截断的响应重试时应重新生成"""
+        if not result.success:
+            return False
+        # OpenAI: length；Anthropic: max_tokens；Gemini: FinishReason.MAX_TOKENS
+        reason = str(result.data.finish_reason or "").lower()
+        return reason != "length" and "max_tokens" not in reason
+
+    async def generate_stream(self, *args: Any, **kwargs: Any):
+        """流式生成不经过缓存"""
+        async for chunk in self.service.generate_stream(*args, **kwargs):
+            yield chunk
+
+    async def _get(self, key: str) -> Optional[LLMResponse]:
+        from src.db.redis import RedisCache, init_redis
+
+        try:
+            cache = RedisCache(await init_redis(), prefix=self.KEY_PREFIX)
+            value = await cache.get(key)
+            if value is None:
+                return None
+
+            data = json.loads(value)
+            return LLMResponse(
+                content=data["content"],
+                model=data.get("model", ""),
+                usage=data.get("usage", {}),
+                finish_reason=data.get("finish_reason"),
+            )
+        except Exception:
+            return None
+
+    async def _delete(self, key: str) -> None:
+        from src.db.redis import RedisCache, init_redis
+
+        try:
+            client = await init_redis()
+            await RedisCache(client, prefix=self.KEY_PREFIX).delete(key)
+            await client.zrem(self._index_key, key)
+        except Exception:
+            pass
+
+    async def _put(self, key: str, response: LLMResponse) -> None:
+        """写入缓存，超出条目上限时删除最早写入的条目"""
+        from src.db.redis import RedisCache, init_redis
+
+        try:
+            client = await init_redis()
+            cache = RedisCache(client, prefix=self.KEY_PREFIX)
+            await cache.set(
+                key,
+                json.dumps({
+                    "content": response.content,
+                    "model": response.model,
+                    "usage": response.usage,
+                    "finish_reason": response.finish_reason,
+                }, ensure_ascii=False),
+                expire=self.ttl,
+            )
+
+            await client.zadd(self._index_key, {key: time.time()})
+            # 清理已过期的索引项，再按条目上限淘汰
+            await client.zremrangebyscore(self._index_key, 0, time.time() - self.ttl)
+            overflow = await client.zcard(self._index_key) - self.max_entries
+            if overflow > 0:
+                for evicted, _ in await client.zpopmin(self._index_key, overflow):
+                    await cache.delete(evicted)
+
+        except Exception:
+            # 缓存写入失败不影响生成结果
+            pass
@@ -3,7 +3,9 @@ Google Gemini Service Implementation
 
 使用新的 google-genai SDK (替代已弃用的 google-generativeai)
 """
-from typing import AsyncIterator
+import hashlib
+import time
+from typing import Any, AsyncIterator, Optional
 
 from src.services.base import ServiceConfig, ServiceResult
 from .base import BaseLLMService, LLMMessage, LLMResponse
@@ -31,6 +33,10 @@ class GeminiService(BaseLLMService):
         # 默认使用稳定版 gemini-2.0-flash
         self.model_name = config.model or "gemini-2.0-flash"
         self._last_error: str | None = None
+        # system 消息哈希 -> (cached content 名称, 过期时间)
+        self._content_caches: dict[str, tuple[str, float]] = {}
+        # 无法缓存的 system 消息（如低于最小缓存 token 数），不再重复尝试
+        self._uncacheable: set[str] = set()
 
     async def health_check(self) -> bool:
         """检查服务是否可用"""
@@ -111,32 +117,10 @@ class GeminiService(BaseLLMService):
         **kwargs,
     ) -> ServiceResult:
         """生成文本"""
+        started = time.monotonic()
         try:
-            from google.genai import types
-
-            # 提取 system instruction 和构建内容
-            system_instruction = None
-            contents = []
-
-            for msg in messages:
-                if msg.role.value == "system":
-                    system_instruction = msg.content
-                elif msg.role.value == "user":
-                    contents.append(types.Content(
-                        role="user",
-                        parts=[types.Part(text=msg.content)]
-                    ))
-                elif msg.role.value == "assistant":
-                    contents.append(types.Content(
-                        role="model",
-                        parts=[types.Part(text=msg.content)]
-                    ))
-
-            # 配置生成参数
-            config = types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                temperature=temperature,
-                max_output_tokens=max_tokens,
+            contents, config = await self._build_request(
+                messages, temperature, max_tokens, kwargs.get("cache_system", False)
             )
 
             if json_mode:
@@ -145,17 +129,12 @@ class GeminiService(BaseLLMService):
             # 调用 API
             response = await self.client.aio.models.generate_content(
                 model=self.model_name,
-                contents=contents if len(contents) > 1 else contents[0].parts[0].text if contents else "",
+                contents=contents,
                 config=config,
             )
 
             # 构建响应
-            usage = {}
-            if hasattr(response, 'usage_metadata') and response.usage_metadata:
-                usage = {
-                    "input_tokens": getattr(response.usage_metadata, 'prompt_token_count', 0),
-                    "output_tokens": getattr(response.usage_metadata, 'candidates_token_count', 0),
-                }
+            usage = self._usage(response)
 
             finish_reason = None
             if response.candidates:
@@ -171,6 +150,7 @@ class GeminiService(BaseLLMService):
                 raw_response=response,
             )
 
+            self._record_usage(llm_response, started)
             return ServiceResult.ok(llm_response)
 
         except Exception as e:
@@ -189,7 +169,54 @@ class GeminiService(BaseLLMService):
         max_tokens: int = 4096,
         **kwargs,
     ) -> AsyncIterator[str]:
-        """流式生成文本"""
+        """流式生成文本（最后一个 chunk 的 usage_metadata 为整次调用的用量，结束时计量）"""
+        started = time.monotonic()
+        contents, config = await self._build_request(
+            messages, temperature, max_tokens, kwargs.get("cache_system", False)
+        )
+
+        # 调用流式 API
+        usage = {}
+        async for chunk in await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=contents,
+            config=config,
+        ):
+            usage = self._usage(chunk) or usage
+            if chunk.text:
+                yield chunk.text
+
+        self._record_usage(
+            LLMResponse(content="", model=self.model_name, usage=usage),
+            started,
+            kwargs.get("on_usage"),
+        )
+
+    @staticmethod
+    def _usage(response: Any) -> dict[str, int]:
+        """从响应（或流式 chunk）的 usage_metadata 提取统一格式的 usage"""
+        metadata = getattr(response, "usage_metadata", None)
+        if not metadata:
+            return {}
+        return {
+            "input_tokens": getattr(metadata, "prompt_token_count", 0) or 0,
+            "output_tokens": getattr(metadata, "candidates_token_count", 0) or 0,
+            "cache_read_input_tokens": getattr(metadata, "cached_content_token_count", 0) or 0,
+        }
+
+    async def _build_request(
+        self,
+        messages: list[LLMMessage],
+        temperature: float,
+        max_tokens: int,
+        cache_system: bool,
+    ) -> tuple[Any, Any]:
+        """
+        构建请求内容和生成配置
+
+        cache_system 时 system instruction 放入显式缓存（cached content），
+        创建缓存失败时按普通请求发送。
+        """
         from google.genai import types
 
         # 提取 system instruction 和构建内容
@@ -217,11 +244,49 @@ class GeminiService(BaseLLMService):
             max_output_tokens=max_tokens,
         )
 
-        # 调用流式 API
-        async for chunk in await self.client.aio.models.generate_content_stream(
-            model=self.model_name,
-            contents=contents if len(contents) > 1 else contents[0].parts[0].text if contents else "",
-            config=config,
-        ):
-            if chunk.text:
-                yield chunk.text
+        if system_instruction and cache_system and self.prompt_cache:
+            cached_content = await self._cached_content(system_instruction)
+            if cached_content:
+                config.system_instruction = None
+                config.cached_content = cached_content
+
+        return contents if len(contents) > 1 else contents[0].parts[0].text if contents else "", config
+
+    async def _cached_content(self, system_instruction: str) -> Optional[str]:
+        """获取（必要时创建）缓存了 system instruction 的 cached content 名称"""
+        from google.genai import types
+
+        key = hashlib.sha256(f"{self.model_name}:{system_instruction}".encode("utf-8")).hexdigest()
+        if key in self._uncacheable:
+            return None
+
+        now = time.time()
+        entry = self._content_caches.get(key)
+        # 临近过期的缓存不再使用，避免请求途中失效
+        if entry and entry[1] - now > 60:
+            return entry[0]
+
+        try:
+            cache = await self.client.aio.caches.create(
+                model=self.model_name,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_instruction,
+                    ttl=f"{self.prompt_cache_ttl}s",
+                ),
+            )
+        except Exception as e:
+            # 内容低于最小缓存 token 数等参数错误时不再尝试；超时、429、5xx 只跳过本次
+            if self._invalid_cache_request(e):
+                self._uncacheable.add(key)
+            return None
+
+        self._content_caches[key] = (cache.name, now + self.prompt_cache_ttl)
+        return cache.name
+
+    @staticmethod
+    def _invalid_cache_request(error: Exception) -> bool:
+        """caches.create 的错误是否由内容本身导致（重试也不会成功）"""
+        message = str(error).lower()
+        if "min_total_token_count" in message or "too small" in message:
+            return True
+        return getattr(error, "code", None) == 400 or "invalid_argument" in message
@@ -0,0 +1,118 @@
+"""
+Incremental JSON Parser
+
+逐段喂入 LLM 流式输出，顶层对象中指定数组（如 characters / scenes）的
+每个元素一旦闭合即解析并返回，无需等待完整响应。
+"""
+import json
+from typing import Any, Optional
+
+
+class IncrementalJSONParser:
+    """
+    流式 JSON 解析器
+
+    只跟踪括号深度和字符串状态，不做完整的语法校验；
+    响应前后的说明文字或 Markdown 代码块标记会被忽略。
+    """
+
+    def __init__(self, array_keys: tuple[str, ...]):
+        """
+        Args:
+            array_keys: 需要逐元素输出的顶层数组键名
+        """
+        self.array_keys = set(array_keys)
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        # 容器栈: (括号, 该容器在父对象中的键)
+        self._stack: list[tuple[str, Optional[str]]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._element_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+
+    def feed(self, text: str) -> list[tuple[str, Any]]:
+        """
+        喂入一段文本
+
+        Returns:
+            本次新闭合的元素列表: (数组键名, 元素值)
+        """
+        self._buffer += text
+        events: list[tuple[str, Any]] = []
+
+        while self._pos < len(self._buffer) and self._root_end is None:
+            i = self._pos
+            ch = self._buffer[i]
+            self._pos += 1
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._stack.append(("{", None))
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = self._decode(self._string_start, i + 1)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                self._pending_key = self._last_string
+            elif ch in "{[":
+                parent = self._stack[-1]
+                key = self._pending_key if parent[0] == "{" else None
+                self._pending_key = None
+                self._stack.append((ch, key))
+                if self._at_element():
+                    self._element_start = i
+            elif ch in "}]":
+                if self._at_element() and self._element_start is not None:
+                    value = self._decode(self._element_start, i + 1)
+                    self._element_start = None
+                    if value is not None:
+                        events.append((self._stack[1][1], value))
+                self._stack.pop()
+                if not self._stack:
+                    self._root_end = i + 1
+            elif ch == ",":
+                self._pending_key = None
+
+        return events
+
+    def result(self) -> Optional[Any]:
+        """解析完整的顶层对象，未闭合或解析失败返回 None"""
+        if self._root_end is None:
+            return None
+        start = self._buffer.index("{")
+        return self._decode(start, self._root_end)
+
+    @property
+    def text(self) -> str:
+        """已接收的完整文本"""
+        return self._buffer
+
+    def _at_element(self) -> bool:
+        """栈顶容器是否为被跟踪数组的元素（根对象 -> 数组 -> 元素）"""
+        if len(self._stack) != 3:
+            return False
+        bracket, key = self._stack[1]
+        return bracket == "[" and key in self.array_keys
+
+    def _decode(self, start: int, end: int) -> Optional[Any]:
+        try:
+            return json.loads(self._buffer[start:end])
+        except json.JSONDecodeError:
+            return None
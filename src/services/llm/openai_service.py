@@ -1,6 +1,7 @@
 """
 OpenAI Service Implementation
 """
+import time
 from typing import AsyncIterator
 
 import openai
@@ -53,8 +54,9 @@ class OpenAIService(BaseLLMService):
         **kwargs,
     ) -> ServiceResult:
         """生成文本"""
+        started = time.monotonic()
         try:
-            # 构建消息
+            # 构建消息（OpenAI 自动缓存较长的相同前缀，system 消息在前即可命中，cache_system 无需额外参数）
             chat_messages = [msg.to_dict() for msg in messages]
 
             # 构建请求参数
@@ -77,14 +79,12 @@ class OpenAIService(BaseLLMService):
             llm_response = LLMResponse(
                 content=choice.message.content or "",
                 model=response.model,
-                usage={
-                    "input_tokens": response.usage.prompt_tokens if response.usage else 0,
-                    "output_tokens": response.usage.completion_tokens if response.usage else 0,
-                },
+                usage=self._usage(response.usage),
                 finish_reason=choice.finish_reason,
                 raw_response=response,
             )
 
+            self._record_usage(llm_response, started)
             return ServiceResult.ok(llm_response)
 
         except openai.APIConnectionError as e:
@@ -103,7 +103,8 @@ class OpenAIService(BaseLLMService):
         max_tokens: int = 4096,
         **kwargs,
     ) -> AsyncIterator[str]:
-        """流式生成文本"""
+        """流式生成文本（usage 在最后一个 chunk 返回，结束时计量）"""
+        started = time.monotonic()
         chat_messages = [msg.to_dict() for msg in messages]
 
         stream = await self.client.chat.completions.create(
@@ -112,8 +113,32 @@ class OpenAIService(BaseLLMService):
             temperature=temperature,
             max_tokens=max_tokens,
             stream=True,
+            stream_options={"include_usage": True},
         )
 
+        model = self.model
+        usage = None
         async for chunk in stream:
+            model = chunk.model or model
+            if chunk.usage:
+                usage = chunk.usage
             if chunk.choices and chunk.choices[0].delta.content:
                 yield chunk.choices[0].delta.content
+
+        self._record_usage(
+            LLMResponse(content="", model=model, usage=self._usage(usage)),
+            started,
+            kwargs.get("on_usage"),
+        )
+
+    @staticmethod
+    def _usage(usage) -> dict[str, int]:
+        """统一 usage 格式（prompt_tokens 已包含缓存命中的 token）"""
+        if not usage:
+            return {"input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0}
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "input_tokens": usage.prompt_tokens,
+            "output_tokens": usage.completion_tokens,
+            "cache_read_input_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+        }
@@ -0,0 +1,112 @@
+"""
+Usage Metering - 生成任务用量计量
+
+记录一次生成任务中每个后端调用的用量：LLM 的输入/输出 token、延迟和模型，
+ComfyUI prompt 的 GPU 秒数，可灵的视频片段秒数；按阶段和模型汇总。
+计量器通过 contextvar 传递，服务内部调用 current_meter() 记录，没有计量器时不记录。
+"""
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+_meter: contextvars.ContextVar[Optional["UsageMeter"]] = contextvars.ContextVar(
+    "usage_meter", default=None
+)
+_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("usage_stage", default=None)
+
+
+@dataclass
+class UsageMeter:
+    """单个生成任务的用量计量器"""
+
+    # 类别 -> 汇总；类别为 llm / image / video
+    totals: dict[str, dict[str, float]] = field(default_factory=dict)
+    # 阶段 -> 类别 -> 汇总
+    by_stage: dict[str, dict[str, dict[str, float]]] = field(default_factory=dict)
+    # 模型/提供商 -> 汇总
+    by_model: dict[str, dict[str, float]] = field(default_factory=dict)
+
+    def record_llm(
+        self,
+        provider: str,
+        model: str,
+        usage: dict[str, int],
+        latency: float,
+    ) -> None:
+        """记录一次 LLM 调用"""
+        self._add("llm", f"{provider}:{model}", {
+            "calls": 1,
+            "input_tokens": usage.get("input_tokens", 0) or 0,
+            "output_tokens": usage.get("output_tokens", 0) or 0,
+            "cache_read_input_tokens": usage.get("cache_read_input_tokens", 0) or 0,
+            "latency_seconds": latency,
+        })
+
+    def record_gpu(self, provider: str, gpu_seconds: float, latency: float, images: int) -> None:
+        """记录一次图像生成 prompt（GPU 执行秒数和含排队的总延迟）"""
+        self._add("image", provider, {
+            "prompts": 1,
+            "images": images,
+            "gpu_seconds": gpu_seconds,
+            "latency_seconds": latency,
+        })
+
+    def record_clip(self, provider: str, clip_seconds: float, latency: float) -> None:
+        """记录一个生成的视频片段"""
+        self._add("video", provider, {
+            "clips": 1,
+            "clip_seconds": clip_seconds,
+            "latency_seconds": latency,
+        })
+
+    def summary(self) -> dict[str, Any]:
+        """用量汇总（可直接序列化为 JSON）"""
+        return {
+            "totals": self._rounded(self.totals),
+            "by_stage": {stage: self._rounded(kinds) for stage, kinds in self.by_stage.items()},
+            "by_model": self._rounded(self.by_model),
+        }
+
+    def _add(self, kind: str, model: str, values: dict[str, float]) -> None:
+        stage = _stage.get() or "unknown"
+        targets = (
+            self.totals.setdefault(kind, {}),
+            self.by_stage.setdefault(stage, {}).setdefault(kind, {}),
+            self.by_model.setdefault(model, {}),
+        )
+        for target in targets:
+            for key, value in values.items():
+                target[key] = target.get(key, 0) + value
+
+    @staticmethod
+    def _rounded(groups: dict[str, dict[str, float]]) -> dict[str, dict[str, float]]:
+        return {
+            name: {key: round(value, 3) for key, value in values.items()}
+            for name, values in groups.items()
+        }
+
+
+def current_meter() -> Optional[UsageMeter]:
+    """获取当前上下文的计量器"""
+    return _meter.get()
+
+
+@contextmanager
+def metering(meter: UsageMeter) -> Iterator[UsageMeter]:
+    """在该上下文（及其创建的任务）内记录用量"""
+    token = _meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _meter.reset(token)
+
+
+@contextmanager
+def metering_stage(stage: str) -> Iterator[None]:
+    """将该上下文内的用量归入指定阶段"""
+    token = _stage.set(stage)
+    try:
+        yield
+    finally:
+        _stage.reset(token)
@@ -6,7 +6,7 @@ from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, Optional
 
-from src.services.base import BaseService, ServiceConfig, ServiceResult, ServiceType
+from src.services.base import BaseService, ServiceConfig, ServiceResult, ServiceType, StreamTarget
 
 
 class CameraMovement(str, Enum):
@@ -43,16 +43,20 @@ class VideoGenerationRequest:
     seed: int = -1
     settings: dict[str, Any] = field(default_factory=dict)
 
+    # 设置后结果直接流式写入对象存储
+    output: Optional[StreamTarget] = None
+
 
 @dataclass
 class VideoGenerationResult:
     """视频生成结果"""
-    video_data: bytes  # 视频字节数据
+    video_data: bytes  # 视频字节数据（流式写入存储时为空）
     duration: float
     fps: int
     width: int
     height: int
     metadata: dict[str, Any] = field(default_factory=dict)
+    object_path: Optional[str] = None  # 流式写入存储后的路径
 
 
 class BaseVideoService(BaseService):
@@ -3,15 +3,89 @@ Kling (可灵) Video Generation Service Implementation
 """
 import asyncio
 import base64
+import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
 import httpx
 
-from src.services.base import ServiceConfig, ServiceResult
+from src.services.base import STREAM_CHUNK_SIZE, ServiceConfig, ServiceResult, StreamTarget
+from src.observability.tracing import span
+from src.services.metering import current_meter
 from .base import BaseVideoService, VideoGenerationRequest, VideoGenerationResult
 
 
+class _KlingTaskPoller:
+    """
+    共享任务轮询器
+
+    同一账号（服务实例）下所有未完成的 task_id 由一个后台协程统一轮询：
+    每轮先用任务列表接口批量获取状态，列表中缺失的任务再单独查询。
+    任务完成即 resolve 对应 future，调用方随即开始下载。
+    """
+
+    def __init__(self, service: "KlingService"):
+        self.service = service
+        self._pending: dict[str, tuple[asyncio.Future, float]] = {}
+        self._runner: Optional[asyncio.Task] = None
+
+    def watch(self, task_id: str, max_wait: float) -> asyncio.Future:
+        """登记任务，返回完成时 resolve 为视频 URL（失败/超时为 None）的 future"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending[task_id] = (future, time.monotonic() + max_wait)
+
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run(), name="kling-poller")
+
+        return future
+
+    async def _run(self) -> None:
+        """轮询直到没有未完成的任务"""
+        client = self.service.http_client()
+        while self._pending:
+            await asyncio.sleep(self.service.poll_interval)
+            try:
+                await self._poll_once(client)
+            except Exception:
+                # 单轮失败不影响后续轮询
+                pass
+            self._expire()
+
+    async def _poll_once(self, client: httpx.AsyncClient) -> None:
+        """批量检查所有未完成任务的状态"""
+        statuses = await self.service._list_task_statuses(client)
+
+        missing = [task_id for task_id in self._pending if task_id not in statuses]
+        if missing:
+            results = await asyncio.gather(
+                *(self.service._fetch_task_status(client, task_id) for task_id in missing),
+                return_exceptions=True,
+            )
+            for task_id, status in zip(missing, results):
+                if isinstance(status, tuple):
+                    statuses[task_id] = status
+
+        for task_id, (status, video_url) in statuses.items():
+            if task_id not in self._pending:
+                continue
+            if status == "completed":
+                self._resolve(task_id, video_url)
+            elif status == "failed":
+                self._resolve(task_id, None)
+
+    def _expire(self) -> None:
+        """超时的任务按失败处理"""
+        now = time.monotonic()
+        for task_id, (_, deadline) in list(self._pending.items()):
+            if now >= deadline:
+                self._resolve(task_id, None)
+
+    def _resolve(self, task_id: str, video_url: Optional[str]) -> None:
+        future, _ = self._pending.pop(task_id)
+        if not future.done():
+            future.set_result(video_url)
+
+
 class KlingService(BaseVideoService):
     """可灵 Kling 视频生成服务实现"""
 
@@ -26,6 +100,23 @@ class KlingService(BaseVideoService):
         self.api_key = config.api_key
         self.timeout = config.settings.get("timeout", 600)
         self.poll_interval = config.settings.get("poll_interval", 5)
+        # 同一账号两次提交之间的最小间隔（秒）
+        self.submit_interval = config.settings.get("submit_interval", 1.0)
+
+        # 按事件循环惰性创建（服务实例会跨 Celery 任务的事件循环复用）
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._poller: Optional[_KlingTaskPoller] = None
+        self._submit_lock: Optional[asyncio.Lock] = None
+        self._last_submit_at = 0.0
+
+    def _bind_loop(self) -> None:
+        """为当前事件循环准备轮询器和提交锁"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._poller = _KlingTaskPoller(self)
+            self._submit_lock = asyncio.Lock()
+            self._last_submit_at = 0.0
 
     def _get_headers(self) -> dict[str, str]:
         """获取请求头"""
@@ -37,13 +128,13 @@ class KlingService(BaseVideoService):
     async def health_check(self) -> bool:
         """检查服务是否可用"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.API_BASE}/{self.API_VERSION}/account/info",
-                    headers=self._get_headers(),
-                    timeout=10,
-                )
-                return response.status_code == 200
+            client = self.http_client()
+            response = await client.get(
+                f"{self.API_BASE}/{self.API_VERSION}/account/info",
+                headers=self._get_headers(),
+                timeout=10,
+            )
+            return response.status_code == 200
         except Exception:
             return False
 
@@ -60,79 +151,125 @@ class KlingService(BaseVideoService):
         self,
         request: VideoGenerationRequest,
     ) -> ServiceResult:
-        """生成视频"""
-        try:
-            # 读取并编码图像
-            image_base64 = await self._load_image(request.image_path)
-            if not image_base64:
-                return ServiceResult.fail("Failed to load image")
-
-            # 构建请求参数
-            payload = {
-                "model": "kling-v2.1",
-                "image": image_base64,
-                "prompt": request.prompt,
-                "negative_prompt": request.negative_prompt,
-                "duration": min(request.duration, 10),  # 可灵最长 10 秒
-                "mode": "std",  # std / pro
-                "camera_control": self._get_camera_control(request),
-            }
-
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # 提交任务
-                response = await client.post(
-                    f"{self.API_BASE}/{self.API_VERSION}/videos/image2video",
-                    headers=self._get_headers(),
-                    json=payload,
-                )
+        """
+        生成视频
 
-                if response.status_code != 200:
-                    return ServiceResult.fail(f"API error: {response.text}")
+        提交任务后交由共享轮询器等待完成，完成后立即下载。
+        多个镜头并发调用时，所有任务先行提交，由同一个轮询器批量检查状态。
+        """
+        started = time.monotonic()
+        try:
+            with span("kling.submit"):
+                submit_result = await self.submit(request)
+            if not submit_result.success:
+                return submit_result
+
+            task_id = submit_result.data
+
+            # 等待共享轮询器报告完成（可灵侧排队 + 生成）
+            with span("kling.wait", task_id=task_id):
+                video_url = await self._poller.watch(task_id, self.timeout)
+
+            if not video_url:
+                return ServiceResult.fail("Video generation failed or timeout")
+
+            # 下载视频（指定输出目标时直接流式写入存储）
+            video_data = b""
+            object_path = None
+            client = self.http_client()
+            with span("kling.download", streamed=request.output is not None):
+                if request.output:
+                    object_path = await self._stream_video(client, video_url, request.output)
+                else:
+                    video_data = await self._download_video(client, video_url)
+
+            if not video_data and not object_path:
+                return ServiceResult.fail("Failed to download video")
+
+            result = VideoGenerationResult(
+                video_data=video_data,
+                duration=request.duration,
+                fps=request.fps,
+                width=request.width,
+                height=request.height,
+                metadata={"task_id": task_id, "url": video_url},
+                object_path=object_path,
+            )
 
-                result = response.json()
-                task_id = result.get("data", {}).get("task_id")
+            # 按生成的片段时长计费（可灵最长 10 秒）
+            meter = current_meter()
+            if meter:
+                meter.record_clip(self.provider, min(request.duration, 10), time.monotonic() - started)
 
-                if not task_id:
-                    return ServiceResult.fail("No task ID returned")
+            return ServiceResult.ok(result)
 
-                # 轮询等待结果
-                video_url = await self._wait_for_completion(client, task_id)
+        except httpx.TimeoutException:
+            return ServiceResult.fail("Request timeout")
+        except Exception as e:
+            return ServiceResult.fail(f"Generation failed: {e}")
 
-                if not video_url:
-                    return ServiceResult.fail("Video generation failed or timeout")
+    async def submit(
+        self,
+        request: VideoGenerationRequest,
+    ) -> ServiceResult:
+        """
+        提交图生视频任务（受账号级提交速率限制）
+
+        Returns:
+            ServiceResult with task_id
+        """
+        self._bind_loop()
+
+        # 读取并编码图像
+        image_base64 = await self._load_image(request.image_path)
+        if not image_base64:
+            return ServiceResult.fail("Failed to load image")
+
+        # 构建请求参数
+        payload = {
+            "model": "kling-v2.1",
+            "image": image_base64,
+            "prompt": request.prompt,
+            "negative_prompt": request.negative_prompt,
+            "duration": min(request.duration, 10),  # 可灵最长 10 秒
+            "mode": "std",  # std / pro
+            "camera_control": self._get_camera_control(request),
+        }
 
-                # 下载视频
-                video_data = await self._download_video(client, video_url)
+        async with self._submit_lock:
+            # 同一账号的提交间隔限制
+            wait = self._last_submit_at + self.submit_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_submit_at = time.monotonic()
 
-                if not video_data:
-                    return ServiceResult.fail("Failed to download video")
+            client = self.http_client()
+            response = await client.post(
+                f"{self.API_BASE}/{self.API_VERSION}/videos/image2video",
+                headers=self._get_headers(),
+                json=payload,
+                timeout=60,
+            )
 
-                result = VideoGenerationResult(
-                    video_data=video_data,
-                    duration=request.duration,
-                    fps=request.fps,
-                    width=request.width,
-                    height=request.height,
-                    metadata={"task_id": task_id, "url": video_url},
-                )
+        if response.status_code != 200:
+            return ServiceResult.fail(f"API error: {response.text}")
 
-                return ServiceResult.ok(result)
+        task_id = response.json().get("data", {}).get("task_id")
+        if not task_id:
+            return ServiceResult.fail("No task ID returned")
 
-        except httpx.TimeoutException:
-            return ServiceResult.fail("Request timeout")
-        except Exception as e:
-            return ServiceResult.fail(f"Generation failed: {e}")
+        return ServiceResult.ok(task_id)
 
     async def get_task_status(self, task_id: str) -> dict[str, Any]:
         """获取任务状态"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.API_BASE}/{self.API_VERSION}/videos/image2video/{task_id}",
-                headers=self._get_headers(),
-            )
-            if response.status_code == 200:
-                return response.json()
-            return {"status": "error", "message": response.text}
+        client = self.http_client()
+        response = await client.get(
+            f"{self.API_BASE}/{self.API_VERSION}/videos/image2video/{task_id}",
+            headers=self._get_headers(),
+        )
+        if response.status_code == 200:
+            return response.json()
+        return {"status": "error", "message": response.text}
 
     async def _load_image(self, image_path: str) -> str | None:
         """加载并编码图像"""
@@ -149,10 +286,10 @@ class KlingService(BaseVideoService):
 
             # 可能是 URL，尝试下载
             if image_path.startswith("http"):
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(image_path)
-                    if response.status_code == 200:
-                        return base64.b64encode(response.content).decode("utf-8")
+                client = self.http_client()
+                response = await client.get(image_path, timeout=30)
+                if response.status_code == 200:
+                    return base64.b64encode(response.content).decode("utf-8")
 
             return None
         except Exception:
@@ -171,36 +308,53 @@ class KlingService(BaseVideoService):
         }
         return movement_map.get(request.camera_movement.value, {"type": "none"})
 
-    async def _wait_for_completion(
-        self,
-        client: httpx.AsyncClient,
-        task_id: str,
-        max_wait: int = 600,
-    ) -> str | None:
-        """等待任务完成"""
-        elapsed = 0
-        while elapsed < max_wait:
-            response = await client.get(
-                f"{self.API_BASE}/{self.API_VERSION}/videos/image2video/{task_id}",
-                headers=self._get_headers(),
-            )
-
-            if response.status_code == 200:
-                data = response.json().get("data", {})
-                status = data.get("status")
+    def _parse_task(self, data: dict[str, Any]) -> tuple[Optional[str], Optional[str]]:
+        """解析任务数据，返回 (状态, 视频 URL)"""
+        status = data.get("status") or data.get("task_status")
+        if status == "succeed":
+            status = "completed"
 
-                if status == "completed":
-                    videos = data.get("videos", [])
-                    if videos:
-                        return videos[0].get("url")
-                    return None
-                elif status == "failed":
-                    return None
+        videos = data.get("videos") or data.get("task_result", {}).get("videos", [])
+        video_url = videos[0].get("url") if videos else None
 
-            await asyncio.sleep(self.poll_interval)
-            elapsed += self.poll_interval
+        if status == "completed" and not video_url:
+            status = "failed"
+        return status, video_url
 
-        return None
+    async def _list_task_statuses(
+        self,
+        client: httpx.AsyncClient,
+        page_size: int = 500,
+    ) -> dict[str, tuple[Optional[str], Optional[str]]]:
+        """通过任务列表接口一次获取最近任务的状态"""
+        response = await client.get(
+            f"{self.API_BASE}/{self.API_VERSION}/videos/image2video",
+            headers=self._get_headers(),
+            params={"pageNum": 1, "pageSize": page_size},
+        )
+        if response.status_code != 200:
+            return {}
+
+        statuses = {}
+        for item in response.json().get("data") or []:
+            task_id = item.get("task_id")
+            if task_id:
+                statuses[task_id] = self._parse_task(item)
+        return statuses
+
+    async def _fetch_task_status(
+        self,
+        client: httpx.AsyncClient,
+        task_id: str,
+    ) -> tuple[Optional[str], Optional[str]]:
+        """查询单个任务状态"""
+        response = await client.get(
+            f"{self.API_BASE}/{self.API_VERSION}/videos/image2video/{task_id}",
+            headers=self._get_headers(),
+        )
+        if response.status_code != 200:
+            return None, None
+        return self._parse_task(response.json().get("data", {}))
 
     async def _download_video(
         self,
@@ -215,3 +369,18 @@ class KlingService(BaseVideoService):
             return None
         except Exception:
             return None
+
+    async def _stream_video(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        target: StreamTarget,
+    ) -> str | None:
+        """流式下载视频并写入存储，返回存储路径"""
+        try:
+            async with client.stream("GET", url, timeout=120) as response:
+                if response.status_code != 200:
+                    return None
+                return await target.write(response.aiter_bytes(STREAM_CHUNK_SIZE))
+        except Exception:
+            return None
@@ -24,12 +24,12 @@ class FishSpeechService(BaseVoiceService):
     async def health_check(self) -> bool:
         """检查服务是否可用"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/health",
-                    timeout=10,
-                )
-                return response.status_code == 200
+            client = self.http_client()
+            response = await client.get(
+                f"{self.base_url}/health",
+                timeout=10,
+            )
+            return response.status_code == 200
         except Exception:
             return False
 
@@ -40,14 +40,14 @@ class FishSpeechService(BaseVoiceService):
     async def get_voices(self) -> list[dict[str, Any]]:
         """获取可用声音列表 (预设声音)"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v1/voices",
-                    timeout=10,
-                )
-                if response.status_code == 200:
-                    return response.json().get("voices", [])
-                return []
+            client = self.http_client()
+            response = await client.get(
+                f"{self.base_url}/v1/voices",
+                timeout=10,
+            )
+            if response.status_code == 200:
+                return response.json().get("voices", [])
+            return []
         except Exception:
             return []
 
@@ -74,42 +74,43 @@ class FishSpeechService(BaseVoiceService):
             if request.voice_id:
                 payload["voice_id"] = request.voice_id
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/tts",
-                    json=payload,
-                )
+            client = self.http_client()
+            response = await client.post(
+                f"{self.base_url}/v1/tts",
+                json=payload,
+                timeout=self.timeout,
+            )
+
+            if response.status_code != 200:
+                return ServiceResult.fail(f"API error: {response.text}")
+
+            # 检查响应类型
+            content_type = response.headers.get("content-type", "")
+
+            if "audio" in content_type:
+                # 直接返回音频数据
+                audio_data = response.content
+            else:
+                # JSON 响应，可能包含 base64 音频
+                data = response.json()
+                audio_base64 = data.get("audio")
+                if audio_base64:
+                    audio_data = base64.b64decode(audio_base64)
+                else:
+                    return ServiceResult.fail("No audio in response")
 
-                if response.status_code != 200:
-                    return ServiceResult.fail(f"API error: {response.text}")
+            # 估算时长
+            duration = self._estimate_duration(len(audio_data), request.format)
 
-                # 检查响应类型
-                content_type = response.headers.get("content-type", "")
+            result = VoiceGenerationResult(
+                audio_data=audio_data,
+                duration=duration,
+                format=request.format,
+                sample_rate=request.sample_rate,
+                metadata={},
+            )
 
-                if "audio" in content_type:
-                    # 直接返回音频数据
-                    audio_data = response.content
-                else:
-                    # JSON 响应，可能包含 base64 音频
-                    data = response.json()
-                    audio_base64 = data.get("audio")
-                    if audio_base64:
-                        audio_data = base64.b64decode(audio_base64)
-                    else:
-                        return ServiceResult.fail("No audio in response")
-
-                # 估算时长
-                duration = self._estimate_duration(len(audio_data), request.format)
-
-                result = VoiceGenerationResult(
-                    audio_data=audio_data,
-                    duration=duration,
-                    format=request.format,
-                    sample_rate=request.sample_rate,
-                    metadata={},
-                )
-
-                return ServiceResult.ok(result)
+            return ServiceResult.ok(result)
 
         except httpx.TimeoutException:
             return ServiceResult.fail("Request timeout")
@@ -131,10 +132,10 @@ class FishSpeechService(BaseVoiceService):
 
             # 可能是 URL
             if audio_path.startswith("http"):
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(audio_path)
-                    if response.status_code == 200:
-                        return base64.b64encode(response.content).decode("utf-8")
+                client = self.http_client()
+                response = await client.get(audio_path, timeout=30)
+                if response.status_code == 200:
+                    return base64.b64encode(response.content).decode("utf-8")
 
             return None
         except Exception:
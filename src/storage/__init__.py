@@ -1,6 +1,7 @@
 """
 MangaForge Storage Module
 """
+from .local_cache import LocalAssetCache
 from .minio_client import (
     MinioStorage,
     get_storage,
@@ -8,6 +9,7 @@ from .minio_client import (
 )
 
 __all__ = [
+    "LocalAssetCache",
     "MinioStorage",
     "get_storage",
     "init_storage",
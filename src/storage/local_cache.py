@@ -0,0 +1,132 @@
+"""
+Worker-local Asset Cache
+
+Worker 本地磁盘上的对象缓存（按最近访问时间 LRU 淘汰）。
+上传到 MinIO 的资产同时写入本地缓存，同一 Worker 后续需要本地文件时（如剪辑拼接）
+无需再次下载。
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+
+class LocalAssetCache:
+    """本地资产缓存"""
+
+    def __init__(self, root: Union[str, Path], max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.objects_dir = self.root / "objects"
+        # 与缓存同一文件系统的工作目录，便于硬链接
+        self.work_dir = self.root / "work"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path_for(self, object_name: str) -> Path:
+        """对象名 -> 缓存文件路径"""
+        digest = hashlib.sha1(object_name.encode("utf-8")).hexdigest()
+        return self.objects_dir / digest[:2] / f"{digest}{Path(object_name).suffix}"
+
+    def get(self, object_name: str) -> Optional[Path]:
+        """
+        查找缓存文件
+
+        Returns:
+            缓存文件路径，未命中返回 None
+        """
+        path = self._path_for(object_name)
+        try:
+            # 更新访问时间，作为 LRU 依据
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            return None
+
+    def put_bytes(self, object_name: str, data: bytes) -> Path:
+        """写入字节数据"""
+        return self._store(object_name, lambda tmp: tmp.write_bytes(data))
+
+    def put_file(self, object_name: str, file_path: Union[str, Path]) -> Path:
+        """写入本地文件（复制）"""
+        return self._store(object_name, lambda tmp: shutil.copyfile(file_path, tmp))
+
+    def move_file(self, object_name: str, file_path: Union[str, Path]) -> Path:
+        """将本地文件移入缓存（需与缓存在同一文件系统，如 work_dir 下的文件）"""
+        return self._store(object_name, lambda tmp: os.replace(file_path, tmp))
+
+    def fetch(
+        self,
+        object_name: str,
+        download: Callable[[str, Path], object],
+    ) -> Path:
+        """
+        获取缓存文件，未命中时调用 download(object_name, 目标路径) 下载后写入缓存
+
+        Returns:
+            缓存文件路径
+        """
+        path = self.get(object_name)
+        if path:
+            return path
+        return self._store(object_name, lambda tmp: download(object_name, tmp))
+
+    def link_to(self, cached_path: Path, destination: Union[str, Path]) -> Path:
+        """
+        将缓存文件硬链接到目标路径（不同文件系统时复制）
+
+        链接后的文件不受缓存淘汰影响。
+        """
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(cached_path, destination)
+        except OSError:
+            shutil.copyfile(cached_path, destination)
+        return destination
+
+    def _store(self, object_name: str, write: Callable[[Path], object]) -> Path:
+        """写入临时文件后原子替换到缓存路径，然后按容量淘汰"""
+        path = self._path_for(object_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        os.close(fd)
+        tmp = Path(tmp_name)
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        self._evict()
+        return path
+
+    def _evict(self) -> None:
+        """淘汰最久未访问的文件直到总大小不超过上限"""
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.objects_dir.glob("*/*"):
+                if path.suffix == ".part":
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
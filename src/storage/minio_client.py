@@ -1,22 +1,92 @@
 """
 MinIO Object Storage Client
 """
+import asyncio
 import io
+import os
+import queue
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from functools import partial
 from pathlib import Path
-from typing import BinaryIO, Optional, Union
+from typing import Any, AsyncIterator, BinaryIO, Callable, Optional, TypeVar, Union
 from uuid import uuid4
 
 from minio import Minio
+from minio.commonconfig import CopySource
 from minio.error import S3Error
 
 from src.config.settings import get_settings
+from src.observability.tracing import span
+from src.storage.local_cache import LocalAssetCache
 
 settings = get_settings()
 
 # Global storage instance
 _storage: Optional["MinioStorage"] = None
 
+T = TypeVar("T")
+
+# MinIO 要求的最小分片大小
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class _ChunkReader(io.RawIOBase):
+    """
+    将事件循环中产生的数据块桥接为同步可读流
+
+    生产者（事件循环）通过 feed 写入数据块，put_object 在线程池中 read；
+    队列有上限，内存中最多只保留少量数据块。任一侧失败时另一侧随即中止。
+    """
+
+    def __init__(self, spool: Optional[BinaryIO] = None, max_chunks: int = 8):
+        self._queue: queue.Queue = queue.Queue(max_chunks)
+        self._buffer = bytearray()
+        self._eof = False
+        self._aborted = False
+        # 读取的数据同时写入本地文件（用于本地资产缓存）
+        self._spool = spool
+
+    def readable(self) -> bool:
+        return True
+
+    def feed(self, chunk: Optional[bytes]) -> None:
+        """写入数据块，None 表示结束（阻塞直到队列有空位）"""
+        while not self._aborted:
+            try:
+                self._queue.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise IOError("Upload aborted")
+
+    def abort(self) -> None:
+        """中止传输，阻塞中的 feed/read 随即抛出异常"""
+        self._aborted = True
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            if self._aborted:
+                raise IOError("Stream aborted")
+            try:
+                chunk = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buffer.extend(chunk)
+
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+
+        if self._spool and data:
+            self._spool.write(data)
+        return data
+
 
 class MinioStorage:
     """MinIO 对象存储客户端封装"""
@@ -28,6 +98,10 @@ class MinioStorage:
         secret_key: str,
         bucket: str,
         secure: bool = False,
+        local_cache: Optional[LocalAssetCache] = None,
+        max_workers: int = 8,
+        part_size: int = 16 * 1024 * 1024,
+        parallel_parts: int = 4,
     ):
         self.client = Minio(
             endpoint=endpoint,
@@ -36,6 +110,13 @@ class MinioStorage:
             secure=secure,
         )
         self.bucket = bucket
+        # 本地资产缓存：上传时写入，fetch_to 时优先使用
+        self.local_cache = local_cache
+        # 大文件分片并行上传
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.parallel_parts = max(1, parallel_parts)
+        # 异步接口使用的专用线程池（MinIO SDK 为同步阻塞 IO）
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="minio")
         self._ensure_bucket()
 
     def _ensure_bucket(self) -> None:
@@ -43,6 +124,22 @@ class MinioStorage:
         if not self.client.bucket_exists(self.bucket):
             self.client.make_bucket(self.bucket)
 
+    def _cache_bytes(self, object_name: str, data: bytes) -> None:
+        """上传后写入本地缓存（失败不影响上传）"""
+        if self.local_cache:
+            try:
+                self.local_cache.put_bytes(object_name, data)
+            except OSError:
+                pass
+
+    def _cache_file(self, object_name: str, file_path: Path) -> None:
+        """上传后写入本地缓存（失败不影响上传）"""
+        if self.local_cache:
+            try:
+                self.local_cache.put_file(object_name, file_path)
+            except OSError:
+                pass
+
     def _generate_path(
         self,
         project_id: str,
@@ -85,7 +182,10 @@ class MinioStorage:
             object_name=object_name,
             file_path=str(file_path),
             content_type=content_type,
+            part_size=self.part_size,
+            num_parallel_uploads=self.parallel_parts,
         )
+        self._cache_file(object_name, file_path)
 
         return object_name
 
@@ -119,17 +219,77 @@ class MinioStorage:
             data=data_stream,
             length=len(data),
             content_type=content_type,
+            part_size=self.part_size,
+            num_parallel_uploads=self.parallel_parts,
+        )
+        self._cache_bytes(object_name, data)
+
+        return object_name
+
+    def put_bytes(
+        self,
+        object_name: str,
+        data: bytes,
+        content_type: Optional[str] = None,
+    ) -> str:
+        """
+        以指定对象名上传字节数据（用于缓存等固定路径）
+
+        Args:
+            object_name: 对象名称
+            data: 字节数据
+            content_type: MIME 类型
+
+        Returns:
+            存储路径
+        """
+        self.client.put_object(
+            bucket_name=self.bucket,
+            object_name=object_name,
+            data=io.BytesIO(data),
+            length=len(data),
+            content_type=content_type,
+            part_size=self.part_size,
+            num_parallel_uploads=self.parallel_parts,
         )
+        self._cache_bytes(object_name, data)
 
         return object_name
 
+    def copy_object(
+        self,
+        source_object: str,
+        project_id: str,
+        asset_type: str,
+        filename: str,
+    ) -> str:
+        """
+        服务端复制已有对象到项目路径（数据不经过本进程）
+
+        Args:
+            source_object: 源对象名称（如渲染缓存对象）
+            project_id: 项目 ID
+            asset_type: 资产类型
+            filename: 文件名
+
+        Returns:
+            存储路径
+        """
+        object_name = self._generate_path(project_id, asset_type, filename)
+        self.client.copy_object(
+            bucket_name=self.bucket,
+            object_name=object_name,
+            source=CopySource(self.bucket, source_object),
+        )
+        return object_name
+
     def upload_stream(
         self,
         stream: BinaryIO,
         project_id: str,
         asset_type: str,
         filename: str,
-        length: int,
+        length: int = -1,
         content_type: Optional[str] = None,
     ) -> str:
         """
@@ -140,24 +300,34 @@ class MinioStorage:
             project_id: 项目 ID
             asset_type: 资产类型
             filename: 文件名
-            length: 数据长度
+            length: 数据长度，-1 表示未知（按分片边读边传）
             content_type: MIME 类型
 
         Returns:
             存储路径
         """
         object_name = self._generate_path(project_id, asset_type, filename)
+        self._put_stream(object_name, stream, length, content_type)
+
+        return object_name
 
+    def _put_stream(
+        self,
+        object_name: str,
+        stream: BinaryIO,
+        length: int,
+        content_type: Optional[str],
+    ) -> None:
         self.client.put_object(
             bucket_name=self.bucket,
             object_name=object_name,
             data=stream,
             length=length,
             content_type=content_type,
+            part_size=self.part_size,
+            num_parallel_uploads=self.parallel_parts,
         )
 
-        return object_name
-
     def download_file(
         self,
         object_name: str,
@@ -184,6 +354,29 @@ class MinioStorage:
 
         return destination
 
+    def fetch_to(
+        self,
+        object_name: str,
+        destination: Union[str, Path],
+    ) -> Path:
+        """
+        获取文件到本地目标路径，优先使用本地缓存
+
+        缓存命中时硬链接到目标路径，不产生网络传输；未命中时下载并写入缓存。
+
+        Args:
+            object_name: 对象名称
+            destination: 本地目标路径
+
+        Returns:
+            本地文件路径
+        """
+        if not self.local_cache:
+            return self.download_file(object_name, destination)
+
+        cached = self.local_cache.fetch(object_name, self.download_file)
+        return self.local_cache.link_to(cached, destination)
+
     def download_bytes(self, object_name: str) -> bytes:
         """
         下载文件为字节数据
@@ -323,17 +516,210 @@ class MinioStorage:
         except S3Error:
             return None
 
+    # ===========================================
+    # 异步接口：在专用线程池中执行，不阻塞事件循环
+    # ===========================================
+
+    async def _run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """在存储线程池中执行同步方法（每次传输记录一个 storage.<方法名> span）"""
+        loop = asyncio.get_running_loop()
+        size = next((len(arg) for arg in args if isinstance(arg, (bytes, bytearray))), None)
+        with span(f"storage.{func.__name__}", bytes=size):
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def upload_file_async(
+        self,
+        file_path: Union[str, Path],
+        project_id: str,
+        asset_type: str,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+    ) -> str:
+        """异步上传本地文件，参数同 upload_file"""
+        return await self._run(
+            self.upload_file, file_path, project_id, asset_type, filename, content_type
+        )
+
+    async def upload_bytes_async(
+        self,
+        data: bytes,
+        project_id: str,
+        asset_type: str,
+        filename: str,
+        content_type: Optional[str] = None,
+    ) -> str:
+        """异步上传字节数据，参数同 upload_bytes"""
+        return await self._run(
+            self.upload_bytes, data, project_id, asset_type, filename, content_type
+        )
+
+    async def put_bytes_async(
+        self,
+        object_name: str,
+        data: bytes,
+        content_type: Optional[str] = None,
+    ) -> str:
+        """异步以指定对象名上传字节数据，参数同 put_bytes"""
+        return await self._run(self.put_bytes, object_name, data, content_type)
+
+    async def copy_object_async(
+        self,
+        source_object: str,
+        project_id: str,
+        asset_type: str,
+        filename: str,
+    ) -> str:
+        """异步服务端复制对象，参数同 copy_object"""
+        return await self._run(self.copy_object, source_object, project_id, asset_type, filename)
+
+    async def exists_async(self, object_name: str) -> bool:
+        """异步检查对象是否存在"""
+        return await self._run(self.exists, object_name)
+
+    async def download_file_async(
+        self,
+        object_name: str,
+        destination: Union[str, Path],
+    ) -> Path:
+        """异步下载文件到本地，参数同 download_file"""
+        return await self._run(self.download_file, object_name, destination)
+
+    async def download_bytes_async(self, object_name: str) -> bytes:
+        """异步下载文件为字节数据"""
+        return await self._run(self.download_bytes, object_name)
+
+    async def fetch_to_async(
+        self,
+        object_name: str,
+        destination: Union[str, Path],
+    ) -> Path:
+        """异步获取文件到本地（优先本地缓存），参数同 fetch_to"""
+        return await self._run(self.fetch_to, object_name, destination)
+
+    async def delete_async(self, object_name: str) -> bool:
+        """异步删除对象"""
+        return await self._run(self.delete, object_name)
+
+    async def upload_stream_async(
+        self,
+        chunks: AsyncIterator[bytes],
+        project_id: str,
+        asset_type: str,
+        filename: str,
+        content_type: Optional[str] = None,
+    ) -> str:
+        """
+        将异步数据块流（如 HTTP 响应体）直接分片上传到 MinIO
+
+        数据边接收边上传，不在内存中拼接完整文件；
+        启用本地资产缓存时同时落盘到缓存。
+
+        Returns:
+            存储路径
+        """
+        object_name = self._generate_path(project_id, asset_type, filename)
+
+        spool_path: Optional[Path] = None
+        spool: Optional[BinaryIO] = None
+        if self.local_cache:
+            fd, name = tempfile.mkstemp(dir=self.local_cache.work_dir, suffix=".part")
+            spool_path = Path(name)
+            spool = os.fdopen(fd, "wb")
+
+        reader = _ChunkReader(spool=spool)
+
+        def upload_stream() -> None:
+            try:
+                self._put_stream(object_name, reader, -1, content_type)
+            except BaseException:
+                reader.abort()
+                raise
+
+        upload = asyncio.ensure_future(self._run(upload_stream))
+        try:
+            try:
+                async for chunk in chunks:
+                    if chunk:
+                        await asyncio.to_thread(reader.feed, chunk)
+                await asyncio.to_thread(reader.feed, None)
+            except BaseException:
+                # 下载失败：中止上传（未完成的分片上传不会生成对象）
+                reader.abort()
+                await asyncio.gather(upload, return_exceptions=True)
+                raise
+            await upload
+
+            if spool and spool_path:
+                spool.close()
+                try:
+                    self.local_cache.move_file(object_name, spool_path)
+                except OSError:
+                    pass
+        finally:
+            if spool:
+                spool.close()
+            if spool_path:
+                spool_path.unlink(missing_ok=True)
+
+        return object_name
+
+    async def upload_bytes_many_async(
+        self,
+        items: list[dict[str, Any]],
+    ) -> list[str]:
+        """
+        并发上传多个字节数据
+
+        Args:
+            items: 每项为 upload_bytes 的关键字参数
+                (data, project_id, asset_type, filename, content_type)
+
+        Returns:
+            与 items 顺序一致的存储路径
+        """
+        return list(await asyncio.gather(
+            *(self.upload_bytes_async(**item) for item in items)
+        ))
+
+    async def fetch_many_async(
+        self,
+        items: list[tuple[str, Union[str, Path]]],
+    ) -> list[Path]:
+        """
+        并发获取多个文件到本地（优先本地缓存）
+
+        Args:
+            items: (对象名称, 本地目标路径) 列表
+
+        Returns:
+            与 items 顺序一致的本地文件路径
+        """
+        return list(await asyncio.gather(
+            *(self.fetch_to_async(object_name, destination) for object_name, destination in items)
+        ))
+
 
 def init_storage() -> MinioStorage:
     """初始化存储客户端"""
     global _storage
     if _storage is None:
+        local_cache = None
+        if settings.asset_cache_enabled:
+            local_cache = LocalAssetCache(
+                root=settings.asset_cache_dir or Path(tempfile.gettempdir()) / "mangaforge_assets",
+                max_bytes=settings.asset_cache_max_mb * 1024 * 1024,
+            )
+
         _storage = MinioStorage(
             endpoint=settings.minio_endpoint,
             access_key=settings.minio_access_key,
             secret_key=settings.minio_secret_key,
             bucket=settings.minio_bucket,
             secure=settings.minio_secure,
+            local_cache=local_cache,
+            max_workers=settings.storage_max_workers,
+            part_size=settings.minio_part_size_mb * 1024 * 1024,
+            parallel_parts=settings.minio_parallel_uploads,
         )
     return _storage
 
@@ -2,6 +2,7 @@
 Celery Application Configuration
 """
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown, worker_shutdown
 
 from src.config.settings import get_settings
 
@@ -78,6 +79,46 @@ celery_app.conf.update(
 )
 
 
+@worker_init.connect
+def start_metrics_exporter(sender=None, **kwargs):
+    """Worker 主进程启动时暴露 Prometheus 指标（含 generation / callbacks 队列深度）"""
+    if not settings.metrics_enabled:
+        return
+    try:
+        from src.observability.metrics import multiprocess_enabled, start_worker_exporter
+
+        pool = str(getattr(sender, "pool_cls", "") or "prefork")
+        if "prefork" in pool.lower() and not multiprocess_enabled():
+            print(
+                "WARNING: prefork worker pool without PROMETHEUS_MULTIPROC_DIR - "
+                "metrics recorded in child processes (stages, provider calls, in-flight "
+                "requests) will NOT appear on the worker metrics endpoint"
+            )
+
+        start_worker_exporter(settings.worker_metrics_port)
+        print(f"Worker metrics exporter listening on :{settings.worker_metrics_port}")
+    except Exception as e:
+        print(f"Failed to start worker metrics exporter: {e}")
+
+
+@worker_process_shutdown.connect
+def cleanup_process_metrics(pid=None, **kwargs):
+    """prefork 子进程退出时导出剩余 span 并清理其多进程指标"""
+    from src.observability.metrics import mark_process_dead
+    from src.observability.tracing import flush_tracer
+
+    flush_tracer()
+    mark_process_dead(pid)
+
+
+@worker_shutdown.connect
+def flush_spans(**kwargs):
+    """Worker 主进程退出时导出剩余 span（solo / threads 池在主进程内执行任务）"""
+    from src.observability.tracing import flush_tracer
+
+    flush_tracer()
+
+
 # 任务状态常量
 class TaskStatus:
     PENDING = "pending"
@@ -131,3 +172,14 @@ class GenerationStage:
 
         total_weight = sum(cls.WEIGHTS.values())
         return (completed_weight + current_weight) / total_weight * 100
+
+    @classmethod
+    def get_overall_progress(cls, stage_progress: dict[str, float]) -> float:
+        """根据各阶段各自的进度计算总体进度（阶段可能并发执行）"""
+        total_weight = sum(cls.WEIGHTS.values())
+        done_weight = sum(
+            cls.WEIGHTS[stage] * (min(progress, 100.0) / 100.0)
+            for stage, progress in stage_progress.items()
+            if stage in cls.WEIGHTS
+        )
+        return done_weight / total_weight * 100
@@ -0,0 +1,65 @@
+"""
+Generation Checkpoints - 生成任务检查点
+
+每个阶段的输出、以及阶段内每个镜头的结果在完成时写入 Redis hash，
+Celery 重试时编排器据此跳过已完成的阶段和镜头，从最后完成的单元继续。
+"""
+import json
+from typing import Any
+
+from src.db.redis import init_redis
+
+
+class GenerationCheckpoint:
+    """单个生成任务的检查点（Redis hash: stage:<阶段> / unit:<阶段>:<镜头>）"""
+
+    KEY_PREFIX = "mangaforge:checkpoint"
+
+    def __init__(self, task_id: str, ttl: int = 7 * 24 * 3600):
+        self.task_id = task_id
+        self.ttl = ttl
+        self.key = f"{self.KEY_PREFIX}:{task_id}"
+
+    async def load(self) -> tuple[dict[str, dict[str, Any]], dict[str, dict[Any, dict[str, Any]]]]:
+        """
+        读取检查点
+
+        Returns:
+            (阶段 -> 阶段输出, 阶段 -> shot_id -> 镜头结果)
+        """
+        client = await init_redis()
+        fields = await client.hgetall(self.key)
+
+        stages: dict[str, dict[str, Any]] = {}
+        units: dict[str, dict[Any, dict[str, Any]]] = {}
+
+        for field_name, value in fields.items():
+            kind, _, rest = field_name.partition(":")
+            data = json.loads(value)
+            if kind == "stage":
+                stages[rest] = data
+            elif kind == "unit":
+                stage = rest.partition(":")[0]
+                units.setdefault(stage, {})[data.get("shot_id")] = data
+
+        return stages, units
+
+    async def save_stage(self, stage: str, output: dict[str, Any]) -> None:
+        """保存阶段输出"""
+        await self._save(f"stage:{stage}", output)
+
+    async def save_unit(self, stage: str, result: dict[str, Any]) -> None:
+        """保存阶段内单个镜头的结果"""
+        await self._save(f"unit:{stage}:{result.get('shot_id')}", result)
+
+    async def clear(self) -> None:
+        """任务完成后删除检查点"""
+        client = await init_redis()
+        await client.delete(self.key)
+
+    async def _save(self, field_name: str, data: dict[str, Any]) -> None:
+        client = await init_redis()
+        pipe = client.pipeline()
+        pipe.hset(self.key, field_name, json.dumps(data, ensure_ascii=False, default=str))
+        pipe.expire(self.key, self.ttl)
+        await pipe.execute()
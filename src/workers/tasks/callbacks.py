@@ -21,6 +21,7 @@ def run_async(coro):
 async def _notify_user(user_id: str, notification_type: str, data: dict):
     """发送用户通知"""
     from src.db.redis import get_redis_client
+    from src.observability.metrics import record_publish
 
     redis = await get_redis_client()
     payload = {
@@ -28,7 +29,8 @@ async def _notify_user(user_id: str, notification_type: str, data: dict):
         "data": data,
         "timestamp": datetime.utcnow().isoformat(),
     }
-    await redis.publish(f"user:{user_id}:notifications", json.dumps(payload))
+    channel = f"user:{user_id}:notifications"
+    record_publish(channel, await redis.publish(channel, json.dumps(payload)))
 
 
 async def _get_task_info(task_id: str):
@@ -14,11 +14,15 @@ from src.workers.celery_app import celery_app, TaskStatus, GenerationStage
 
 def run_async(coro):
     """在同步环境中运行异步协程"""
+    from src.services.factory import get_service_factory
+
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
         return loop.run_until_complete(coro)
     finally:
+        # 服务的共享 HTTP 客户端绑定在本事件循环上，关闭循环前释放连接
+        loop.run_until_complete(get_service_factory().aclose())
         loop.close()
 
 
@@ -28,14 +32,17 @@ async def _update_task_progress(
     progress: float,
     message: str,
     details: dict[str, Any] | None = None,
+    total_progress: float | None = None,
 ):
     """更新任务进度并通过 Redis 发布"""
     from src.db.database import get_async_session
     from src.db.redis import get_redis_client
+    from src.observability.metrics import record_publish
     from src.models import Task
 
     # 计算总体进度
-    total_progress = GenerationStage.get_progress(stage, progress)
+    if total_progress is None:
+        total_progress = GenerationStage.get_progress(stage, progress)
 
     # 更新数据库
     async with get_async_session() as session:
@@ -67,7 +74,23 @@ async def _update_task_progress(
         },
         "timestamp": datetime.utcnow().isoformat(),
     }
-    await redis.publish(f"task:{task_id}:progress", json.dumps(payload))
+    channel = f"task:{task_id}:progress"
+    record_publish(channel, await redis.publish(channel, json.dumps(payload)))
+
+
+async def _save_task_usage(task_id: str, usage: dict[str, Any]):
+    """将用量汇总写入 Task.result（生成失败时保留已消耗的用量）"""
+    from src.db.database import get_async_session
+    from src.models import Task
+
+    async with get_async_session() as session:
+        from sqlalchemy import select
+        db_result = await session.execute(select(Task).where(Task.id == task_id))
+        task = db_result.scalar_one_or_none()
+        if task:
+            # 重新赋值整个 dict，确保 JSONB 变更被追踪
+            task.result = {**(task.result or {}), "usage": usage}
+            await session.commit()
 
 
 async def _mark_task_completed(
@@ -77,6 +100,7 @@ async def _mark_task_completed(
     """标记任务完成"""
     from src.db.database import get_async_session
     from src.db.redis import get_redis_client
+    from src.observability.metrics import record_publish
     from src.models import Task
 
     async with get_async_session() as session:
@@ -98,7 +122,8 @@ async def _mark_task_completed(
         "data": result,
         "timestamp": datetime.utcnow().isoformat(),
     }
-    await redis.publish(f"task:{task_id}:progress", json.dumps(payload))
+    channel = f"task:{task_id}:progress"
+    record_publish(channel, await redis.publish(channel, json.dumps(payload)))
 
 
 async def _mark_task_failed(
@@ -109,6 +134,7 @@ async def _mark_task_failed(
     """标记任务失败"""
     from src.db.database import get_async_session
     from src.db.redis import get_redis_client
+    from src.observability.metrics import record_publish
     from src.models import Task
 
     async with get_async_session() as session:
@@ -135,15 +161,139 @@ async def _mark_task_failed(
         },
         "timestamp": datetime.utcnow().isoformat(),
     }
-    await redis.publish(f"task:{task_id}:progress", json.dumps(payload))
+    channel = f"task:{task_id}:progress"
+    record_publish(channel, await redis.publish(channel, json.dumps(payload)))
+
+
+def _storyboard_shots(storyboard: Any) -> list[dict[str, Any]]:
+    """Episode.storyboard 可能是镜头列表或 {"shots": [...]}"""
+    if not storyboard:
+        return []
+    if isinstance(storyboard, list):
+        return storyboard
+    return storyboard.get("shots", [])
+
+
+# 分镜字段 -> (Shot 字段, 创建 Shot 记录时使用的默认值)
+_SHOT_FIELDS = {
+    "duration": ("duration", 5.0),
+    "camera_movement": ("camera_movement", "static"),
+    "dialog": ("dialog", {}),
+    "image_prompt": ("image_prompt", ""),
+    "negative_prompt": ("negative_prompt", ""),
+    "action": ("video_prompt", ""),
+}
+
+
+def _apply_shot_edits(
+    storyboard: list[dict[str, Any]],
+    shots: list[Any],
+) -> list[dict[str, Any]]:
+    """将 Shot 记录上的编辑（提示词/对白/镜头运动等）合并到分镜"""
+    shots_by_number = {shot.shot_number: shot for shot in shots}
+    edited = []
+
+    for shot_data in storyboard:
+        shot = shots_by_number.get(shot_data.get("shot_id"))
+        if shot is None:
+            edited.append(shot_data)
+            continue
+
+        shot_data = dict(shot_data)
+        for field_name, (column, default) in _SHOT_FIELDS.items():
+            value = getattr(shot, column)
+            if value is not None and value != shot_data.get(field_name, default):
+                shot_data[field_name] = value
+        edited.append(shot_data)
+
+    return edited
+
+
+def _shot_assets(shots: list[Any]) -> dict[Any, dict[str, Any]]:
+    """从 Shot 记录收集已有资产路径"""
+    return {
+        shot.shot_number: {
+            "image_path": shot.image_path,
+            "video_path": shot.video_path,
+            "audio_path": shot.audio_path,
+            "lipsync_video_path": shot.lipsync_video_path,
+            "duration": shot.duration,
+        }
+        for shot in shots
+    }
+
+
+def _sync_shots(
+    episode: Any,
+    shots: list[Any],
+    result: dict[str, Any],
+) -> None:
+    """按生成结果新建/更新/删除 Shot 记录，保存各镜头的资产路径"""
+    from src.models import Shot
+
+    stages = result.get("stages", {})
+
+    def by_shot(stage: str, key: str) -> dict[Any, dict[str, Any]]:
+        return {
+            item.get("shot_id"): item
+            for item in stages.get(stage, {}).get(key, [])
+            if item.get("success")
+        }
+
+    rendered = by_shot("render", "rendered_shots")
+    videos = by_shot("video", "videos")
+    audio = by_shot("voice", "audio_files")
+    lipsync = by_shot("lipsync", "lipsync_videos")
+
+    shots_by_number = {shot.shot_number: shot for shot in shots}
+    storyboard = result.get("storyboard") or []
+    current_ids = {shot_data.get("shot_id") for shot_data in storyboard}
+
+    for shot_number, shot in shots_by_number.items():
+        if shot_number not in current_ids:
+            episode.shots.remove(shot)
+
+    for shot_data in storyboard:
+        shot_id = shot_data.get("shot_id")
+        shot = shots_by_number.get(shot_id)
+        if shot is None:
+            shot = Shot(episode_id=episode.id, shot_number=shot_id)
+            episode.shots.append(shot)
+
+        shot.scene_description = shot_data.get("scene_description", "")
+        shot.camera_type = shot_data.get("camera_type", "medium_shot")
+        for field_name, (column, default) in _SHOT_FIELDS.items():
+            setattr(shot, column, shot_data.get(field_name, default))
+
+        shot.image_path = rendered.get(shot_id, {}).get("image_path")
+        shot.video_path = videos.get(shot_id, {}).get("video_path")
+        shot.audio_path = audio.get(shot_id, {}).get("audio_path")
+        shot.lipsync_video_path = lipsync.get(shot_id, {}).get("lipsync_video_path")
+        shot.status = "completed" if shot_id in rendered else "failed"
+
 
+async def _run_generation(
+    task_id: str,
+    regenerate_from: str | None = None,
+    shot_ids: list[Any] | None = None,
+):
+    """
+    执行生成流程
+
+    上次生成的分镜和 Shot 记录中的资产路径会传给编排器，只有内容发生变化的镜头
+    才会重新渲染/配音/口型同步。各阶段及镜头完成时写入检查点，Celery 重试时
+    从最后完成的单元继续；生成失败时抛出异常以触发重试。
 
-async def _run_generation(task_id: str):
-    """执行生成流程"""
+    Args:
+        task_id: 任务 ID
+        regenerate_from: 从指定阶段重新生成（默认取 payload.regenerate_from）
+        shot_ids: 只重新生成这些镜头（默认取 payload.shot_ids）
+    """
     from src.db.database import get_async_session
     from src.models import Task, Episode, Project
-    from src.agents.orchestrator import MangaForgeOrchestrator
+    from src.agents.orchestrator import GenerationConfig, MangaForgeOrchestrator
     from src.services.factory import ServiceFactory
+    from src.workers.checkpoint import GenerationCheckpoint
     from sqlalchemy import select
     from sqlalchemy.orm import selectinload
 
@@ -151,7 +301,7 @@ async def _run_generation(task_id: str):
     async with get_async_session() as session:
         result = await session.execute(
             select(Task)
-            .options(selectinload(Task.episode))
+            .options(selectinload(Task.episode).selectinload(Episode.shots))
             .where(Task.id == task_id)
         )
         task = result.scalar_one_or_none()
@@ -163,6 +313,9 @@ async def _run_generation(task_id: str):
             raise ValueError(f"Task {task_id} has no associated episode")
 
         episode = task.episode
+        payload = task.payload or {}
+        regenerate_from = regenerate_from or payload.get("regenerate_from")
+        shot_ids = shot_ids if shot_ids is not None else payload.get("shot_ids")
 
         # 获取项目
         project_result = await session.execute(
@@ -179,58 +332,121 @@ async def _run_generation(task_id: str):
         await session.commit()
 
         # 准备配置
-        config = {
-            "style": task.payload.get("style", project.style),
-            "add_subtitles": task.payload.get("add_subtitles", True),
-            "bgm_path": task.payload.get("bgm_path"),
-            "bgm_volume": task.payload.get("bgm_volume", 0.3),
-            "regenerate_from": task.payload.get("regenerate_from"),
-            "aspect_ratio": project.aspect_ratio,
-            "target_platform": project.target_platform,
-        }
+        config = GenerationConfig(
+            style=payload.get("style") or project.style,
+            aspect_ratio=project.aspect_ratio,
+            add_subtitles=payload.get("add_subtitles", True),
+            bgm_path=payload.get("bgm_path"),
+            bgm_volume=payload.get("bgm_volume", 0.3),
+            stream_shots=payload.get("stream_shots", False),
+            single_pass_edit=payload.get("single_pass_edit", True),
+            fresh_llm=payload.get("fresh_llm", False),
+            stream_script=payload.get("stream_script", False),
+            single_call_script=payload.get("single_call_script", False),
+        )
 
         user_input = episode.script_input
+        extra_data = episode.extra_data or {}
 
-        # 获取现有数据（用于部分重新生成）
-        existing_data = {}
+        # 获取现有数据（用于部分/增量重新生成）
+        existing_data: dict[str, Any] = {"user_input": user_input}
         if episode.script_parsed:
-            existing_data["script"] = episode.script_parsed
-        if episode.storyboard:
-            existing_data["storyboard"] = episode.storyboard
+            existing_data["script"] = {"script": episode.script_parsed}
+        if extra_data.get("characters"):
+            existing_data["character"] = {"characters": extra_data["characters"]}
+
+        edited = bool(payload.get("storyboard"))
+        previous_storyboard = _storyboard_shots(episode.storyboard)
+        if previous_storyboard:
+            # 编辑后的分镜：请求中提供的分镜，或合并 Shot 记录上的修改
+            edited_storyboard = payload.get("storyboard") or _apply_shot_edits(
+                previous_storyboard, episode.shots
+            )
+            existing_data["storyboard"] = {"shots": edited_storyboard}
+            existing_data["previous_storyboard"] = previous_storyboard
+            edited = edited or edited_storyboard != previous_storyboard
+
+            # 画面参数变化时已有资产全部失效
+            previous_config = extra_data.get("generation", {})
+            if (
+                previous_config.get("style") == config.style
+                and previous_config.get("aspect_ratio") == config.aspect_ratio
+            ):
+                existing_data["shot_assets"] = _shot_assets(episode.shots)
+
+    # 创建进度回调（阶段并发执行，按各阶段进度加权汇总总进度）
+    stage_progress: dict[str, float] = {}
 
-    # 创建进度回调
     async def progress_callback(stage: str, progress: float, message: str, details: dict = None):
-        await _update_task_progress(task_id, stage, progress, message, details)
+        if stage in GenerationStage.WEIGHTS:
+            stage_progress[stage] = max(stage_progress.get(stage, 0.0), progress)
+        total_progress = GenerationStage.get_overall_progress(stage_progress)
+        await _update_task_progress(
+            task_id, stage, progress, message, details, total_progress=total_progress
+        )
 
-    # 创建编排器
+    # 创建编排器（同一任务的重试共用检查点）
+    checkpoint = GenerationCheckpoint(task_id)
     service_factory = ServiceFactory(user_id=project.user_id)
     orchestrator = MangaForgeOrchestrator(
         service_factory=service_factory,
         progress_callback=progress_callback,
+        checkpoint=checkpoint,
     )
 
     # 执行生成
-    result = await orchestrator.generate(
-        project_id=project.id,
-        user_input=user_input,
-        config=config,
-        existing_data=existing_data,
-    )
+    if regenerate_from:
+        result = await orchestrator.generate_partial(
+            project_id=project.id,
+            start_stage=regenerate_from,
+            existing_data=existing_data,
+            config=config,
+            shot_ids=shot_ids,
+        )
+    else:
+        if edited:
+            # 分镜被编辑过：沿用已有剧本/角色/分镜，只重新生成变化的镜头
+            config.skip_script = True
+            config.skip_character = True
+            config.skip_storyboard = True
+        result = await orchestrator.generate(
+            project_id=project.id,
+            user_input=user_input,
+            config=config,
+            existing_data=existing_data,
+        )
 
-    # 更新 Episode
+    # 更新 Episode 和 Shot 记录（失败时保留上次的分镜和资产，供下次增量复用）
     async with get_async_session() as session:
         ep_result = await session.execute(
-            select(Episode).where(Episode.id == episode.id)
+            select(Episode)
+            .options(selectinload(Episode.shots))
+            .where(Episode.id == episode.id)
         )
         ep = ep_result.scalar_one_or_none()
-        if ep:
+        if ep and not result.get("success"):
+            ep.status = "failed"
+            await session.commit()
+        elif ep:
             ep.script_parsed = result.get("script")
             ep.storyboard = result.get("storyboard")
             ep.video_path = result.get("video_path")
             ep.duration = result.get("duration")
             ep.status = "completed"
+            # 重新赋值整个 dict，确保 JSONB 变更被追踪
+            ep.extra_data = {
+                **(ep.extra_data or {}),
+                "characters": result["stages"].get("character", {}).get("characters", []),
+                "generation": {"style": config.style, "aspect_ratio": config.aspect_ratio},
+            }
+            _sync_shots(ep, list(ep.shots), result)
             await session.commit()
 
+    if not result.get("success"):
+        await _save_task_usage(task_id, result.get("usage", {}))
+        raise RuntimeError(result.get("error") or "Generation failed")
+
+    await checkpoint.clear()
     return result
 
 
@@ -280,18 +496,33 @@ def generate_manga_video(self, task_id: str):
 
 @celery_app.task(
     name="src.workers.tasks.generation.regenerate_stage",
+    soft_time_limit=3600,
+    time_limit=3660,
 )
-def regenerate_stage(task_id: str, stage: str, shot_ids: list[str] | None = None):
+def regenerate_stage(task_id: str, stage: str, shot_ids: list[int] | None = None):
     """
     重新生成特定阶段。
 
+    之前的阶段沿用已有结果；镜头级阶段（render/video/voice/lipsync）只对指定镜头
+    强制重新执行该阶段及其下游，其余镜头复用已有资产，最后重新剪辑。
+
     Args:
         task_id: 任务 ID
         stage: 要重新生成的阶段
-        shot_ids: 可选，只重新生成特定镜头
+        shot_ids: 可选，只重新生成特定镜头（镜头编号）
 
     Returns:
         dict: 重新生成结果
     """
-    # TODO: 实现部分重新生成逻辑
-    pass
+    try:
+        result = run_async(_run_generation(task_id, regenerate_from=stage, shot_ids=shot_ids))
+        run_async(_mark_task_completed(task_id, result))
+        return result
+
+    except SoftTimeLimitExceeded:
+        run_async(_mark_task_failed(task_id, "Task exceeded time limit (1 hour)", stage))
+        raise
+
+    except Exception as e:
+        run_async(_mark_task_failed(task_id, str(e), stage))
+        raise